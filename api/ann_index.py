@@ -0,0 +1,196 @@
+"""
+Pluggable nearest-neighbour indexes over unit-normalised embeddings.
+
+Backends (all score by inner product == cosine on unit vectors):
+  exact   brute-force matrix-vector product (no extra dependency)
+  hnsw    hnswlib graph index; knobs: M, ef_construction, ef_search
+  ivfpq   faiss IVF with product quantization; knobs: nlist, m, nbits, nprobe,
+          rerank (re-score rerank*k PQ candidates exactly; 1 disables)
+
+`ef_search` / `nprobe` / `rerank` trade recall for latency at query time and can be
+changed without rebuilding. Indexes are saved next to the embedding store
+with a sidecar of the store keys they were built from, so a stale index is
+detected and rebuilt. bench_ann.py reports recall@k against exact search.
+"""
+from __future__ import annotations
+
+from typing import List, Tuple
+import json
+import math
+import os
+
+import numpy as np
+
+from embedding_store import EMBED_STORE_DIR, StoreKey, store_lock
+
+
+class ExactIndex:
+    backend = "exact"
+
+    def __init__(self):
+        self.matrix: np.ndarray | None = None
+
+    def build(self, matrix: np.ndarray) -> None:
+        self.matrix = matrix
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        scores = queries @ np.asarray(self.matrix).T
+        k = min(k, scores.shape[1])
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        part_scores = np.take_along_axis(scores, part, axis=1)
+        order = np.argsort(-part_scores, axis=1, kind="stable")
+        return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+    def save(self, path: str) -> None:
+        pass  # the embedding store already is this index
+
+    def load(self, path: str, matrix: np.ndarray) -> None:
+        self.matrix = matrix
+
+
+class HnswIndex:
+    backend = "hnsw"
+
+    def __init__(self, M: int = 32, ef_construction: int = 200, ef_search: int = 64):
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise RuntimeError("ANN backend 'hnsw' needs hnswlib: `pip install hnswlib`") from e
+        self._hnswlib = hnswlib
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.index = None
+
+    def build(self, matrix: np.ndarray) -> None:
+        n, dim = matrix.shape
+        self.index = self._hnswlib.Index(space="ip", dim=dim)
+        self.index.init_index(max_elements=max(n, 1), ef_construction=self.ef_construction, M=self.M)
+        self.index.add_items(np.asarray(matrix, dtype=np.float32), np.arange(n))
+        self.index.set_ef(self.ef_search)
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = min(k, self.index.get_current_count())
+        self.index.set_ef(max(self.ef_search, k))
+        labels, dists = self.index.knn_query(queries, k=k)
+        # hnswlib's "ip" distance is 1 - <q, x>
+        return labels.astype(np.int64), 1.0 - dists
+
+    def save(self, path: str) -> None:
+        self.index.save_index(path)
+
+    def load(self, path: str, matrix: np.ndarray) -> None:
+        self.index = self._hnswlib.Index(space="ip", dim=matrix.shape[1])
+        self.index.load_index(path, max_elements=matrix.shape[0])
+        self.index.set_ef(self.ef_search)
+
+
+class IvfPqIndex:
+    backend = "ivfpq"
+
+    def __init__(self, nlist: int | None = None, m: int = 48, nbits: int = 8, nprobe: int = 16, rerank: int = 4):
+        try:
+            import faiss
+        except ImportError as e:
+            raise RuntimeError("ANN backend 'ivfpq' needs faiss: `pip install faiss-cpu`") from e
+        self._faiss = faiss
+        self.nlist = nlist
+        self.m = m
+        self.nbits = nbits
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self.index = None
+        self.matrix: np.ndarray | None = None
+
+    def build(self, matrix: np.ndarray) -> None:
+        faiss = self._faiss
+        self.matrix = matrix
+        data = np.ascontiguousarray(matrix, dtype=np.float32)
+        n, dim = data.shape
+        if dim % self.m != 0:
+            raise ValueError(f"ivfpq: dim {dim} is not divisible by m={self.m}")
+        if n < 2 ** self.nbits:
+            raise ValueError(f"ivfpq: need at least {2 ** self.nbits} vectors to train nbits={self.nbits}")
+        # ~4*sqrt(N) lists, but keep >= 39 training points per centroid
+        nlist = self.nlist or int(4 * math.sqrt(n))
+        nlist = max(1, min(nlist, n // 39))
+        quantizer = faiss.IndexFlatIP(dim)
+        self.index = faiss.IndexIVFPQ(quantizer, dim, nlist, self.m, self.nbits, faiss.METRIC_INNER_PRODUCT)
+        self.index.train(data)
+        self.index.add(data)
+        self.index.nprobe = self.nprobe
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.ascontiguousarray(np.atleast_2d(queries), dtype=np.float32)
+        self.index.nprobe = self.nprobe
+        k = min(k, self.index.ntotal)
+        if self.rerank <= 1 or self.matrix is None:
+            scores, labels = self.index.search(queries, k)
+            return labels, scores
+
+        _, cand = self.index.search(queries, min(k * self.rerank, self.index.ntotal))
+        labels = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for row, (q, c) in enumerate(zip(queries, cand)):
+            c = np.sort(c[c >= 0])  # sorted rows read the memmap sequentially
+            exact = np.asarray(self.matrix[c], dtype=np.float32) @ q
+            order = np.argsort(-exact, kind="stable")[:k]
+            labels[row, : len(order)] = c[order]
+            scores[row, : len(order)] = exact[order]
+        return labels, scores
+
+    def save(self, path: str) -> None:
+        self._faiss.write_index(self.index, path)
+
+    def load(self, path: str, matrix: np.ndarray) -> None:
+        self.matrix = matrix
+        self.index = self._faiss.read_index(path)
+        self.index.nprobe = self.nprobe
+
+
+BACKENDS = {
+    "exact": ExactIndex,
+    "hnsw": HnswIndex,
+    "ivfpq": IvfPqIndex,
+}
+
+
+def make_index(backend: str = "exact", **params):
+    try:
+        cls = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown ANN backend '{backend}' (choose from {sorted(BACKENDS)})")
+    return cls(**params)
+
+
+def index_path(backend: str, model: str) -> str:
+    return os.path.join(EMBED_STORE_DIR, f"{model}.{backend}.ann")
+
+
+def load_or_build_index(backend: str, model: str, matrix: np.ndarray, keys: List[StoreKey], **params):
+    """Opens the persisted index if it was built from `keys`; otherwise builds and saves one."""
+    with store_lock(model):
+        return _load_or_build_index(backend, model, matrix, keys, **params)
+
+
+def _load_or_build_index(backend: str, model: str, matrix: np.ndarray, keys: List[StoreKey], **params):
+    index = make_index(backend, **params)
+    path = index_path(backend, model)
+    keys_path = f"{path}.keys.json"
+    try:
+        with open(keys_path, "r", encoding="utf-8") as f:
+            if [tuple(k) for k in json.load(f)] == list(keys):
+                index.load(path, matrix)
+                return index
+    except (OSError, ValueError, RuntimeError):
+        pass
+
+    index.build(matrix)
+    if backend != "exact":
+        os.makedirs(EMBED_STORE_DIR, exist_ok=True)
+        index.save(path)
+        with open(keys_path, "w", encoding="utf-8") as f:
+            json.dump([list(k) for k in keys], f)
+    return index
@@ -1,49 +1,106 @@
 from flask import Flask, request, jsonify
+from flask_cors import CORS
+from typing import Dict, List, Optional
+import os
+import threading
+import time
 
-app = Flask(__name__)
+import key_functions as kf
+from topic_progress import load_view
 
+app = Flask(__name__)
+CORS(app)
+
+# "sync" warms up at import (under Gunicorn with preload_app, once in the
+# master before workers fork), "background" warms up in a thread (flask run),
+# "off" leaves every structure to be built lazily
+API_WARMUP = os.getenv("API_WARMUP", "sync")
+# A failed warm-up is retried in the background, first after this many
+# seconds, doubling up to API_WARMUP_RETRY_MAX between attempts
+API_WARMUP_RETRY_DELAY = float(os.getenv("API_WARMUP_RETRY_DELAY") or 5)
+API_WARMUP_RETRY_MAX = float(os.getenv("API_WARMUP_RETRY_MAX") or 300)
+
+# ---- Warm-up ----
+
+WARMUP_STATUS: Dict = {
+    "state": "pending",  # pending -> warming -> ready | failed
+    "started_at": None,
+    "finished_at": None,
+    "steps": {},  # seconds per step
+    "error": None,
+    "attempts": 0,
+}
+_retry_thread: Optional[threading.Thread] = None
+
+
+def warm_up(retry: bool = True) -> None:
+    """Loads the corpus, embedding matrix, search indexes and caches once."""
+    WARMUP_STATUS.update(state="warming", started_at=time.time(), error=None)
+    WARMUP_STATUS["attempts"] += 1
+    try:
+        WARMUP_STATUS["steps"] = {name: round(s, 3) for name, s in kf.warm_up().items()}
+        WARMUP_STATUS["state"] = "ready"
+    except Exception as e:
+        WARMUP_STATUS.update(state="failed", error=str(e))
+        print(f"Warning: warm-up failed, structures will be built on first use: {e}")
+    WARMUP_STATUS["finished_at"] = time.time()
+    print(f"Warm-up {WARMUP_STATUS['state']}: {WARMUP_STATUS['steps']}")
+    if retry and WARMUP_STATUS["state"] == "failed":
+        start_warm_up_retry()
+
+
+def _retry_warm_up() -> None:
+    delay = API_WARMUP_RETRY_DELAY
+    while WARMUP_STATUS["state"] != "ready":
+        time.sleep(delay)
+        delay = min(2 * delay, API_WARMUP_RETRY_MAX)
+        print(f"Retrying warm-up (attempt {WARMUP_STATUS['attempts'] + 1})")
+        warm_up(retry=False)
+
+
+def start_warm_up_retry() -> None:
+    """Retries warm-up with backoff in a daemon thread until it succeeds (one thread per process)."""
+    global _retry_thread
+    # threads do not survive fork(), so a forked worker sees the master's thread as not alive
+    if _retry_thread is not None and _retry_thread.is_alive():
+        return
+    _retry_thread = threading.Thread(target=_retry_warm_up, name="warm-up-retry", daemon=True)
+    _retry_thread.start()
+
+
+if API_WARMUP == "sync":
+    warm_up()
+elif API_WARMUP == "background":
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
+# Liveness: the process is up
 @app.route('/api/health')
 def get_current_time():
     return {'health': 200}
 
 
-from typing import Dict, List, Literal
-
-# ✅ Dummy database (dictionary of topics to articles)
-DUMMY_ARTICLES: Dict[str, List[Dict[str, str]]] = {
-    "Space Farming": [
-        {
-            "ArticleTitle": "Growing Crops in Martian Soil",
-            "Author": "Dr. Jane Smith",
-            "Link": "https://nasa.gov/mars-agriculture"
-        },
-        {
-            "ArticleTitle": "Photosynthesis Efficiency in Microgravity",
-            "Author": "Dr. Alan Chen",
-            "Link": "https://nasa.gov/space-farming"
-        }
-    ],
-    "AI Robotics": [
-        {
-            "ArticleTitle": "Teaching Robots to Learn Like Humans",
-            "Author": "Dr. Maria Lopez",
-            "Link": "https://ai-research.org/robot-learning"
-        },
-        {
-            "ArticleTitle": "Ethics of Autonomous Systems",
-            "Author": "Prof. Henry Clark",
-            "Link": "https://ai-ethics.org/autonomous"
-        }
-    ]
-}
+# Readiness: 200 once warm-up has succeeded, 503 while it is running or being retried
+@app.route('/api/ready')
+def get_readiness():
+    status = dict(WARMUP_STATUS, articles=len(kf.titles), pid=os.getpid())
+    ready = status["state"] == "ready" or API_WARMUP == "off"
+    return jsonify(status), (200 if ready else 503)
+
+
+# Precomputed topic progress (topic_progress.py); one read for every dashboard bar
+@app.route('/api/progress')
+def get_topic_progress():
+    return jsonify(load_view())
+
 
 # 1️⃣ Get all articles for a given topic/progress bar
 @app.route('/api/articles')
-def get_articles_by_topic(topic: str) -> List[Dict[str, str]]:
+def get_articles_by_topic():
     """
-    Given a topic (progress bar name), return all related articles.
+    Given a topic (progress bar name), return the related articles.
 
-    Args:
+    Query params:
         topic (str): The name of the topic or progress bar.
 
     Returns:
@@ -54,190 +111,110 @@ def get_articles_by_topic(topic: str) -> List[Dict[str, str]]:
                     "Author": str,
                     "Link": str
                 }
-
-    Example:
-        [
-            {
-                "ArticleTitle": "Growing Crops in Martian Soil",
-                "Author": "Dr. Jane Smith",
-                "Link": "https://nasa.gov/mars-agriculture"
-            },
-            {
-                "ArticleTitle": "Photosynthesis Efficiency in Microgravity",
-                "Author": "Dr. Alan Chen",
-                "Link": "https://nasa.gov/space-farming"
-            }
-        ]
     """
     topic = request.args.get("topic")  # get topic from URL query string
 
     if not topic:
         return jsonify({"error": "Missing 'topic' query parameter"}), 400
 
-    # Get articles for that topic (case-insensitive)
-    articles = DUMMY_ARTICLES.get(topic) or DUMMY_ARTICLES.get(topic.title())
+    articles: List[Dict[str, str]] = kf.get_articles_by_topic(topic)
 
     if not articles:
         return jsonify({"message": f"No articles found for topic '{topic}'"}), 404
 
     return jsonify(articles)
 
-import random
+
 # 2️⃣ Compare methodology & results between two articles
 @app.route('/api/compare')
-def compare_articles(article1: str, article2: str) -> List[int]:
+def compare_articles():
     """
     Compare two articles' methodology and results using an LLM.
 
-    Args:
+    Query params:
         article1 (str): Title of the first article.
         article2 (str): Title of the second article.
 
     Returns:
-        List[int]:
-            [methodology_similarity, results_similarity]
-            Each value is an integer between 1–100.
-
-    Example:
-        [87, 73]
+        {"article1": str, "article2": str, "similarity": [methodology, results]}
+        Each similarity is an integer between 1–100.
     """
-    # Get article titles from query parameters
     article1 = request.args.get("article1")
     article2 = request.args.get("article2")
 
-    # Validate input
     if not article1 or not article2:
         return {"error": "Missing 'article1' or 'article2' query parameter"}, 400
 
-    # Dummy similarity scores (1-100)
-    methodology_similarity = random.randint(50, 100)
-    results_similarity = random.randint(50, 100)
+    try:
+        similarity = kf.compare_articles(article1, article2)
+    except kf.ArticleNotFound as e:
+        return {"error": str(e)}, 404
 
-    # Return as list
     return {
         "article1": article1,
         "article2": article2,
-        "similarity": [methodology_similarity, results_similarity]
+        "similarity": similarity
     }
 
 
 # 3️⃣ Get a deep descriptive explanation for similarity results
 @app.route('/api/deepdive')
-def get_comparison_deepdive(
-    article1: str,
-    article2: str,
-    section: Literal["methodology", "results"]
-) -> str:
+def get_comparison_deepdive():
     """
-    Provide a detailed explanation of *why* two articles received their similarity
-    scores for the specified section.
+    Explain *why* two articles received their similarity score for the
+    specified section.
 
-    Args:
+    Query params:
         article1 (str): Title of the first article.
         article2 (str): Title of the second article.
-        section (Literal["methodology", "results"]): The section to analyze.
+        section ("methodology" | "results"): The section to analyze.
 
     Returns:
-        str: A detailed natural-language comparison result.
-
-    Example:
-        "Both studies used CRISPR-based analysis but applied it to different 
-         species, which reduced methodological similarity despite similar 
-         objectives."
+        {"article1": str, "article2": str, "section": str, "deepdive": str}
     """
-    # Get query parameters
     article1 = request.args.get("article1")
     article2 = request.args.get("article2")
     section = request.args.get("section")
 
-    # Validate input
     if not article1 or not article2 or not section:
         return {"error": "Missing 'article1', 'article2', or 'section' query parameter"}, 400
 
     if section not in ["methodology", "results"]:
         return {"error": "Invalid 'section' value. Must be 'methodology' or 'results'"}, 400
 
-    # Dummy explanations
-    dummy_explanations = {
-        "methodology": [
-            f"Both studies used similar experimental setups, but {article2} included additional controls not present in {article1}.",
-            f"{article1} focused on in vitro experiments while {article2} conducted in vivo studies, affecting methodology similarity."
-        ],
-        "results": [
-            f"The outcomes of {article1} and {article2} overlapped partially, but differences in sample sizes caused variation in results similarity.",
-            f"{article1} reported metrics A and B, whereas {article2} emphasized metrics C and D, explaining the results similarity score."
-        ]
-    }
-
-    # Choose a pseudo-random explanation based on article names
-    idx = (sum(ord(c) for c in article1 + article2) % len(dummy_explanations[section]))
-    explanation = dummy_explanations[section][idx]
+    try:
+        explanation = kf.get_comparison_deepdive(article1, article2, section)
+    except kf.ArticleNotFound as e:
+        return {"error": str(e)}, 404
 
     return {"article1": article1, "article2": article2, "section": section, "deepdive": explanation}
 
 
-
 # 4️⃣ Get related articles for a single article
 @app.route('/api/related')
-def get_related_articles(article_title: str) -> List[Dict[str, str]]:
+def get_related_articles():
     """
     Given an article title, return related or similar articles.
 
-    Args:
+    Query params:
         article_title (str): Title of the article.
 
     Returns:
-        List[Dict[str, str]]:
-            Each dictionary represents a related article with:
-                {
-                    "ArticleTitle": str,
-                    "Author": str,
-                    "Link": str
-                }
-
-    Example:
-        [
-            {
-                "ArticleTitle": "Soil Nutrient Cycling in Low Gravity",
-                "Author": "Dr. L. Brown",
-                "Link": "https://nasa.gov/soil-gravity"
-            },
-            {
-                "ArticleTitle": "Hydroponic Growth Systems for Space Missions",
-                "Author": "Dr. P. Gomez",
-                "Link": "https://nasa.gov/hydroponics"
-            }
-        ]
+        {"article_title": str, "related_articles": [{"ArticleTitle", "Author", "Link"}, ...]}
     """
-    # Get the article title from query parameters
     article_title = request.args.get("article_title")
 
-    # Validate input
     if not article_title:
         return {"error": "Missing 'article_title' query parameter"}, 400
 
-    # Dummy related articles
-    DUMMY_RELATED = [
-        {
-            "ArticleTitle": f"{article_title} - Advanced Insights",
-            "Author": "Dr. L. Brown",
-            "Link": "https://nasa.gov/related1"
-        },
-        {
-            "ArticleTitle": f"{article_title} - Experimental Follow-up",
-            "Author": "Dr. P. Gomez",
-            "Link": "https://nasa.gov/related2"
-        },
-        {
-            "ArticleTitle": f"{article_title} - Comparative Study",
-            "Author": "Dr. K. Singh",
-            "Link": "https://nasa.gov/related3"
-        }
-    ]
-
-    return {"article_title": article_title, "related_articles": DUMMY_RELATED}
-
-
-
-    if __name__ == '__main__':
-        app.run(debug=True)
+    try:
+        related = kf.get_related_articles(article_title)
+    except kf.ArticleNotFound as e:
+        return {"error": str(e)}, 404
+
+    return {"article_title": article_title, "related_articles": related}
+
+
+if __name__ == '__main__':
+    # the reloader would re-import (and warm up) the app in a second process
+    app.run(debug=True, use_reloader=False)
@@ -0,0 +1,216 @@
+"""
+Columnar, read-only article store.
+
+Every text column is one contiguous UTF-8 buffer plus an int64 offset array
+(string i is buf[off[i]:off[i+1]]); paragraphs add a per-article pointer
+array into a flat paragraph column. flat_text (title. keywords. paragraphs),
+the string embeddings and prompts are built from, is computed once at build
+time. Columns are saved as plain .npy files and opened memory-mapped, so
+every worker on a host shares one copy of the corpus via the page cache
+instead of holding millions of separate str objects.
+
+The store is rebuilt from parsed_data.iter_articles() whenever papers.jsonl
+changes; it is the only persisted form of the parsed corpus.
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable, Iterator, List, Sequence
+import json
+import os
+import shutil
+
+import numpy as np
+
+from parsed_data import COLUMNS, PAPERS_PATH, iter_articles, source_signature
+
+ARTICLE_STORE_DIR = os.getenv("ARTICLE_STORE_DIR", "./article_store/")
+
+STRING_COLUMNS = ("paper_id", "title", "keywords", "paragraph", "heading", "flat_text")
+
+
+class StringColumn:
+    """Immutable sequence of strings backed by one byte buffer and offsets."""
+
+    __slots__ = ("buf", "offsets")
+
+    def __init__(self, buf: np.ndarray, offsets: np.ndarray):
+        self.buf = buf  # uint8
+        self.offsets = offsets  # (n + 1,) int64
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[str]) -> "StringColumn":
+        encoded = [(s or "").encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.buf[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def slice(self, start: int, stop: int) -> List[str]:
+        return [self[j] for j in range(start, stop)]
+
+
+class RaggedColumn:
+    """Per-article lists of strings: article i owns items ptr[i]:ptr[i+1] of `items`."""
+
+    __slots__ = ("items", "ptr")
+
+    def __init__(self, items: StringColumn, ptr: np.ndarray):
+        self.items = items
+        self.ptr = ptr  # (n + 1,) int64
+
+    @classmethod
+    def from_lists(cls, lists: Sequence[Sequence[str]]) -> "RaggedColumn":
+        ptr = np.zeros(len(lists) + 1, dtype=np.int64)
+        np.cumsum([len(x) for x in lists], out=ptr[1:])
+        return cls(StringColumn.from_strings(s for x in lists for s in x), ptr)
+
+    def __len__(self) -> int:
+        return len(self.ptr) - 1
+
+    def __getitem__(self, i: int) -> List[str]:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.items.slice(int(self.ptr[i]), int(self.ptr[i + 1]))
+
+    def __iter__(self) -> Iterator[List[str]]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+def flat_text(title: str, keywords: str, paragraphs: Iterable[str]) -> str:
+    return f"{title}. {keywords or ''}. {' '.join(p.strip() for p in paragraphs)}"
+
+
+class ArticleStore:
+    __slots__ = ("ids", "titles", "keywords", "paragraphs", "headings", "flat_texts", "signature")
+
+    def __init__(self, ids, titles, keywords, paragraphs, headings, flat_texts, signature=None):
+        self.ids: StringColumn = ids
+        self.titles: StringColumn = titles
+        self.keywords: StringColumn = keywords
+        self.paragraphs: RaggedColumn = paragraphs
+        self.headings: RaggedColumn = headings
+        self.flat_texts: StringColumn = flat_texts
+        self.signature = signature
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict], signature=None) -> "ArticleStore":
+        """Builds the store from parsed_data.iter_articles() records."""
+        columns: Dict[str, list] = {name: [] for name in COLUMNS}
+        for record in records:
+            for name in COLUMNS:
+                columns[name].append(record[name])
+        return cls.from_columns(columns, signature)
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, list], signature=None) -> "ArticleStore":
+        """Builds the store from parallel columns keyed like parsed_data.COLUMNS."""
+        paragraphs = RaggedColumn.from_lists(columns["paragraphs"])
+        headings = RaggedColumn(
+            StringColumn.from_strings(h for hs in columns["paragraph_headings"] for h in hs),
+            paragraphs.ptr,
+        )
+        return cls(
+            ids=StringColumn.from_strings(columns["paper_id"]),
+            titles=StringColumn.from_strings(columns["title"]),
+            keywords=StringColumn.from_strings(columns["keywords"]),
+            paragraphs=paragraphs,
+            headings=headings,
+            flat_texts=StringColumn.from_strings(
+                flat_text(t, k, ps)
+                for t, k, ps in zip(columns["title"], columns["keywords"], columns["paragraphs"])
+            ),
+            signature=signature,
+        )
+
+    def _columns(self) -> Dict[str, StringColumn]:
+        return {
+            "paper_id": self.ids,
+            "title": self.titles,
+            "keywords": self.keywords,
+            "paragraph": self.paragraphs.items,
+            "heading": self.headings.items,
+            "flat_text": self.flat_texts,
+        }
+
+    def save(self, directory: str = ARTICLE_STORE_DIR) -> None:
+        """Writes every column to a fresh directory, then swaps it into place."""
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        tmp = f"{os.path.abspath(directory).rstrip(os.sep)}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name, col in self._columns().items():
+            np.save(os.path.join(tmp, f"{name}.buf.npy"), col.buf)
+            np.save(os.path.join(tmp, f"{name}.off.npy"), col.offsets)
+        np.save(os.path.join(tmp, "paragraph.ptr.npy"), self.paragraphs.ptr)
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"signature": self.signature, "count": len(self)}, f)
+        old = f"{tmp}.old"
+        if os.path.exists(directory):
+            os.replace(directory, old)
+        os.replace(tmp, directory)
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def open(cls, directory: str = ARTICLE_STORE_DIR) -> "ArticleStore | None":
+        """Opens a saved store memory-mapped; None if missing or unreadable."""
+        try:
+            with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+
+            def load(name: str) -> StringColumn:
+                return StringColumn(
+                    np.load(os.path.join(directory, f"{name}.buf.npy"), mmap_mode="r"),
+                    np.load(os.path.join(directory, f"{name}.off.npy"), mmap_mode="r"),
+                )
+
+            ptr = np.load(os.path.join(directory, "paragraph.ptr.npy"), mmap_mode="r")
+            return cls(
+                ids=load("paper_id"),
+                titles=load("title"),
+                keywords=load("keywords"),
+                paragraphs=RaggedColumn(load("paragraph"), ptr),
+                headings=RaggedColumn(load("heading"), ptr),
+                flat_texts=load("flat_text"),
+                signature=meta.get("signature"),
+            )
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def load_article_store(path: str = PAPERS_PATH, directory: str = ARTICLE_STORE_DIR) -> ArticleStore:
+    """The saved store if it was built from the current papers.jsonl, else a fresh (saved) one."""
+    signature = source_signature(path)
+    store = ArticleStore.open(directory)
+    if store is not None and store.signature == signature:
+        return store
+
+    store = ArticleStore.from_records(iter_articles(path), signature)
+    print(f"Loaded {len(store)} unique articles by paper_id from {path}.")
+    try:
+        store.save(directory)
+        mapped = ArticleStore.open(directory)
+        if mapped is not None:
+            store = mapped
+    except OSError as e:
+        print(f"Warning: could not persist article store: {e}")
+    return store
@@ -0,0 +1,167 @@
+"""
+Token-aware batching for embedding requests.
+
+Inputs are measured with the model's real tokenizer, truncated to the
+per-input limit, and packed into as few requests as the per-request token
+and item limits allow. If the API rejects a batch, only that batch is split
+in half and retried; vectors always come back in input order. Callers that
+pass a `rejected` dict get None for inputs the API refuses on their own
+(with the error recorded there) instead of an EmbeddingError, so one bad
+input never costs the rest of the batch.
+"""
+from __future__ import annotations
+
+from typing import Awaitable, Callable, Dict, List, Sequence
+from functools import lru_cache
+import asyncio
+
+import openai
+import tiktoken
+
+# Limits for text-embedding-3-* (see OpenAI embeddings API reference)
+EMBED_MAX_INPUT_TOKENS = 8191
+EMBED_MAX_REQUEST_TOKENS = 300_000
+EMBED_MAX_REQUEST_ITEMS = 2048
+
+EmbedFn = Callable[[List[str]], Sequence[Sequence[float]]]
+# Async variant also receives the batch's token count (for TPM budgeting)
+AsyncEmbedFn = Callable[[List[str], int], Awaitable[Sequence[Sequence[float]]]]
+
+
+class EmbeddingError(RuntimeError):
+    """Raised when a single input cannot be embedded; `index` is its input position."""
+
+    def __init__(self, index: int, cause: Exception):
+        super().__init__(f"embedding failed for input {index}: {cause}")
+        self.index = index
+        self.cause = cause
+
+
+@lru_cache(maxsize=None)
+def _encoding() -> tiktoken.Encoding:
+    # text-embedding-3-* and ada-002 share cl100k_base
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str) -> int:
+    return len(_encoding().encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int = EMBED_MAX_INPUT_TOKENS) -> str:
+    toks = _encoding().encode(text, disallowed_special=())
+    if len(toks) <= max_tokens:
+        return text
+    return _encoding().decode(toks[:max_tokens])
+
+
+def pack_batches(
+    token_counts: Sequence[int],
+    *,
+    max_items: int = EMBED_MAX_REQUEST_ITEMS,
+    max_tokens: int = EMBED_MAX_REQUEST_TOKENS,
+) -> List[List[int]]:
+    """Greedily groups input positions into batches that respect both limits."""
+    batches: List[List[int]] = []
+    cur: List[int] = []
+    cur_tokens = 0
+    for i, n in enumerate(token_counts):
+        if cur and (len(cur) >= max_items or cur_tokens + n > max_tokens):
+            batches.append(cur)
+            cur, cur_tokens = [], 0
+        cur.append(i)
+        cur_tokens += n
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+def prepare_inputs(texts: Sequence[str]) -> tuple[List[str], List[int]]:
+    """Truncates every input to the per-input limit; returns (texts, token counts)."""
+    enc = _encoding()
+    prepared: List[str] = []
+    counts: List[int] = []
+    for t in texts:
+        toks = enc.encode(t or ".", disallowed_special=())
+        if len(toks) > EMBED_MAX_INPUT_TOKENS:
+            toks = toks[:EMBED_MAX_INPUT_TOKENS]
+            t = enc.decode(toks)
+        prepared.append(t or ".")
+        counts.append(len(toks))
+    return prepared, counts
+
+
+def embed_batched(
+    texts: Sequence[str],
+    embed_fn: EmbedFn,
+    rejected: Dict[int, Exception] | None = None,
+) -> List[List[float] | None]:
+    """
+    Embeds `texts` with as few `embed_fn` calls as the limits allow.
+    `embed_fn` takes a list of strings and returns one vector per string.
+    Without `rejected`, an input the API refuses raises EmbeddingError;
+    with it, that input is recorded there and its vector is None.
+    """
+    prepared, counts = prepare_inputs(texts)
+    out: List[List[float] | None] = [None] * len(prepared)
+
+    def run(idxs: List[int]) -> None:
+        try:
+            vectors = embed_fn([prepared[i] for i in idxs])
+        except openai.BadRequestError as e:
+            # Something in this batch was rejected: bisect to isolate it
+            if len(idxs) == 1:
+                if rejected is None:
+                    raise EmbeddingError(idxs[0], e) from e
+                rejected[idxs[0]] = e
+                return
+            mid = len(idxs) // 2
+            run(idxs[:mid])
+            run(idxs[mid:])
+            return
+        for i, v in zip(idxs, vectors):
+            out[i] = list(v)
+
+    for batch in pack_batches(counts):
+        run(batch)
+    return out
+
+
+async def embed_batched_async(
+    texts: Sequence[str],
+    embed_fn: AsyncEmbedFn,
+    rejected: Dict[int, Exception] | None = None,
+) -> List[List[float] | None]:
+    """
+    Like embed_batched, but all batches are in flight at once; pacing is left
+    to `embed_fn` (normally RequestScheduler.embed).
+    """
+    prepared, counts = prepare_inputs(texts)
+    out: List[List[float] | None] = [None] * len(prepared)
+
+    async def run(idxs: List[int]) -> None:
+        try:
+            vectors = await embed_fn([prepared[i] for i in idxs], sum(counts[i] for i in idxs))
+        except openai.BadRequestError as e:
+            if len(idxs) == 1:
+                if rejected is None:
+                    raise EmbeddingError(idxs[0], e) from e
+                rejected[idxs[0]] = e
+                return
+            mid = len(idxs) // 2
+            await asyncio.gather(run(idxs[:mid]), run(idxs[mid:]))
+            return
+        for i, v in zip(idxs, vectors):
+            out[i] = list(v)
+
+    await asyncio.gather(*(run(batch) for batch in pack_batches(counts)))
+    return out
+
+
+def openai_embed_fn(client: openai.OpenAI, model: str) -> EmbedFn:
+    """Adapts an OpenAI client into an EmbedFn, restoring response order by index."""
+
+    def fn(batch: List[str]) -> List[List[float]]:
+        resp = client.embeddings.create(model=model, input=batch)
+        return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+    return fn
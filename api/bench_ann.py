@@ -0,0 +1,108 @@
+"""
+Recall/latency benchmark for the ANN backends in ann_index.py.
+
+Queries are held-out rows of the embedding store with a little noise added,
+so they look like real topic embeddings rather than exact duplicates. The
+held-out rows are removed from the indexed matrix (otherwise every query
+would trivially find its own row). Recall@k is measured against exact
+search over the same remaining rows.
+
+Usage (from api/):
+    python bench_ann.py --backend hnsw --k 20 --param ef_search=32 --param ef_search=128
+    python bench_ann.py --backend ivfpq --build m=64 --param nprobe=8 --param nprobe=32
+    python bench_ann.py --synthetic 100000 --backend hnsw     # no store needed
+"""
+import argparse
+import time
+
+import numpy as np
+
+from ann_index import ExactIndex, make_index
+from embedding_store import load_store
+
+EMBED_MODEL = "text-embedding-3-small"
+
+
+def _unit_rows(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0.0] = 1.0
+    return (m / norms).astype(np.float32)
+
+
+def _parse_param(raw: str) -> tuple[str, int]:
+    name, value = raw.split("=", 1)
+    return name, int(value)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f.tolist()) & set(t.tolist())) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ANN recall@k and latency against exact search.")
+    parser.add_argument("--backend", default="hnsw", choices=["exact", "hnsw", "ivfpq"])
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--synthetic", type=int, default=0, help="benchmark on N random vectors instead of the store")
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--build", action="append", default=[],
+                        help="build-time knob, e.g. M=48 or m=64 (repeatable)")
+    parser.add_argument("--param", action="append", default=[],
+                        help="query-time knob to sweep, e.g. ef_search=64 or nprobe=16 (repeatable)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.synthetic:
+        matrix = _unit_rows(rng.standard_normal((args.synthetic, args.dim)))
+    else:
+        matrix, _ = load_store(EMBED_MODEL)
+        if matrix is None:
+            print("No embedding store found; pass --synthetic N to benchmark on random data.")
+            return
+        matrix = np.asarray(matrix)
+
+    n = matrix.shape[0]
+    if n < 2:
+        parser.error(f"need at least 2 vectors to hold out queries from, got {n}")
+    if args.queries < 1:
+        parser.error("--queries must be at least 1")
+    picks = rng.choice(n, size=min(args.queries, n // 2), replace=False)
+    queries = _unit_rows(matrix[picks] + 0.05 * rng.standard_normal((len(picks), matrix.shape[1])))
+    held_out = np.zeros(n, dtype=bool)
+    held_out[picks] = True
+    matrix = np.ascontiguousarray(matrix[~held_out])
+    n = matrix.shape[0]
+
+    exact = ExactIndex()
+    exact.build(matrix)
+    started = time.perf_counter()
+    truth, _ = exact.search(queries, args.k)
+    exact_ms = (time.perf_counter() - started) * 1000 / len(queries)
+    print(f"{n} vectors x {matrix.shape[1]} dims, {len(queries)} queries, k={args.k}")
+    print(f"exact: {exact_ms:.3f} ms/query (batched)")
+
+    sweeps = [dict([_parse_param(p)]) for p in args.param] or [{}]
+    index = make_index(args.backend, **dict(_parse_param(p) for p in args.build))
+    started = time.perf_counter()
+    index.build(matrix)
+    print(f"{args.backend}: built in {time.perf_counter() - started:.2f}s")
+
+    for knobs in sweeps:
+        for name, value in knobs.items():
+            setattr(index, name, value)
+        latencies = []
+        found = []
+        for q in queries:
+            t0 = time.perf_counter()
+            labels, _ = index.search(q, args.k)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            found.append(labels[0])
+        lat = np.asarray(latencies)
+        label = ", ".join(f"{k}={v}" for k, v in knobs.items()) or "defaults"
+        print(f"  [{label}] recall@{args.k}={recall_at_k(np.asarray(found), truth):.4f} "
+              f"p50={np.percentile(lat, 50):.3f}ms p95={np.percentile(lat, 95):.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
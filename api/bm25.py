@@ -0,0 +1,195 @@
+"""
+Lexical BM25 index over the article corpus.
+
+One document per article: title and keyword terms are counted with extra
+weight (a cheap BM25F) alongside every paragraph from parsed_data. Postings
+are stored CSR-style in flat numpy arrays, so a query is a handful of
+vectorised scatter-adds and the whole index saves to a single .npz that
+loads in milliseconds. No network needed, so it backs topic search when
+embeddings are unavailable and adds a lexical signal to hybrid ranking.
+
+Build it offline (from api/) with `python bm25.py`, or let key_functions
+build it lazily on first use.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", "./bm25_index.npz")
+
+K1 = 1.2
+B = 0.75
+TITLE_BOOST = 3
+KEYWORDS_BOOST = 2
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "their this to was were which with we our these those than then also".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall((text or "").lower()) if len(t) > 1 and t not in _STOPWORDS]
+
+
+def corpus_fingerprint(ids, titles, keywords, paragraphs) -> str:
+    """Changes whenever any indexed text changes; used to detect a stale index."""
+    h = hashlib.sha256()
+    for fields in zip(ids, titles, keywords, paragraphs):
+        for part in (*fields[:3], *fields[3]):
+            h.update((part or "").encode("utf-8"))
+            h.update(b"\x1f")
+        h.update(b"\x1e")
+    return h.hexdigest()
+
+
+class BM25Index:
+    __slots__ = ("ids", "vocab", "term_ptr", "postings", "tfs", "doc_len", "avgdl", "fingerprint")
+
+    def __init__(self, ids, vocab, term_ptr, postings, tfs, doc_len, fingerprint: str = ""):
+        self.ids: List[str] = list(ids)
+        self.vocab: Dict[str, int] = vocab
+        self.term_ptr = term_ptr  # (V + 1,) int64 offsets into postings/tfs
+        self.postings = postings  # doc index per posting, int32
+        self.tfs = tfs  # weighted term frequency per posting, float32
+        self.doc_len = doc_len  # (N,) float32
+        self.avgdl = float(doc_len.mean()) if len(doc_len) else 0.0
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, ids: Sequence[str], docs: Sequence[Counter], fingerprint: str = "") -> "BM25Index":
+        """`docs[i]` maps term -> (weighted) frequency for document ids[i]."""
+        per_term: Dict[str, List[Tuple[int, float]]] = {}
+        doc_len = np.zeros(len(docs), dtype=np.float32)
+        for d, counts in enumerate(docs):
+            doc_len[d] = sum(counts.values())
+            for term, tf in counts.items():
+                per_term.setdefault(term, []).append((d, tf))
+
+        vocab: Dict[str, int] = {}
+        term_ptr = np.zeros(len(per_term) + 1, dtype=np.int64)
+        n_postings = sum(len(p) for p in per_term.values())
+        postings = np.empty(n_postings, dtype=np.int32)
+        tfs = np.empty(n_postings, dtype=np.float32)
+        pos = 0
+        for t, (term, plist) in enumerate(per_term.items()):
+            vocab[term] = t
+            for d, tf in plist:
+                postings[pos] = d
+                tfs[pos] = tf
+                pos += 1
+            term_ptr[t + 1] = pos
+        return cls(ids, vocab, term_ptr, postings, tfs, doc_len, fingerprint)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score for every document (0 where no query term occurs)."""
+        out = np.zeros(len(self.ids), dtype=np.float32)
+        n = len(self.ids)
+        for term in set(tokenize(query)):
+            t = self.vocab.get(term)
+            if t is None:
+                continue
+            lo, hi = self.term_ptr[t], self.term_ptr[t + 1]
+            docs = self.postings[lo:hi]
+            tf = self.tfs[lo:hi]
+            df = hi - lo
+            idf = np.log1p((n - df + 0.5) / (df + 0.5))
+            norm = K1 * (1.0 - B + B * self.doc_len[docs] / (self.avgdl or 1.0))
+            out[docs] += idf * tf * (K1 + 1.0) / (tf + norm)
+        return out
+
+    def search(self, query: str, k: int = 20) -> List[Tuple[int, float]]:
+        """Top-k (doc index, score) with score > 0, best first."""
+        s = self.scores(query)
+        hits = np.flatnonzero(s > 0)
+        if hits.size == 0:
+            return []
+        k = min(k, hits.size)
+        top = hits[np.argpartition(-s[hits], k - 1)[:k]]
+        top = top[np.argsort(-s[top], kind="stable")]
+        return [(int(i), float(s[i])) for i in top]
+
+    def save(self, path: str = BM25_INDEX_PATH) -> None:
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp,
+            meta=np.asarray(json.dumps({"ids": self.ids, "vocab": self.vocab, "fingerprint": self.fingerprint})),
+            term_ptr=self.term_ptr,
+            postings=self.postings,
+            tfs=self.tfs,
+            doc_len=self.doc_len,
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = BM25_INDEX_PATH) -> "BM25Index | None":
+        try:
+            with np.load(path) as data:
+                meta = json.loads(str(data["meta"]))
+                return cls(
+                    meta["ids"], meta["vocab"], data["term_ptr"], data["postings"],
+                    data["tfs"], data["doc_len"], meta.get("fingerprint", ""),
+                )
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+def article_terms(title: str, keywords: str, paragraphs: Iterable[str]) -> Counter:
+    counts: Counter = Counter()
+    for term in tokenize(title):
+        counts[term] += TITLE_BOOST
+    for term in tokenize(keywords):
+        counts[term] += KEYWORDS_BOOST
+    for p in paragraphs:
+        counts.update(tokenize(p))
+    return counts
+
+
+def build_corpus_index(
+    ids: Sequence[str],
+    titles: Sequence[str],
+    keywords: Sequence[str],
+    paragraphs: Sequence[Sequence[str]],
+    fingerprint: str = "",
+) -> BM25Index:
+    docs = [article_terms(t, k or "", ps) for t, k, ps in zip(titles, keywords, paragraphs)]
+    return BM25Index.build(ids, docs, fingerprint)
+
+
+def load_or_build(ids, titles, keywords, paragraphs, path: str = BM25_INDEX_PATH) -> BM25Index:
+    """Loads the saved index if it matches the corpus, otherwise rebuilds and saves it."""
+    fingerprint = corpus_fingerprint(ids, titles, keywords, paragraphs)
+    index = BM25Index.load(path)
+    if index is not None and index.fingerprint == fingerprint:
+        return index
+    index = build_corpus_index(ids, titles, keywords, paragraphs, fingerprint)
+    try:
+        index.save(path)
+    except OSError as e:
+        print(f"Warning: could not save BM25 index: {e}")
+    return index
+
+
+def main():
+    import time
+    from embeddings_create import data_export
+
+    ids, titles, keywords, paragraphs = data_export()
+    started = time.monotonic()
+    fingerprint = corpus_fingerprint(ids, titles, keywords, paragraphs)
+    index = build_corpus_index(ids, titles, keywords, paragraphs, fingerprint)
+    index.save()
+    print(f"Indexed {len(ids)} articles, {len(index.vocab)} terms, {len(index.postings)} postings "
+          f"in {time.monotonic() - started:.2f}s -> {BM25_INDEX_PATH}")
+
+
+if __name__ == '__main__':
+    main()
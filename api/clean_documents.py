@@ -3,10 +3,6 @@ import math
 import unicodedata
 from typing import Iterable, List, Any
 
-# Rough, conservative char cap so inputs won't exceed embedding token limits.
-# (OpenAI counts tokens, not chars; this cap errs on the safe side.)
-_DEFAULT_MAX_CHARS = 24000
-
 # Precompiled regexes
 _CTRL_CHARS = re.compile(r"[\x00-\x1F\x7F]")  # ASCII control chars
 _HSPACE     = re.compile(r"[ \t\f\v]+")       # horizontal whitespace runs
@@ -31,7 +27,7 @@ def _to_text(x: Any) -> str:
 def clean_documents(
     documents: Iterable[Any],
     *,
-    max_chars: int = _DEFAULT_MAX_CHARS
+    max_chars: int | None = None
 ) -> List[str]:
     """
     Make documents safe for OpenAI embeddings:
@@ -41,7 +37,8 @@ def clean_documents(
       - Remove ASCII control characters
       - Collapse whitespace; trim ends
       - Ensure non-empty (fallback ".")
-      - Cap length to avoid token-limit errors
+      - Optionally cap length in chars (token limits are enforced by
+        batch_embed with the real tokenizer)
     """
     cleaned: List[str] = []
     for doc in documents:
@@ -64,8 +61,8 @@ def clean_documents(
         if not s:
             s = "."
 
-        # Conservative length cap (char proxy for token budget)
-        if len(s) > max_chars:
+        # Optional char cap; token budgets are handled in batch_embed
+        if max_chars is not None and len(s) > max_chars:
             s = s[:max_chars].rstrip()
 
         cleaned.append(s)
@@ -0,0 +1,118 @@
+"""
+Persistent on-disk store for article embeddings.
+
+Vectors live in a float32 .npy file that is opened memory-mapped, so every
+worker on the host shares the same page-cache copy. A JSON sidecar index
+records, per row, the paper_id and a hash of the embedded text + model;
+a stored row is only reused while both still match.
+
+Writers serialize on a per-model lock file (store_lock), so when several
+workers find the store stale only the first one embeds; the rest wait and
+then load what it wrote.
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+import hashlib
+import json
+import os
+import uuid
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, single-process dev servers only
+    fcntl = None
+
+EMBED_STORE_DIR = os.getenv("EMBED_STORE_DIR", "./embeddings/")
+
+StoreKey = Tuple[str, str]  # (paper_id, content hash)
+
+
+def content_hash(text: str, model: str) -> str:
+    h = hashlib.sha256()
+    h.update(model.encode("utf-8"))
+    h.update(b"\0")
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _index_path(model: str) -> str:
+    return os.path.join(EMBED_STORE_DIR, f"{model}.index.json")
+
+
+@contextmanager
+def store_lock(model: str) -> Iterator[None]:
+    """Exclusive cross-process lock for building and writing `model`'s store."""
+    try:
+        os.makedirs(EMBED_STORE_DIR, exist_ok=True)
+        f = open(os.path.join(EMBED_STORE_DIR, f"{model}.lock"), "a")
+    except OSError as e:
+        # saving will fail the same way; still let the caller build in memory
+        print(f"Warning: could not open embedding store lock: {e}")
+        yield
+        return
+    with f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def load_store(model: str) -> Tuple[np.ndarray | None, List[StoreKey]]:
+    """
+    Returns (matrix, keys). `matrix` is a read-only memmap of shape
+    (len(keys), dim), or None if nothing usable is on disk.
+    """
+    try:
+        with open(_index_path(model), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        matrix = np.load(os.path.join(EMBED_STORE_DIR, index["file"]), mmap_mode="r")
+    except (OSError, ValueError, KeyError):
+        return None, []
+
+    keys = [(pid, h) for pid, h in index.get("keys", [])]
+    if matrix.dtype != np.float32 or matrix.ndim != 2 or matrix.shape[0] != len(keys):
+        return None, []
+    return matrix, keys
+
+
+def save_store(model: str, matrix: np.ndarray, keys: List[StoreKey]) -> None:
+    """
+    Writes a new generation of the store. The .npy file gets a unique name and
+    the index is swapped in with os.replace, so readers never see a torn pair.
+    Call with store_lock(model) held.
+    """
+    assert matrix.shape[0] == len(keys)
+    os.makedirs(EMBED_STORE_DIR, exist_ok=True)
+
+    npy_name = f"{model}.{uuid.uuid4().hex[:12]}.npy"
+    np.save(os.path.join(EMBED_STORE_DIR, npy_name), np.ascontiguousarray(matrix, dtype=np.float32))
+
+    index = {
+        "model": model,
+        "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+        "file": npy_name,
+        "keys": [list(k) for k in keys],
+    }
+    tmp = f"{_index_path(model)}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp, _index_path(model))
+
+    # Drop generations older than the one the index now names; workers still
+    # mapping them keep their pages
+    written_at = os.path.getmtime(os.path.join(EMBED_STORE_DIR, npy_name))
+    for name in os.listdir(EMBED_STORE_DIR):
+        if name.startswith(f"{model}.") and name.endswith(".npy") and name != npy_name:
+            path = os.path.join(EMBED_STORE_DIR, name)
+            try:
+                if os.path.getmtime(path) <= written_at:
+                    os.remove(path)
+            except OSError:
+                pass
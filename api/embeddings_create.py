@@ -1,3 +1,5 @@
+import argparse
+import asyncio
 import chromadb
 from chromadb.api.client import Client
 import os
@@ -6,7 +8,10 @@ from dotenv import load_dotenv
 import sys
 from relevance_score import computeProgress
 from clean_documents import clean_documents
-from parsed_data import article_content
+from batch_embed import embed_batched_async
+from request_scheduler import scheduler
+from parsed_data import load_articles, load_columns
+from ingest_manifest import IngestDelta, diff_manifest, load_manifest, paragraph_record_id, save_manifest, INGEST_MANIFEST_PATH
 from pprint import pprint
 
 sys.path.insert(0, '..')
@@ -16,15 +21,20 @@ load_dotenv()
 CHROMA_HOST = os.getenv("CHROMA_HOST", "localhost")
 CHROMA_PORT = int(os.getenv("CHROMA_PORT") or 8000)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+EMBED_MODEL = "text-embedding-3-small"
 openai_ef = embedding_functions.OpenAIEmbeddingFunction(
                 api_key=OPENAI_API_KEY,
-                model_name="text-embedding-3-small"
+                model_name=EMBED_MODEL
             )
 client = chromadb.PersistentClient(path='./chroma/')
 
 # number of relevant articles to retrieve for comparison
 N = 30
 
+# every paper's paragraphs live here, keyed by metadata paper_id
+PARAGRAPH_COLLECTION = "article_paragraphs"
+COLLECTION_NAMES = ["article_titles", "article_keywords", PARAGRAPH_COLLECTION]
+
 dummy_docs = [
     "A group of vibrant parrots chatter loudly, sharing stories of their tropical adventures.",
     "The mathematician found solace in numbers, deciphering the hidden patterns of the universe.",
@@ -38,30 +48,118 @@ dummy_docs = [
     "In the quantum realm, particles flicker in and out of existence, dancing to the tunes of probability."   
 ]
 
-def create_embeddings(documents: list[str], collection_name: str, ids: list[str]) -> None:
-    # Clean documents but preserve original text content for embeddings
-    documents = clean_documents(documents)
-    try:
-        vectors = openai_ef(documents)
+def _log_embedding_error(index: int, cause: Exception, documents: list[str], ids: list[str]) -> None:
+    print(f"EXCEPTION OCCURED IN `create_embeddings`, exception is {cause}\n")
+    with open('error_content.txt', 'a') as f:
+        f.write('===================================================\n')
+        f.write(f'id: \t{ids[index]}\n')
+        f.write(f'document: \t{documents[index]}\n')
+
 
-        collection = client.create_collection(name=collection_name)
-        collection.add(
-            ids=ids,
-            documents=documents,
-            embeddings=vectors
+def add_embeddings(
+    collection_name: str,
+    ids: list[str],
+    documents: list[str],
+    vectors: list[list[float]],
+    metadatas: list[dict] | None = None,
+) -> None:
+    collection = client.get_or_create_collection(name=collection_name)
+    # Chroma caps how many records a single upsert() may carry
+    step = client.get_max_batch_size()
+    for start in range(0, len(ids), step):
+        end = start + step
+        collection.upsert(
+            ids=ids[start:end],
+            documents=documents[start:end],
+            embeddings=vectors[start:end],
+            metadatas=metadatas[start:end] if metadatas is not None else None
+        )
+
+
+async def _embed_and_add(
+    collection_name: str,
+    ids: list[str],
+    documents: list[str],
+    metadatas: list[dict] | None = None,
+) -> list[int]:
+    """
+    Embeds and upserts `documents`, returning the positions that failed
+    (logged). A document the API rejects is isolated by bisection and left
+    out; every other vector is still added. Any other error fails the group.
+    """
+    rejected: dict[int, Exception] = {}
+    try:
+        vectors = await embed_batched_async(
+            documents,
+            lambda batch, n_tokens: scheduler.embed(EMBED_MODEL, batch, n_tokens),
+            rejected=rejected,
         )
     except Exception as e:
-        print(f"EXCEPTION OCCURED IN `create_embeddings`, exception is {e}\n")
-        with open('error_content.txt', 'w') as f:
-            for i, doc in enumerate(documents):
-                try:
-                    vectors = openai_ef([doc])
-                except Exception as e:
-                    print('===================================================\n')
-                    print(f'Error occured at below file\n')
-                    print(f'i: \t{i}\n')
-                    print(f'id: \t{ids[i]}\n')
-                    print(f'document: \t{doc}\n')
+        print(f"EXCEPTION OCCURED IN `create_embeddings` for {collection_name}, exception is {e}\n")
+        return list(range(len(ids)))
+
+    for i, cause in sorted(rejected.items()):
+        _log_embedding_error(i, cause, documents, ids)
+    keep = [i for i in range(len(ids)) if vectors[i] is not None]
+    add_embeddings(
+        collection_name,
+        [ids[i] for i in keep],
+        [documents[i] for i in keep],
+        [vectors[i] for i in keep],
+        [metadatas[i] for i in keep] if metadatas is not None else None,
+    )
+    return sorted(rejected)
+
+
+async def create_embeddings(documents: list[str], collection_name: str, ids: list[str]) -> list[int]:
+    """Embeds and upserts `documents`; returns the positions that failed (logged)."""
+    if not ids:
+        return []
+    # Clean documents but preserve original text content for embeddings
+    return await _embed_and_add(collection_name, ids, clean_documents(documents))
+
+
+async def create_paragraph_embeddings(records: list[tuple[str, int, str, str]]) -> list[int]:
+    """
+    Embeds (paper_id, paragraph_index, heading, text) records in one packed
+    pass (a few dozen requests for the whole corpus, all in flight under the
+    scheduler) into the single PARAGRAPH_COLLECTION, tagged with paper_id /
+    heading / paragraph_index so queries can filter to a set of articles with
+    one `where` clause. Returns the positions of records that failed.
+    """
+    if not records:
+        return []
+    flat_ids = [paragraph_record_id(id, j) for id, j, _, _ in records]
+    flat_meta = [{"paper_id": id, "heading": heading, "paragraph_index": j} for id, j, heading, _ in records]
+    flat_docs = clean_documents(text for _, _, _, text in records)
+    return await _embed_and_add(PARAGRAPH_COLLECTION, flat_ids, flat_docs, flat_meta)
+
+
+def delete_papers(paper_ids: list[str]) -> None:
+    """Drops every title, keyword and paragraph record of the given papers."""
+    step = client.get_max_batch_size()
+    for start in range(0, len(paper_ids), step):
+        chunk = paper_ids[start:start + step]
+        client.get_or_create_collection(name="article_titles").delete(ids=chunk)
+        client.get_or_create_collection(name="article_keywords").delete(ids=chunk)
+        client.get_or_create_collection(name=PARAGRAPH_COLLECTION).delete(where={"paper_id": {"$in": chunk}})
+
+
+def delete_paragraphs(record_ids: list[str]) -> None:
+    step = client.get_max_batch_size()
+    collection = client.get_or_create_collection(name=PARAGRAPH_COLLECTION)
+    for start in range(0, len(record_ids), step):
+        collection.delete(ids=record_ids[start:start + step])
+
+
+def reset_collections() -> None:
+    """Deletes the ingest collections and manifest so the next ingest starts from scratch."""
+    existing = {getattr(c, "name", c) for c in client.list_collections()}
+    for name in COLLECTION_NAMES:
+        if name in existing:
+            client.delete_collection(name=name)
+    if os.path.exists(INGEST_MANIFEST_PATH):
+        os.remove(INGEST_MANIFEST_PATH)
 
 
 def get_relevant_articles(query: str, N: int):
@@ -113,27 +211,91 @@ def compute_score(query: str, collection_name: str, relevant_ids: list[str], N:
     # return np.average(progresses)
 
 def data_export() -> tuple[list[str], list[str], list[str], list[list[str]]]:
-    ids = [article['paper_id'] for article in article_content]
-    titles = [article['title'] for article in article_content]
-    keywords = [article['keywords'] if "keywords" in article.keys() else "" for article in article_content]
-    paragraphs = [article['paragraphs'] for article in article_content]
-    return ids, titles, keywords, paragraphs
+    columns = load_columns()
+    return columns['paper_id'], columns['title'], columns['keywords'], columns['paragraphs']
+
+async def ingest(
+    ids: list[str],
+    titles: list[str],
+    keywords: list[str],
+    paragraphs: list[list[str]],
+    headings: list[list[str]],
+    dry_run: bool = False,
+    full: bool = False,
+) -> IngestDelta:
+    """
+    Incremental ingest: diffs the corpus against the manifest, deletes removed
+    papers and trailing paragraphs, then embeds only new/changed titles,
+    keywords and paragraphs concurrently through the scheduler. With no
+    manifest this is a full ingest. The manifest is advanced for every record
+    that embedded, so only the failed ones are retried next run.
+    `full` drops the collections first and re-embeds everything.
+    """
+    if full and not dry_run:
+        reset_collections()
+    manifest = {} if full else load_manifest(EMBED_MODEL)
+    delta = diff_manifest(manifest, ids, titles, keywords, paragraphs, headings, EMBED_MODEL)
+    print(delta.report())
+    if dry_run or delta.is_empty:
+        return delta
+
+    delete_papers(delta.removed_papers)
+    delete_paragraphs(delta.paragraph_deletes)
+
+    titles_failed, keywords_failed, paragraphs_failed = await asyncio.gather(
+        create_embeddings(
+            documents=[titles[i] for i in delta.title_idxs],
+            collection_name="article_titles",
+            ids=[ids[i] for i in delta.title_idxs],
+        ),
+        create_embeddings(
+            documents=[keywords[i] for i in delta.keyword_idxs],
+            collection_name="article_keywords",
+            ids=[ids[i] for i in delta.keyword_idxs],
+        ),
+        create_paragraph_embeddings(
+            [(ids[i], j, headings[i][j], paragraphs[i][j]) for i, j in delta.paragraph_upserts]
+        ),
+    )
+
+    # failed records keep their previous hash (or none) so the next run redoes
+    # just them; everything that embedded is committed to the manifest
+    for field, failed, idxs in (
+        ("title", titles_failed, delta.title_idxs),
+        ("keywords", keywords_failed, delta.keyword_idxs),
+    ):
+        for pos in failed:
+            pid = ids[idxs[pos]]
+            delta.manifest[pid][field] = manifest.get(pid, {}).get(field)
+    for pos in paragraphs_failed:
+        i, j = delta.paragraph_upserts[pos]
+        old_paras = manifest.get(ids[i], {}).get("paragraphs") or []
+        delta.manifest[ids[i]]["paragraphs"][j] = old_paras[j] if j < len(old_paras) else None
+    n_failed = len(titles_failed) + len(keywords_failed) + len(paragraphs_failed)
+    if n_failed:
+        print(f"{n_failed} records failed to embed (see error_content.txt); they will be retried next run")
+
+    save_manifest(delta.manifest, EMBED_MODEL)
+    return delta
 
 def main():
+    parser = argparse.ArgumentParser(description="Embed new/changed papers into Chroma.")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be embedded/deleted")
+    parser.add_argument("--full", action="store_true", help="drop the collections and re-embed everything")
+    args = parser.parse_args()
 
     # pprint(f'length is {len(article_content)}')
     # pprint(article_content[0])
 
     # return
 
-    embeddings_generated = False
-    # possible collection names
-    collection_names = ["article_titles", "article_keywords", "article_paragraphs"]
+    article_content = load_articles()
     
     ids = [article['paper_id'] for article in article_content]
     titles = [article['title'] for article in article_content]
     keywords = [article['keywords'] if "keywords" in article.keys() else "" for article in article_content]
     paragraphs = [article['paragraphs'] for article in article_content]
+    headings = [article['paragraph_headings'] for article in article_content]
 
     # check keys are unique identifier
     assert len(set(ids)) == len(ids) == len(article_content)
@@ -145,6 +307,7 @@ def main():
     assert all([len(ps) >= 1 for ps in paragraphs])
     assert isinstance(paragraphs, list)
     assert all(isinstance(ps, list) for ps in paragraphs) and all(isinstance(p, str) for ps in paragraphs for p in ps)
+    assert all(len(hs) == len(ps) for hs, ps in zip(headings, paragraphs))
 
     # pprint.pprint(len(paragraphs[43]))
     # pprint.pprint(keywords)
@@ -152,15 +315,7 @@ def main():
     # with open("article_content.txt", "w", encoding='utf-8') as f:
     #     f.write(pprint.PrettyPrinter().pformat(titles)) 
 
-    if not embeddings_generated:
-        create_embeddings(documents=titles, collection_name="article_titles", ids=ids)
-        create_embeddings(documents=keywords, collection_name="article_keywords", ids=ids)
-        for i, id in enumerate(ids):
-            create_embeddings(
-                documents=paragraphs[i], 
-                collection_name=f"article_paragraphs_{id}", 
-                ids=[f'{id}_paragraph_num_{j}' for j in range(len(paragraphs[i]))]
-            )
+    asyncio.run(ingest(ids, titles, keywords, paragraphs, headings, dry_run=args.dry_run, full=args.full))
     return
     
     # Computer progress score
@@ -0,0 +1,57 @@
+"""
+Gunicorn settings for the API (run from api/):
+
+    gunicorn -c gunicorn.conf.py api:app
+
+preload_app imports api.py once in the master, which warms up key_functions
+(corpus store, embedding matrix, search indexes, section cache) before any
+worker forks. Workers inherit that state copy-on-write: the article columns
+and embedding store are read-only memmaps shared through the page cache, and
+the objects built at boot are moved out of the garbage collector's reach so
+collections in the workers do not dirty (and copy) their pages.
+
+OPENAI_RPM / OPENAI_TPM are the account's limits. Each worker rate-limits
+its own calls, so post_fork gives every worker an equal share of them.
+"""
+import gc
+import multiprocessing
+import os
+import sys
+
+bind = os.getenv("API_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY") or multiprocessing.cpu_count() * 2 + 1)
+# Sync workers: the request path runs its own asyncio loops for batched LLM calls
+worker_class = "sync"
+preload_app = True
+# Comparisons and section synthesis wait on the LLM
+timeout = int(os.getenv("API_TIMEOUT") or 120)
+
+
+def when_ready(server):
+    # Everything built during warm-up lives until shutdown; freeze it so the
+    # workers' GC passes never touch (and copy) those pages
+    gc.freeze()
+    server.log.info(f"Warm-up done, {gc.get_freeze_count()} objects frozen before fork")
+
+
+def post_fork(server, worker):
+    # HTTP connection pools must not be shared across processes
+    import key_functions as kf
+    from openai import OpenAI
+    from request_scheduler import DEFAULT_RPM, DEFAULT_TPM, scheduler
+
+    kf.client = OpenAI(api_key=kf.OPENAI_API_KEY)
+    relevance_score = sys.modules.get("relevance_score")
+    if relevance_score is not None:
+        relevance_score._client = None  # recreated on first use
+
+    # the buckets are per process; split the account budget between the workers
+    share = max(1, server.cfg.workers)
+    scheduler.set_limits(DEFAULT_RPM / share, DEFAULT_TPM / share)
+
+    # the master's retry thread did not survive the fork; keep retrying here.
+    # Builds of the shared on-disk store serialize on its lock file, so only
+    # the first worker to retry embeds; the others load what it saved
+    import api
+    if api.WARMUP_STATUS["state"] == "failed":
+        api.start_warm_up_retry()
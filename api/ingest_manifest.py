@@ -0,0 +1,119 @@
+"""
+Manifest of what is already embedded in Chroma, for incremental ingest.
+
+For every paper_id it records a content hash of the title, the keywords and
+each paragraph (text + heading, in order). Diffing the current corpus
+against it yields exactly which Chroma records need (re-)embedding and which
+should be deleted, so a corpus refresh only pays for what changed.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+import json
+import os
+
+from embedding_store import content_hash
+
+INGEST_MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH", "./chroma/ingest_manifest.json")
+
+# {paper_id: {"title": hash, "keywords": hash, "paragraphs": [hash, ...]}}
+Manifest = Dict[str, dict]
+
+
+def paragraph_record_id(paper_id: str, j: int) -> str:
+    return f"{paper_id}_paragraph_num_{j}"
+
+
+def paper_hashes(title: str, keywords: str, paragraphs: Sequence[str], headings: Sequence[str], model: str) -> dict:
+    return {
+        "title": content_hash(title or "", model),
+        "keywords": content_hash(keywords or "", model),
+        "paragraphs": [content_hash(f"{h}\x1f{p}", model) for p, h in zip(paragraphs, headings)],
+    }
+
+
+def load_manifest(model: str, path: str = INGEST_MANIFEST_PATH) -> Manifest:
+    """The saved manifest for `model`; empty if missing or built for another model."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("model") != model:
+        return {}
+    return data.get("papers", {})
+
+
+def save_manifest(manifest: Manifest, model: str, path: str = INGEST_MANIFEST_PATH) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"model": model, "papers": manifest}, f)
+    os.replace(tmp, path)
+
+
+@dataclass
+class IngestDelta:
+    new_papers: List[str] = field(default_factory=list)
+    changed_papers: List[str] = field(default_factory=list)
+    removed_papers: List[str] = field(default_factory=list)
+    title_idxs: List[int] = field(default_factory=list)  # article indices to (re-)embed
+    keyword_idxs: List[int] = field(default_factory=list)
+    paragraph_upserts: List[Tuple[int, int]] = field(default_factory=list)  # (article idx, paragraph j)
+    paragraph_deletes: List[str] = field(default_factory=list)  # stale paragraph record ids
+    manifest: Manifest = field(default_factory=dict)  # manifest once the delta is applied
+
+    @property
+    def is_empty(self) -> bool:
+        return not (
+            self.removed_papers or self.title_idxs or self.keyword_idxs
+            or self.paragraph_upserts or self.paragraph_deletes
+        )
+
+    def report(self) -> str:
+        return "\n".join([
+            f"papers:     {len(self.new_papers)} new, {len(self.changed_papers)} changed, "
+            f"{len(self.removed_papers)} removed",
+            f"to embed:   {len(self.title_idxs)} titles, {len(self.keyword_idxs)} keywords, "
+            f"{len(self.paragraph_upserts)} paragraphs",
+            f"to delete:  {len(self.removed_papers)} papers, {len(self.paragraph_deletes)} trailing paragraphs",
+        ])
+
+
+def diff_manifest(
+    manifest: Manifest,
+    ids: Sequence[str],
+    titles: Sequence[str],
+    keywords: Sequence[str],
+    paragraphs: Sequence[Sequence[str]],
+    headings: Sequence[Sequence[str]],
+    model: str,
+) -> IngestDelta:
+    delta = IngestDelta()
+    current = set()
+    for i, pid in enumerate(ids):
+        current.add(pid)
+        new = paper_hashes(titles[i], keywords[i], paragraphs[i], headings[i], model)
+        delta.manifest[pid] = new
+        old = manifest.get(pid)
+        if old is None:
+            delta.new_papers.append(pid)
+            old = {"title": None, "keywords": None, "paragraphs": []}
+        elif old != new:
+            delta.changed_papers.append(pid)
+
+        if old.get("title") != new["title"]:
+            delta.title_idxs.append(i)
+        if old.get("keywords") != new["keywords"]:
+            delta.keyword_idxs.append(i)
+        old_paras = old.get("paragraphs") or []
+        for j, h in enumerate(new["paragraphs"]):
+            if j >= len(old_paras) or old_paras[j] != h:
+                delta.paragraph_upserts.append((i, j))
+        delta.paragraph_deletes.extend(
+            paragraph_record_id(pid, j) for j in range(len(new["paragraphs"]), len(old_paras))
+        )
+
+    delta.removed_papers = [pid for pid in manifest if pid not in current]
+    return delta
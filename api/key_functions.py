@@ -2,16 +2,27 @@ from __future__ import annotations
 
 from typing import Dict, List, Literal, Tuple
 from dataclasses import dataclass
-import math
+import asyncio
+import functools
 import os
 import json
+import time
+import numpy as np
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from embeddings_create import data_export
+from article_store import load_article_store
+from embedding_store import content_hash, load_store, save_store, store_lock
+from neighbours import NeighbourTable, load_neighbours
+from ann_index import ExactIndex, load_or_build_index
+import bm25
+from batch_embed import EmbeddingError, embed_batched, openai_embed_fn
+from request_scheduler import scheduler
+from response_cache import LRUCache, SqliteCache, cache_key
 
 # ---- OpenAI client (no hardcoded keys) ----
+import openai
 from openai import OpenAI
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -26,20 +37,61 @@ CHROMA_OPENAI_API_KEY = OPENAI_API_KEY
 CHAT_MODEL = "gpt-4o-mini"
 EMBED_MODEL = "text-embedding-3-small"
 
+# Bump when the section-synthesis prompt changes so stale cache rows are ignored
+SYNTH_PROMPT_VERSION = "1"
+# Same for the compare_articles / get_comparison_deepdive prompts
+COMPARE_PROMPT_VERSION = "2"
+
+# Pairwise comparison results expire after this many seconds (default 30 days).
+# Set COMPARE_CACHE_PERSIST=0 to keep them in-process only.
+COMPARE_CACHE_TTL = float(os.getenv("COMPARE_CACHE_TTL") or 30 * 24 * 3600)
+COMPARE_CACHE_PERSIST = os.getenv("COMPARE_CACHE_PERSIST", "1") != "0"
+
+# Max ArticleView objects kept memoized (each holds one article's flat_text)
+ARTICLE_VIEW_CACHE_SIZE = int(os.getenv("ARTICLE_VIEW_CACHE_SIZE") or 4096)
+
 # ---- In-memory indices and caches ----
 
 _TITLE_TO_IDX: Dict[str, int] = {}
 _ID_TO_IDX: Dict[str, int] = {}
 
-# Caches for synthesized sections
+# Caches for synthesized sections (in front of the durable SQLite cache)
 _SYNTH_ABSTRACT: Dict[int, str] = {}
 _SYNTH_METHODS: Dict[int, str] = {}
 _SYNTH_RESULTS: Dict[int, str] = {}
+_SYNTH_STORE = SqliteCache(table="synth_sections", max_entries=20_000)
+
+# Pairwise comparison cache, keyed on the unordered pair of (paper id, content hash)
+_COMPARE_MEMO = LRUCache(max_entries=4096, ttl=COMPARE_CACHE_TTL)
+_COMPARE_STORE = (
+    SqliteCache(table="comparisons", max_entries=100_000, ttl=COMPARE_CACHE_TTL)
+    if COMPARE_CACHE_PERSIST
+    else None
+)
 
 # Embeddings cache
 _EMBED_CACHE: Dict[int, List[float]] = {}
 
-ids, titles, keywords, paragraphs = data_export()
+# L2-normalised float32 article embeddings (row i == article i), built once.
+# Backed by the on-disk embedding store, so normally a read-only memmap.
+_EMBED_MATRIX: np.ndarray | None = None
+_STORE_KEYS: List[Tuple[str, str]] = []
+
+# Topic search backend: "exact" (matrix-vector product), "hnsw" or "ivfpq".
+# ANN_PARAMS is JSON of backend knobs, e.g. '{"ef_search": 128}'.
+ANN_BACKEND = os.getenv("ANN_BACKEND", "exact")
+ANN_PARAMS = json.loads(os.getenv("ANN_PARAMS") or "{}")
+_ANN_INDEX = None
+
+# Lexical BM25 index (bm25.py), loaded or built on first fallback
+_BM25: bm25.BM25Index | None = None
+
+# Offline top-k neighbour table (neighbours.py); False once found missing/stale
+_NEIGHBOURS: NeighbourTable | None | bool = None
+
+# Columnar, memory-mapped corpus (article_store.py); the columns index like lists
+_STORE = load_article_store()
+ids, titles, keywords, paragraphs = _STORE.ids, _STORE.titles, _STORE.keywords, _STORE.paragraphs
 
 @dataclass(frozen=True)
 class ArticleView:
@@ -50,6 +102,10 @@ class ArticleView:
     flat_text: str
 
 
+class ArticleNotFound(LookupError):
+    """No article in the corpus has the requested title."""
+
+
 def _normalize_title(s: str) -> str:
     return (s or "").strip().lower()
 
@@ -63,29 +119,14 @@ def _init_indices_once() -> None:
         _ID_TO_IDX[(pid or "").strip()] = i
 
 
-def _flatten_paragraphs(paras: List[dict]) -> str:
-    """
-    paragraphs[i] looks like: [{'text': 'para1'}, {'text':'para2'}, ...] or a mix.
-    This extracts text safely and concatenates with spaces.
-    """
-    out: List[str] = []
-    if isinstance(paras, list):
-        for p in paras:
-            if isinstance(p, dict) and "text" in p and isinstance(p["text"], str):
-                out.append(p["text"].strip())
-            elif isinstance(p, str):
-                out.append(p.strip())
-    return " ".join(out)
-
-
+@functools.lru_cache(maxsize=ARTICLE_VIEW_CACHE_SIZE)
 def _article_view_by_idx(i: int) -> ArticleView:
-    flat = _flatten_paragraphs(paragraphs[i])
     return ArticleView(
         idx=i,
         paper_id=ids[i],
         title=titles[i],
-        keyword_text=(keywords[i] or ""),
-        flat_text=f"{titles[i]}. {keywords[i] or ''}. {flat}",
+        keyword_text=keywords[i],
+        flat_text=_STORE.flat_texts[i],
     )
 
 
@@ -94,42 +135,113 @@ def _find_article_idx_by_title(title: str) -> int | None:
     return _TITLE_TO_IDX.get(_normalize_title(title))
 
 
-def _cosine(u: List[float], v: List[float]) -> float:
-    if not u or not v or len(u) != len(v):
-        return 0.0
-    dot = 0.0
-    nu = 0.0
-    nv = 0.0
-    for a, b in zip(u, v):
-        dot += a * b
-        nu += a * a
-        nv += b * b
-    if nu == 0.0 or nv == 0.0:
-        return 0.0
-    return dot / (math.sqrt(nu) * math.sqrt(nv))
+def _unit(v: List[float]) -> np.ndarray:
+    a = np.asarray(v, dtype=np.float32)
+    n = float(np.linalg.norm(a))
+    return a / n if n > 0.0 else a
+
+
+def _top_k(scores: np.ndarray, k: int) -> List[int]:
+    """
+    Indices of the k highest scores, best first.
+    argpartition is O(N); only the k survivors get sorted.
+    """
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return []
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")].tolist()
+
+
+def _embed_many(texts: List[str]) -> List[List[float]]:
+    return embed_batched(texts, openai_embed_fn(client, EMBED_MODEL))
 
 
 def _embed(text: str) -> List[float]:
-    resp = client.embeddings.create(model=EMBED_MODEL, input=text[:6000])
-    return resp.data[0].embedding
+    return _embed_many([text])[0]
 
 
-def _embedding_for_idx(i: int) -> List[float]:
-    if i in _EMBED_CACHE:
-        return _EMBED_CACHE[i]
-    emb = _embed(_article_view_by_idx(i).flat_text)
-    _EMBED_CACHE[i] = emb
-    return emb
+def _embeddings_for_idxs(idxs: List[int]) -> List[List[float]]:
+    """
+    Embeddings for the given articles; cache misses go out in packed batches.
+    The input is the article's whole flat text, truncated at the model's
+    EMBED_MAX_INPUT_TOKENS (not the first 6000 characters, as before the
+    persistent store).
+    """
+    missing = [i for i in idxs if i not in _EMBED_CACHE]
+    if missing:
+        vectors = _embed_many([_STORE.flat_texts[i] for i in missing])
+        for i, emb in zip(missing, vectors):
+            _EMBED_CACHE[i] = emb
+    return [_EMBED_CACHE[i] for i in idxs]
+
+
+def _store_keys() -> List[Tuple[str, str]]:
+    """(paper_id, content hash) per article, in article order."""
+    if not _STORE_KEYS:
+        _STORE_KEYS.extend(
+            (ids[i], content_hash(_STORE.flat_texts[i], EMBED_MODEL))
+            for i in range(len(titles))
+        )
+    return _STORE_KEYS
 
 
-def _synthesize_sections_for_idx(i: int) -> Tuple[str, str, str]:
+def _neighbour_table() -> NeighbourTable | None:
+    """The precomputed neighbour table, if present and built from the current corpus."""
+    global _NEIGHBOURS
+    if _NEIGHBOURS is None:
+        table = load_neighbours()
+        _NEIGHBOURS = table if table is not None and table.keys == _store_keys() else False
+    return _NEIGHBOURS or None
+
+
+def _embedding_matrix() -> np.ndarray:
     """
-    Returns (abstract, methodology, results) — synthesized by LLM.
-    Caches results in-memory to avoid repeat calls.
+    Contiguous (N, d) float32 matrix of unit-length article embeddings.
+    Rows are reused from the persistent store when paper_id and content hash
+    still match; only new or changed articles are embedded, then the store is
+    rewritten and re-opened memory-mapped.
     """
-    if i in _SYNTH_ABSTRACT and i in _SYNTH_METHODS and i in _SYNTH_RESULTS:
-        return _SYNTH_ABSTRACT[i], _SYNTH_METHODS[i], _SYNTH_RESULTS[i]
+    global _EMBED_MATRIX
+    if _EMBED_MATRIX is not None:
+        return _EMBED_MATRIX
+
+    keys = _store_keys()
+    stored, stored_keys = load_store(EMBED_MODEL)
+    if stored is not None and stored_keys == keys:
+        _EMBED_MATRIX = stored
+        return stored
+
+    # Another worker may be embedding the same corpus; wait for it, then re-check
+    with store_lock(EMBED_MODEL):
+        _EMBED_MATRIX = _build_embedding_matrix(keys)
+    return _EMBED_MATRIX
+
+
+def _build_embedding_matrix(keys: List[Tuple[str, str]]) -> np.ndarray:
+    stored, stored_keys = load_store(EMBED_MODEL)
+    if stored is not None and stored_keys == keys:
+        return stored
+
+    row_of = {k: r for r, k in enumerate(stored_keys)} if stored is not None else {}
+    missing = [i for i, key in enumerate(keys) if key not in row_of]
+    fresh = dict(zip(missing, _embeddings_for_idxs(missing)))
+    rows: List[np.ndarray] = []
+    for i, key in enumerate(keys):
+        rows.append(_unit(fresh[i]) if i in fresh else np.asarray(stored[row_of[key]]))
+    mat = np.ascontiguousarray(np.vstack(rows), dtype=np.float32)
+
+    try:
+        save_store(EMBED_MODEL, mat, keys)
+        mapped, _ = load_store(EMBED_MODEL)
+        if mapped is not None:
+            mat = mapped
+    except OSError as e:
+        print(f"Warning: could not persist embedding store: {e}")
+    return mat
 
+
+def _synthesis_messages(i: int) -> List[Dict[str, str]]:
     av = _article_view_by_idx(i)
 
     # Prompt asks model to carve abstract/methods/results from noisy text
@@ -152,19 +264,15 @@ Task:
 Return ONLY compact JSON like:
 {{"abstract": "...", "methodology": "...", "results": "..."}}"""
 
-    resp = client.chat.completions.create(
-        model=CHAT_MODEL,
-        messages=[
-            {"role": "system", "content": sys},
-            {"role": "user", "content": user},
-        ],
-        temperature=0.2,
-        max_tokens=700,
-    )
-    content = resp.choices[0].message.content.strip()
+    return [
+        {"role": "system", "content": sys},
+        {"role": "user", "content": user},
+    ]
 
+
+def _parse_sections(content: str) -> Tuple[str, str, str]:
     # Be resilient to fenced code blocks
-    cleaned = content.replace("```json", "").replace("```", "").strip()
+    cleaned = content.strip().replace("```json", "").replace("```", "").strip()
     try:
         data = json.loads(cleaned)
     except Exception:
@@ -180,13 +288,212 @@ Return ONLY compact JSON like:
     abs_text = (data.get("abstract") or "").strip()
     met_text = (data.get("methodology") or "").strip()
     res_text = (data.get("results") or "").strip()
+    return abs_text, met_text, res_text
+
+
+def _synth_key(i: int) -> str:
+    text_hash = content_hash(_STORE.flat_texts[i], CHAT_MODEL)
+    return cache_key("sections", SYNTH_PROMPT_VERSION, CHAT_MODEL, text_hash)
+
+
+def _remember_sections(i: int, sections: Tuple[str, str, str]) -> None:
+    _SYNTH_ABSTRACT[i], _SYNTH_METHODS[i], _SYNTH_RESULTS[i] = sections
+
 
-    _SYNTH_ABSTRACT[i] = abs_text
-    _SYNTH_METHODS[i] = met_text
-    _SYNTH_RESULTS[i] = res_text
+def _cached_sections(i: int) -> Tuple[str, str, str] | None:
+    if i in _SYNTH_ABSTRACT and i in _SYNTH_METHODS and i in _SYNTH_RESULTS:
+        return _SYNTH_ABSTRACT[i], _SYNTH_METHODS[i], _SYNTH_RESULTS[i]
+    hit = _SYNTH_STORE.get(_synth_key(i))
+    if hit is None:
+        return None
+    sections = (hit["abstract"], hit["methodology"], hit["results"])
+    _remember_sections(i, sections)
+    return sections
+
+
+async def _synthesize_sections_async(i: int) -> Tuple[str, str, str]:
+    """
+    Returns (abstract, methodology, results) — synthesized by LLM through the
+    shared request scheduler. Results are cached in-memory and in SQLite
+    (keyed by content hash, prompt version and model) so restarts stay warm.
+    """
+    cached = _cached_sections(i)
+    if cached is not None:
+        return cached
+
+    resp = await scheduler.chat(
+        model=CHAT_MODEL,
+        messages=_synthesis_messages(i),
+        temperature=0.2,
+        max_tokens=700,
+    )
+    abs_text, met_text, res_text = _parse_sections(resp.choices[0].message.content)
+
+    _remember_sections(i, (abs_text, met_text, res_text))
+    _SYNTH_STORE.set(
+        _synth_key(i),
+        {"abstract": abs_text, "methodology": met_text, "results": res_text},
+    )
     return abs_text, met_text, res_text
 
 
+def _synthesize_sections_for_idxs(idxs: List[int]) -> List[Tuple[str, str, str]]:
+    """Synthesizes any uncached articles concurrently, then returns all in order."""
+    todo = list(dict.fromkeys(i for i in idxs if _cached_sections(i) is None))
+    if todo:
+
+        async def run() -> None:
+            await asyncio.gather(*(_synthesize_sections_async(i) for i in todo))
+
+        asyncio.run(run())
+    return [_cached_sections(i) for i in idxs]
+
+
+def _synthesize_sections_for_idx(i: int) -> Tuple[str, str, str]:
+    return _synthesize_sections_for_idxs([i])[0]
+
+
+def _missing_section_idxs() -> List[int]:
+    """Articles with no synthesized sections in memory or in the durable cache."""
+    todo = [i for i in range(len(titles)) if i not in _SYNTH_ABSTRACT]
+    keys = {i: _synth_key(i) for i in todo}
+    hits = _SYNTH_STORE.get_many(keys.values())
+    return [i for i in todo if keys[i] not in hits]
+
+
+def _preload_sections() -> int:
+    """
+    Pulls every already-synthesized article (e.g. from precompute_sections.py)
+    into the in-memory caches in one bulk read. Returns how many were loaded.
+    """
+    keys = {i: _synth_key(i) for i in range(len(titles)) if i not in _SYNTH_ABSTRACT}
+    hits = _SYNTH_STORE.get_many(keys.values())
+    for i, k in keys.items():
+        if k in hits:
+            h = hits[k]
+            _remember_sections(i, (h["abstract"], h["methodology"], h["results"]))
+    return sum(1 for k in keys.values() if k in hits)
+
+
+_preload_sections()
+
+
+def reload_corpus() -> bool:
+    """
+    Re-opens the article store if papers.jsonl changed and drops every cache
+    addressed by article index (views, title/id lookups, embeddings, search
+    indexes, synthesized sections, comparisons). Returns False if nothing changed.
+    """
+    global _STORE, ids, titles, keywords, paragraphs
+    global _EMBED_MATRIX, _ANN_INDEX, _BM25, _NEIGHBOURS
+
+    store = load_article_store()
+    if store.signature == _STORE.signature:
+        return False
+
+    _STORE = store
+    ids, titles, keywords, paragraphs = _STORE.ids, _STORE.titles, _STORE.keywords, _STORE.paragraphs
+    _article_view_by_idx.cache_clear()
+    for cache in (_TITLE_TO_IDX, _ID_TO_IDX, _EMBED_CACHE, _SYNTH_ABSTRACT, _SYNTH_METHODS, _SYNTH_RESULTS):
+        cache.clear()
+    _COMPARE_MEMO.clear()
+    _STORE_KEYS.clear()
+    _EMBED_MATRIX = None
+    _ANN_INDEX = None
+    _BM25 = None
+    _NEIGHBOURS = None
+    _preload_sections()
+    return True
+
+
+def warm_up() -> Dict[str, float]:
+    """
+    Builds everything the request path would otherwise build lazily: title/id
+    lookups, the embedding matrix (and ANN index), the neighbour table and
+    the BM25 index. Call once per server before forking workers. Returns
+    seconds spent per step.
+    """
+    timings: Dict[str, float] = {}
+
+    def step(name: str, fn) -> None:
+        started = time.perf_counter()
+        fn()
+        timings[name] = time.perf_counter() - started
+
+    step("indices", _init_indices_once)
+    step("embedding_matrix", _embedding_matrix)
+    if ANN_BACKEND != "exact":
+        step("ann_index", _ann_index)
+    step("neighbours", _neighbour_table)
+    step("bm25", _lexical_index)
+    return timings
+
+
+def _ordered_pair(i1: int, i2: int) -> Tuple[int, int]:
+    """
+    The pair in canonical (paper id) order. Comparison prompts are always
+    built from this order, so (a, b) and (b, a) send the identical prompt
+    and can share one cached answer.
+    """
+    return (i1, i2) if ids[i1] <= ids[i2] else (i2, i1)
+
+
+def _pair_key(i1: int, i2: int, section: str) -> str:
+    """Key for a canonically ordered pair; content hashes make edited articles miss."""
+    keys = _store_keys()
+    return cache_key("compare", COMPARE_PROMPT_VERSION, CHAT_MODEL, section, *keys[i1], *keys[i2])
+
+
+def _comparison_cache_get(key: str):
+    hit = _COMPARE_MEMO.get(key)
+    if hit is None and _COMPARE_STORE is not None:
+        hit = _COMPARE_STORE.get(key)
+        if hit is not None:
+            _COMPARE_MEMO.set(key, hit)
+    return hit
+
+
+def _comparison_cache_set(key: str, value) -> None:
+    _COMPARE_MEMO.set(key, value)
+    if _COMPARE_STORE is not None:
+        _COMPARE_STORE.set(key, value)
+
+
+def _lexical_index() -> bm25.BM25Index:
+    global _BM25
+    if _BM25 is None:
+        _BM25 = bm25.load_or_build(ids, titles, keywords, paragraphs)
+    return _BM25
+
+
+def _ann_index():
+    """
+    The configured ANN index. If it cannot be built (missing hnswlib/faiss,
+    bad ANN_PARAMS, too few vectors for IVF-PQ) this says so loudly and
+    falls back to exact search for the life of the process instead of
+    retrying the failed build on every request.
+    """
+    global _ANN_INDEX
+    if _ANN_INDEX is None:
+        try:
+            _ANN_INDEX = load_or_build_index(
+                ANN_BACKEND, EMBED_MODEL, _embedding_matrix(), _store_keys(), **ANN_PARAMS
+            )
+        except (RuntimeError, ValueError, TypeError) as e:
+            print(f"WARNING: ANN backend '{ANN_BACKEND}' unavailable ({e}); using exact search")
+            _ANN_INDEX = ExactIndex()
+            _ANN_INDEX.build(_embedding_matrix())
+    return _ANN_INDEX
+
+
+def _search_articles(q_emb: np.ndarray, k: int) -> List[int]:
+    """Top-k article indices for a unit query vector via the configured backend."""
+    if ANN_BACKEND == "exact":
+        return _top_k(_embedding_matrix() @ q_emb, k)
+    labels, _ = _ann_index().search(q_emb, k)
+    return [i for i in labels[0].tolist() if i >= 0]
+
+
 # ---------------- Public API ----------------
 
 def get_articles_by_topic(topic: str) -> List[Dict[str, str]]:
@@ -195,63 +502,56 @@ def get_articles_by_topic(topic: str) -> List[Dict[str, str]]:
     - Embed the topic
     - Compare to each article embedding
     - Return up to 20 best matches
-    Falls back to keyword inclusion if embeddings fail for any reason.
+    Falls back to BM25 keyword ranking if the OpenAI embedding calls fail;
+    search-index errors are not masked.
     """
     _init_indices_once()
 
     try:
-        q_emb = _embed(topic)
-        scored: List[Tuple[float, int]] = []
-        for i in range(len(titles)):
-            score = _cosine(q_emb, _embedding_for_idx(i))
-            scored.append((score, i))
-        scored.sort(reverse=True, key=lambda x: x[0])
-        top = scored[:20]
+        q_emb = _unit(_embed(topic))
         out: List[Dict[str, str]] = []
-        for _, i in top:
-            av = _article_view_by_idx(i)
+        for i in _search_articles(q_emb, 20):
             # author list unknown in this pipeline; show first keyword or Unknown
             first_author = "Unknown Author"
             out.append(
                 {
-                    "ArticleTitle": av.title,
+                    "ArticleTitle": titles[i],
                     "Author": first_author,
                     "Link": "",  # no URL in this data source
                 }
             )
         return out
-    except Exception:
-        # Keyword fallback
-        tl = topic.lower()
-        out: List[Dict[str, str]] = []
-        for i in range(len(titles)):
-            av = _article_view_by_idx(i)
-            hay = f"{av.title} {av.keyword_text} {av.flat_text}".lower()
-            if tl in hay:
-                out.append(
-                    {
-                        "ArticleTitle": av.title,
-                        "Author": "Unknown Author",
-                        "Link": "",
-                    }
-                )
-            if len(out) >= 20:
-                break
-        return out
+    except (openai.OpenAIError, EmbeddingError):
+        # Lexical fallback: BM25 over titles, keywords and paragraphs (no network)
+        return [
+            {
+                "ArticleTitle": titles[i],
+                "Author": "Unknown Author",
+                "Link": "",
+            }
+            for i, _ in _lexical_index().search(topic, 20)
+        ]
 
 
 def compare_articles(article1_title: str, article2_title: str) -> List[int]:
     """
     Returns [methodology_score, results_score] as integers 1–100.
     Since data lacks clean sections, we synthesize sections for each article first.
+    Cached per unordered pair, so (a, b) and (b, a) cost one call; both
+    scores are similarities, so they hold in either order.
     """
     i1 = _find_article_idx_by_title(article1_title)
     i2 = _find_article_idx_by_title(article2_title)
     if i1 is None or i2 is None:
-        raise ValueError("Could not find one or both articles")
+        raise ArticleNotFound("Could not find one or both articles")
+    i1, i2 = _ordered_pair(i1, i2)
+
+    key = _pair_key(i1, i2, "scores")
+    cached = _comparison_cache_get(key)
+    if cached is not None:
+        return list(cached)
 
-    _, meth1, res1 = _synthesize_sections_for_idx(i1)
-    _, meth2, res2 = _synthesize_sections_for_idx(i2)
+    (_, meth1, res1), (_, meth2, res2) = _synthesize_sections_for_idxs([i1, i2])
 
     prompt = f"""Compare these two research articles on methodology and results. Return ONLY a JSON array with two integers.
 
@@ -289,7 +589,9 @@ Example: [78, 65]"""
     raw = resp.choices[0].message.content.strip()
     raw = raw.replace("```json", "").replace("```", "").strip()
     scores = json.loads(raw)
-    return [int(scores[0]), int(scores[1])]
+    result = [int(scores[0]), int(scores[1])]
+    _comparison_cache_set(key, result)
+    return result
 
 
 def get_comparison_deepdive(
@@ -299,14 +601,21 @@ def get_comparison_deepdive(
 ) -> str:
     """
     Returns a 300–500 word analysis of similarities/differences for the chosen section.
+    Cached per unordered pair and section, so (a, b) and (b, a) cost one call;
+    the essay names the articles by title, so it reads right in either order.
     """
     i1 = _find_article_idx_by_title(article1_title)
     i2 = _find_article_idx_by_title(article2_title)
     if i1 is None or i2 is None:
-        raise ValueError("Could not find one or both articles")
+        raise ArticleNotFound("Could not find one or both articles")
+    i1, i2 = _ordered_pair(i1, i2)
 
-    abs1, meth1, res1 = _synthesize_sections_for_idx(i1)
-    abs2, meth2, res2 = _synthesize_sections_for_idx(i2)
+    key = _pair_key(i1, i2, section)
+    cached = _comparison_cache_get(key)
+    if cached is not None:
+        return cached
+
+    (abs1, meth1, res1), (abs2, meth2, res2) = _synthesize_sections_for_idxs([i1, i2])
 
     if section == "methodology":
         c1 = meth1[:2000]
@@ -319,11 +628,11 @@ def get_comparison_deepdive(
 
     prompt = f"""Provide a detailed comparison explaining the similarities and differences in the {section} of these two research articles.
 
-Article 1: {article1_title}
+Article 1: {titles[i1]}
 Abstract: {abs1[:800]}
 {section.capitalize()}: {c1}
 
-Article 2: {article2_title}
+Article 2: {titles[i2]}
 Abstract: {abs2[:800]}
 {section.capitalize()}: {c2}
 
@@ -335,6 +644,8 @@ Structure:
 3. Significance of differences
 4. Overall Assessment
 
+Refer to each article by its title, never as "Article 1" or "Article 2".
+
 Provide 300-500 words."""
 
     resp = client.chat.completions.create(
@@ -349,45 +660,53 @@ Provide 300-500 words."""
         temperature=0.5,
         max_tokens=900,
     )
-    return resp.choices[0].message.content
+    text = resp.choices[0].message.content
+    _comparison_cache_set(key, text)
+    return text
 
 
 def get_related_articles(article_title: str) -> List[Dict[str, str]]:
     """
     Finds semantically related articles to `article_title`.
+    If the offline neighbour table (neighbours.py) matches the corpus, this is
+    an O(k) lookup. Otherwise:
     - Synthesizes abstract & methodology for the source
     - Builds a search text
-    - Uses embedding cosine similarity across all articles
+    - Scores every article with one matrix-vector product
     - Filters out source itself
     - Returns top 10 as {ArticleTitle, Author, Link}
     """
     i_src = _find_article_idx_by_title(article_title)
     if i_src is None:
-        raise ValueError(f"Article '{article_title}' not found")
+        raise ArticleNotFound(f"Article '{article_title}' not found")
+
+    table = _neighbour_table()
+    if table is not None:
+        return [
+            {
+                "ArticleTitle": titles[i],
+                "Author": "Unknown Author",
+                "Link": "",
+            }
+            for i in table.neighbours(i_src)[:10].tolist()
+        ]
 
     abs_src, meth_src, _ = _synthesize_sections_for_idx(i_src)
     search_text = f"{titles[i_src]} {abs_src} {meth_src[:600]}"
 
-    q_emb = _embed(search_text)
-
-    scored: List[Tuple[float, int]] = []
-    for i in range(len(titles)):
-        if i == i_src:
-            continue
-        score = _cosine(q_emb, _embedding_for_idx(i))
-        scored.append((score, i))
+    q_emb = _unit(_embed(search_text))
 
-    scored.sort(reverse=True, key=lambda x: x[0])
+    scores = _embedding_matrix() @ q_emb
+    scores[i_src] = -np.inf  # filter out source itself
 
     out: List[Dict[str, str]] = []
-    for _, i in scored[:15]:  # query 15
-        av = _article_view_by_idx(i)
+    for i in _top_k(scores, 10):
         out.append(
             {
-                "ArticleTitle": av.title,
+                "ArticleTitle": titles[i],
                 "Author": "Unknown Author",
                 "Link": "",
             }
         )
 
-    return out[:10]  # return top 10
\ No newline at end of file
+    return out
\ No newline at end of file
@@ -0,0 +1,111 @@
+"""
+Precomputed top-k nearest-neighbour table over the article embedding store.
+
+Built offline with blocked matrix multiplies (one (block, N) score slab in
+memory at a time) and saved as a compact .npz: int32 neighbour indices and
+float16 cosine scores, plus the store keys it was built from so readers can
+tell when it is stale. /api/related serves from it in O(k), and the same
+scores can feed the /correlation heatmap.
+
+Usage (from api/, after the embedding store exists):
+    python neighbours.py [--k 50] [--block 1024]
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List
+import argparse
+import os
+import time
+
+import numpy as np
+
+from embedding_store import EMBED_STORE_DIR, StoreKey, load_store
+
+EMBED_MODEL = "text-embedding-3-small"
+NEIGHBOURS_PATH = os.getenv("NEIGHBOURS_PATH", os.path.join(EMBED_STORE_DIR, "neighbours.npz"))
+
+
+@dataclass(frozen=True)
+class NeighbourTable:
+    keys: List[StoreKey]
+    indices: np.ndarray  # (N, k) int32, best first
+    scores: np.ndarray  # (N, k) float16 cosine similarity
+
+    def neighbours(self, row: int) -> np.ndarray:
+        return self.indices[row]
+
+    def similarity(self, a: int, b: int) -> float | None:
+        """Score for b among a's neighbours (or vice versa); None if neither lists it."""
+        for src, dst in ((a, b), (b, a)):
+            hit = np.nonzero(self.indices[src] == dst)[0]
+            if hit.size:
+                return float(self.scores[src, hit[0]])
+        return None
+
+
+def build_neighbours(matrix: np.ndarray, k: int = 50, block: int = 1024) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Exact top-k by cosine for every row of a unit-normalised matrix,
+    excluding the row itself. Peak extra memory is O(block * N).
+    """
+    n = matrix.shape[0]
+    k = min(k, max(n - 1, 0))
+    indices = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float16)
+    if k == 0:
+        return indices, scores
+
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        slab = np.asarray(matrix[start:stop], dtype=np.float32) @ np.asarray(matrix, dtype=np.float32).T
+        slab[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+        part = np.argpartition(-slab, k - 1, axis=1)[:, :k]
+        part_scores = np.take_along_axis(slab, part, axis=1)
+        order = np.argsort(-part_scores, axis=1, kind="stable")
+        indices[start:stop] = np.take_along_axis(part, order, axis=1)
+        scores[start:stop] = np.take_along_axis(part_scores, order, axis=1)
+    return indices, scores
+
+
+def save_neighbours(table: NeighbourTable, path: str = NEIGHBOURS_PATH) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(
+        tmp,
+        paper_ids=np.asarray([pid for pid, _ in table.keys]),
+        hashes=np.asarray([h for _, h in table.keys]),
+        indices=table.indices,
+        scores=table.scores,
+    )
+    os.replace(tmp, path)
+
+
+def load_neighbours(path: str = NEIGHBOURS_PATH) -> NeighbourTable | None:
+    try:
+        with np.load(path) as data:
+            keys = list(zip(data["paper_ids"].tolist(), data["hashes"].tolist()))
+            return NeighbourTable(keys=keys, indices=data["indices"], scores=data["scores"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the top-k neighbour table from the embedding store.")
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--block", type=int, default=1024)
+    args = parser.parse_args()
+
+    matrix, keys = load_store(EMBED_MODEL)
+    if matrix is None:
+        print("No embedding store found; run the API once (or warm it) to build it first.")
+        return
+
+    started = time.monotonic()
+    indices, scores = build_neighbours(matrix, k=args.k, block=args.block)
+    save_neighbours(NeighbourTable(keys=keys, indices=indices, scores=scores))
+    print(f"Built top-{indices.shape[1]} neighbours for {len(keys)} articles "
+          f"in {time.monotonic() - started:.2f}s -> {NEIGHBOURS_PATH}")
+
+
+if __name__ == '__main__':
+    main()
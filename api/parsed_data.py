@@ -1,17 +1,28 @@
 import json
+import os
 import re
+from typing import Dict, Iterator, List, Tuple
 
-article_content = []
+# Corpus loader for papers.jsonl.
+#
+# iter_articles() streams normalized records (id sanitization + dedup, keyword
+# extraction, paragraph flattening) in a single pass over the file, so nothing
+# is materialized at import time. The parsed corpus is persisted only as the
+# memory-mapped article store (article_store.py), rebuilt when papers.jsonl
+# changes; load_columns() reads its columns back as plain lists.
 
+PAPERS_PATH = os.getenv("PAPERS_PATH", "papers.jsonl")
 
-with open("papers.jsonl", "r", encoding="utf-8") as file:
-    for line in file:
-        # Each line is a JSON object, so we parse it separately
-        article_content.append(json.loads(line))
+# Bump whenever normalization below changes, to invalidate cached artifacts
+LOADER_VERSION = 1
+
+COLUMNS = ("paper_id", "title", "keywords", "paragraphs", "paragraph_headings")
+
+_KEYWORDS_RE = re.compile(r"[Kk]eywords?\s*:\s*(.+)")
+_SENTENCE_START_RE = re.compile(r"^(this|the|we|in|a|an|our|for|to)\b")
+_SENTENCE_PUNCT_RE = re.compile(r"[.!?]")
+CUTOFF_WORDS = ["introduction", "background", "methods", "©", "license", "open access", "edited"]
 
-# Deduplicate by paper_id and sanitize to ensure ChromaDB-compatible unique IDs
-seen_ids = set()
-deduplicated = []
 
 def sanitize_id(raw_id: str) -> str:
     """Sanitize ID to be ChromaDB-compatible: [a-zA-Z0-9._-], 3-512 chars, start/end with alphanumeric."""
@@ -26,193 +37,149 @@ def sanitize_id(raw_id: str) -> str:
         safe = safe + '_id'
     return safe
 
-for entry in article_content:
-    # ONLY use paper_id field for deduplication
-    entry_id = entry.get("paper_id")
-    
-    # Skip entries without paper_id
-    if entry_id is None or entry_id == "":
-        continue
-    
-    # Convert to string and sanitize
-    raw_id = str(entry_id)
-    sanitized_id = sanitize_id(raw_id)
-    
-    # If sanitized ID collides, append counter to make it unique
-    if sanitized_id in seen_ids:
-        counter = 1
-        while f"{sanitized_id}_{counter}" in seen_ids:
-            counter += 1
-        sanitized_id = f"{sanitized_id}_{counter}"
-    
-    seen_ids.add(sanitized_id)
-    
-    # Store the sanitized ID back in the entry
-    entry["paper_id"] = sanitized_id
-    deduplicated.append(entry)
-
-article_content = deduplicated
-print(f"Loaded {len(article_content)} unique articles by paper_id (dropped {len(seen_ids) - len(article_content)} duplicates).")
-
-# Now `article_content` is a list of dictionaries
-keywords_data = {}
-
-# for entry in article_content:
-#     text = ""
-#     # combine text sources
-#     if "abstract" in entry:
-#         text += entry["abstract"]
-#     if "sections" in entry:
-#         for section in entry["sections"]:
-#             text += " " + section.get("text", "")
-    
-#     full_entry_text = json.dumps(entry, indent=2)
-#     if "Keywords" in full_entry_text or "keywords" in full_entry_text:
-#         print("------ FOUND KEYWORDS IN ENTRY ------")
-#         print(full_entry_text[:1000])  # print the first 1000 characters
-#         for key, value in entry.items():
-#             if isinstance(value, str) and ("Keywords" in value or "keywords" in value):
-#                 print(f"\nFound in key '{key}':")
-#                 print(value[:300])
-#             elif isinstance(value, list):
-#                 for i, item in enumerate(value):
-#                     if isinstance(item, dict):
-#                         for subkey, subval in item.items():
-#                             if isinstance(subval, str) and ("Keywords" in subval or "keywords" in subval):
-#                                 print(f"\nFound in {key}[{i}]['{subkey}']:")
-#                                 print(subval[:300])
-#         break
-    
-for entry in article_content:
-    keywords_found = []
-
-    # Search in 'abstract' field if present
-    if "abstract" in entry and isinstance(entry["abstract"], str):
-        match = re.search(r"[Kk]eywords?\s*:\s*(.+)", entry["abstract"])
-        if match:
-            raw = match.group(1)
-            keywords_found = [kw.strip() for kw in raw.split(",") if kw.strip()]
-
-    # Search in abstract_paragraphs
-    if not keywords_found and "abstract_paragraphs" in entry:
-        for i, para in enumerate(entry["abstract_paragraphs"]):
-            if isinstance(para, dict) and "text" in para:
-                text = para["text"]
-                match = re.search(r"[Kk]eywords?\s*:\s*(.+)", text)
-                if match:
-                    raw = match.group(1)
-                    keywords_found = [kw.strip() for kw in raw.split(",") if kw.strip()]
-                    print(f"Found keywords in abstract_paragraphs[{i}] for paper {entry.get('paper_id')}: {keywords_found}")
-                    break
-
-    # Search in sections if still not found
-    if not keywords_found and "sections" in entry:
-        for sec in entry["sections"]:
-            if isinstance(sec, dict) and "text" in sec:
-                match = re.search(r"[Kk]eywords?\s*:\s*(.+)", sec["text"])
-                if match:
-                    raw = match.group(1)
-                    keywords_found = [kw.strip() for kw in raw.split(",") if kw.strip()]
-                    print(f"Found keywords in sections for paper {entry.get('paper_id')}: {keywords_found}")
-                    break
-
-    entry["keywords"] = ", ".join(keywords_found)
-
-    match = re.search(r"keywords:\s*(.*)", text, flags=re.S | re.IGNORECASE)
-    if match:
-        print(f"Found in paper {entry.get('paper_id')}: {match.group(0)[:80]}")  # debug
-        raw = match.group(1).strip()
-        keywords = [kw.strip() for kw in raw.split(",") if kw.strip()]
-    else:
-        keywords = []
-    
-    if match:
-        raw = match.group(1).strip()
-        keywords = [kw.strip() for kw in raw.split(",") if kw.strip()]
-    else:
-        # no keywords found in the combined text; continue with empty list
-        keywords = []
 
-    cleaned_keywords = []
+def _keyword_source(entry: dict) -> str | None:
+    """The first text carrying a 'Keywords:' line: abstract, abstract paragraphs, then sections."""
+    if isinstance(entry.get("abstract"), str) and _KEYWORDS_RE.search(entry["abstract"]):
+        return entry["abstract"]
+    for para in entry.get("abstract_paragraphs") or []:
+        if isinstance(para, dict) and isinstance(para.get("text"), str) and _KEYWORDS_RE.search(para["text"]):
+            return para["text"]
+    for sec in entry.get("sections") or []:
+        if isinstance(sec, dict) and isinstance(sec.get("text"), str) and _KEYWORDS_RE.search(sec["text"]):
+            return sec["text"]
+    return None
 
-    CUTOFF_WORDS = ["introduction", "background", "methods", "©", "license", "open access","edited"]
 
-    for kw in keywords:
+def extract_keywords(entry: dict) -> str:
+    """Comma-separated keywords, stopping where the list runs on into prose."""
+    text = _keyword_source(entry)
+    if text is None:
+        return ""
+    raw = _KEYWORDS_RE.search(text).group(1)
+
+    cleaned_keywords = []
+    for kw in (k.strip() for k in raw.split(",")):
+        if not kw:
+            continue
         lower_kw = kw.lower()
         # Stop if it looks like the start of a normal sentence (not a keyword)
-        if re.match(r"^(this|the|we|in|a|an|our|for|to)\b", lower_kw):
+        if _SENTENCE_START_RE.match(lower_kw):
             break
-        # if not keywords and "Keywords" in text:
-        #     print(f"DEBUG — Found 'Keywords:' but parsed none in {entry.get('paper_id')}")
         if any(cutoff in lower_kw for cutoff in CUTOFF_WORDS):
             break
         # Stop if the fragment clearly continues into a sentence
-        if re.search(r"[.!?]", kw):
+        if _SENTENCE_PUNCT_RE.search(kw):
             break
         cleaned_keywords.append(kw)
+    return ", ".join(cleaned_keywords)
+
 
-    # store keywords as a single comma-separated string (empty string if none)
-    entry["keywords"] = ", ".join(cleaned_keywords)
+def extract_paragraphs(entry: dict) -> Tuple[List[str], List[str]]:
+    """
+    Paragraph-sized text pieces from abstract_paragraphs and sections, plus the
+    section heading each one came from (paragraph_headings[j] for paragraphs[j]).
+    """
+    paragraphs: List[str] = []
+    paragraph_headings: List[str] = []
 
-    # Extract paragraph-sized text pieces into a simple list of strings.
-    # Collect from abstract_paragraphs (if present) and from sections.
-    paragraphs = []
     # abstract_paragraphs: list of dicts with 'text'
-    if "abstract_paragraphs" in entry and isinstance(entry["abstract_paragraphs"], list):
+    if isinstance(entry.get("abstract_paragraphs"), list):
         for p in entry["abstract_paragraphs"]:
-            if isinstance(p, dict) and "text" in p and p["text"]:
+            if isinstance(p, dict) and p.get("text"):
                 txt = p["text"].strip()
                 if txt:
                     paragraphs.append(txt)
+                    paragraph_headings.append("Abstract")
 
     # sections may contain 'paragraphs' (list of dicts with 'text') or a 'text' field
-    if "sections" in entry and isinstance(entry["sections"], list):
+    if isinstance(entry.get("sections"), list):
         for sec in entry["sections"]:
             if not isinstance(sec, dict):
                 continue
+            heading = (sec.get("heading") or "").strip() or "Untitled"
             # section-level textual blob
-            if "text" in sec and isinstance(sec["text"], str):
+            if isinstance(sec.get("text"), str):
                 txt = sec["text"].strip()
                 if txt:
                     paragraphs.append(txt)
+                    paragraph_headings.append(heading)
 
             # section paragraphs (preferred if present)
-            if "paragraphs" in sec and isinstance(sec["paragraphs"], list):
+            if isinstance(sec.get("paragraphs"), list):
                 for p in sec["paragraphs"]:
-                    if isinstance(p, dict) and "text" in p and p["text"]:
+                    if isinstance(p, dict) and p.get("text"):
                         txt = p["text"].strip()
                         if txt:
                             paragraphs.append(txt)
+                            paragraph_headings.append(heading)
+
+    return paragraphs, paragraph_headings
+
+
+def iter_articles(path: str = PAPERS_PATH) -> Iterator[Dict]:
+    """
+    Streams normalized article records from papers.jsonl in one pass.
+    Entries without a paper_id are skipped; sanitized ids that collide get a
+    numeric suffix so every id stays unique.
+    """
+    seen_ids = set()
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+
+            # ONLY use paper_id field for deduplication
+            entry_id = entry.get("paper_id")
+            if entry_id is None or entry_id == "":
+                continue
 
-    # set the extracted paragraphs on the entry (list of strings)
-    entry["paragraphs"] = paragraphs
-
-#title
-#keywords
-#abstract
-
-# Verify all paper_ids are unique
-all_ids = [e.get("paper_id") for e in article_content]
-assert len(all_ids) == len(set(all_ids)), "ERROR: Duplicate paper_ids found after processing!"
-print(f"✓ All {len(all_ids)} paper_ids are unique and ChromaDB-compatible")
-
-counts = [len(e.get("keywords", "").split(", ")) if e.get("keywords") else 0 for e in article_content]
-print(f"Min keywords: {min(counts)}, Max keywords: {max(counts)}, Avg: {sum(counts)/len(counts):.2f}")
-
-# Preview a few
-# for entry in article_content[11:15]:
-#     print(f"\nTitle: {entry.get('title')}")
-#     print("Keywords:", entry["keywords"])
-#     print("Paragraph count:", len(entry["paragraphs"]))
-
-# num_paragraphs = 0
-# paragarphs_below_x = 0
-# for entry in article_content:
-#     num_par = len(entry['paragraphs'])
-#     num_paragraphs += num_par
-#     if num_par < 10:
-#         paragarphs_below_x += 1
-
-# num_paragraphs /= len(article_content)
-# print(f'average number of paragraphs: {num_paragraphs}')
-# print(f'paragraphs below x is: {paragarphs_below_x}')
\ No newline at end of file
+            sanitized_id = sanitize_id(str(entry_id))
+            if sanitized_id in seen_ids:
+                counter = 1
+                while f"{sanitized_id}_{counter}" in seen_ids:
+                    counter += 1
+                sanitized_id = f"{sanitized_id}_{counter}"
+            seen_ids.add(sanitized_id)
+
+            paragraphs, paragraph_headings = extract_paragraphs(entry)
+            yield {
+                "paper_id": sanitized_id,
+                "title": entry.get("title") or "",
+                "keywords": extract_keywords(entry),
+                "paragraphs": paragraphs,
+                "paragraph_headings": paragraph_headings,
+            }
+
+
+def source_signature(path: str) -> List:
+    st = os.stat(path)
+    return [LOADER_VERSION, os.path.abspath(path), st.st_size, st.st_mtime_ns]
+
+
+def load_columns(path: str = PAPERS_PATH) -> Dict[str, list]:
+    """The normalized corpus as parallel columns (see COLUMNS), read from the article store."""
+    from article_store import load_article_store
+
+    store = load_article_store(path)
+    return {
+        "paper_id": list(store.ids),
+        "title": list(store.titles),
+        "keywords": list(store.keywords),
+        "paragraphs": list(store.paragraphs),
+        "paragraph_headings": list(store.headings),
+    }
+
+
+def load_articles(path: str = PAPERS_PATH) -> List[Dict]:
+    """The normalized corpus as a list of records (one dict per article)."""
+    columns = load_columns(path)
+    return [dict(zip(COLUMNS, row)) for row in zip(*(columns[name] for name in COLUMNS))]
+
+
+def __getattr__(name: str):
+    # `from parsed_data import article_content` still works, but only loads on demand
+    if name == "article_content":
+        return load_articles()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
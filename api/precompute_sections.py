@@ -0,0 +1,67 @@
+"""
+Offline section synthesis for the whole corpus.
+
+Walks every article in key_functions' article store, synthesizes
+abstract/methodology/results for the ones not yet in the durable section
+cache, and writes each result as soon as it arrives. Re-running resumes where the last run stopped.
+key_functions preloads the cache at import, so the API never synthesizes
+on the request path for precomputed articles.
+
+Usage (from api/):
+    python precompute_sections.py [--concurrency 16] [--limit 100]
+"""
+import argparse
+import asyncio
+import time
+
+import key_functions as kf
+from request_scheduler import scheduler
+
+
+async def _run(idxs: list[int]) -> tuple[int, int]:
+    done = 0
+    failed = 0
+    started = time.monotonic()
+
+    async def one(i: int) -> None:
+        nonlocal done, failed
+        try:
+            await kf._synthesize_sections_async(i)
+            done += 1
+        except Exception as e:
+            failed += 1
+            print(f"Failed to synthesize sections for {kf.ids[i]}: {e}")
+        if (done + failed) % 25 == 0:
+            rate = (done + failed) / max(time.monotonic() - started, 1e-9)
+            print(f"Synthesized {done + failed}/{len(idxs)} (failed: {failed}, {rate:.1f}/s)")
+
+    await asyncio.gather(*(one(i) for i in idxs))
+    return done, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute synthesized sections for all articles.")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="max in-flight chat requests (default: OPENAI_MAX_CONCURRENCY)")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="only synthesize this many missing articles")
+    args = parser.parse_args()
+
+    if args.concurrency:
+        scheduler.set_limits(max_concurrency=args.concurrency)
+
+    todo = kf._missing_section_idxs()
+    print(f"{len(kf.titles) - len(todo)}/{len(kf.titles)} articles already synthesized")
+    if args.limit is not None:
+        todo = todo[: args.limit]
+    if not todo:
+        print("Nothing to do.")
+        return
+
+    print(f"Synthesizing {len(todo)} articles...")
+    done, failed = asyncio.run(_run(todo))
+    print(f"\nComplete! Synthesized: {done}, Failed: {failed}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,24 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, List, Sequence, Tuple
+import asyncio
+import concurrent.futures
+import json
+import threading
+
 from openai import OpenAI
+import openai
 import numpy as np
 from dotenv import load_dotenv
 import os
 import chromadb.utils.embedding_functions as embedding_functions
 
+from batch_embed import count_tokens, pack_batches, truncate_to_tokens
+from embedding_store import content_hash
+from request_scheduler import scheduler
+from response_cache import SqliteCache, cache_key
+
 load_dotenv()
 
 possible_progress_values = np.linspace(start=0, stop=1, num=11)
@@ -13,22 +28,91 @@ openai_ef = embedding_functions.OpenAIEmbeddingFunction(
                 model_name="text-embedding-3-small"
             )
 
-def computeProgress(paragraph: str, query: str):
-    progress_prompt = f"The text below indicates something about how far close we are to achieving {query}. Based solely on the text below, answer on a scale of [ {possible_progress_values} ] how close we are to achieving {query}."
-    
-    # client = chromadb.PersistentClient(path='./chroma/')
+PROGRESS_MODEL = "gpt-4o-mini"
+# Paragraphs packed into one scoring request, and the prompt budget per request
+PROGRESS_BATCH_SIZE = int(os.getenv("PROGRESS_BATCH_SIZE") or 20)
+PROGRESS_BATCH_TOKENS = 12_000
+# Longer paragraphs are truncated before scoring
+PROGRESS_MAX_PARAGRAPH_TOKENS = 1_000
+
+# Bump when the scoring prompts change meaning so stale cached scores are ignored
+PROGRESS_PROMPT_VERSION = "1"
+# A worker's claim on a paragraph it is scoring lapses after this many seconds
+# unless renewed; claims are renewed every third of that while the batch is pending
+PROGRESS_CLAIM_TTL = 120.0
+PROGRESS_CLAIM_POLL = 0.5
+
+_client: OpenAI | None = None
+
+# Scores per (paragraph, query, prompt, model), shared by every process on the
+# host; claims mark keys some process is scoring right now
+_SCORE_STORE = SqliteCache(table="progress_scores", max_entries=1_000_000)
+_SCORE_CLAIMS = SqliteCache(table="progress_score_claims", ttl=PROGRESS_CLAIM_TTL)
+# Keys being scored by this process, across asyncio tasks and threads
+_INFLIGHT: Dict[str, concurrent.futures.Future] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+# Both prompts ask for progress towards the goal, so single and batched
+# scores mean the same thing; _score_key covers both texts, so the two paths
+# share cached scores and editing either prompt invalidates them together
+SYSTEM_PROMPT = (
+    "You are a research evaluator. Given a prompt and a paragraph, "
+    "rate, based solely on the paragraph, how close it indicates we are to the goal in the prompt. "
+    "Output only a number between 0 and 1 in steps of 0.1, where 1 means 'achieved' "
+    "and 0 means 'no progress or irrelevant'."
+)
+BATCH_SYSTEM_PROMPT = (
+    "You are a research evaluator. You are given a prompt and numbered paragraphs [P1], [P2], ... "
+    "Rate each paragraph independently, based solely on its own text, on how close it indicates "
+    "we are to the goal in the prompt. Use a number between 0 and 1 in steps of 0.1, "
+    "where 1 means 'achieved' and 0 means 'no progress or irrelevant'. "
+    "Return one score per paragraph, in order."
+)
+
+# Structured output: {"scores": [float, ...]}
+_SCORES_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "paragraph_scores",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"scores": {"type": "array", "items": {"type": "number"}}},
+            "required": ["scores"],
+            "additionalProperties": False,
+        },
+    },
+}
 
-    client = OpenAI(api_key=OPENAI_API_KEY)
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",  # or gpt-4o, gpt-4.1, etc.
+def _progress_prompt(query: str) -> str:
+    return f"The text below indicates something about how far close we are to achieving {query}. Based solely on the text below, answer on a scale of [ {possible_progress_values} ] how close we are to achieving {query}."
+
+
+def _snap(score: float) -> float:
+    """Nearest allowed progress value (0, 0.1, ..., 1)."""
+    return float(possible_progress_values[np.abs(possible_progress_values - score).argmin()])
+
+
+def _get_client() -> OpenAI:
+    global _client
+    if _client is None:
+        _client = OpenAI(api_key=OPENAI_API_KEY)
+    return _client
+
+
+def computeProgress(paragraph: str, query: str):
+    paragraph = _prepare(paragraph)
+    key = _score_key(query, paragraph)
+    cached = _SCORE_STORE.get(key)
+    if cached is not None:
+        return cached
+    progress_prompt = _progress_prompt(query)
+
+    response = _get_client().chat.completions.create(
+        model=PROGRESS_MODEL,  # or gpt-4o, gpt-4.1, etc.
         messages=[
-            {"role": "system", "content": (
-                "You are a research evaluator. Given a prompt and a paragraph, "
-                "rate how relevant the paragraph is to the prompt. "
-                "Output only a number between 0 and 1, where 1 means 'highly relevant' "
-                "and 0 means 'completely irrelevant'."
-            )},
+            {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": f"Prompt: {progress_prompt}\n\nParagraph: {paragraph}"}
         ]
     )
@@ -36,4 +120,287 @@ def computeProgress(paragraph: str, query: str):
     score = float(response.choices[0].message.content.strip())
     assert np.any(np.isin(possible_progress_values, score))
 
-    return score
\ No newline at end of file
+    _SCORE_STORE.set(key, score)
+    return score
+
+
+# ---- Batched scoring engine ----
+
+class ScoreCountError(ValueError):
+    """The model returned a different number of scores than paragraphs sent."""
+
+
+class ScoringAbandoned(Exception):
+    """The request another task was waiting on stopped before scoring its paragraph."""
+
+
+def _batch_messages(query: str, paragraphs: Sequence[str]) -> List[Dict[str, str]]:
+    numbered = "\n\n".join(f"[P{j + 1}] {p}" for j, p in enumerate(paragraphs))
+    return [
+        {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Prompt: {_progress_prompt(query)}\n\nParagraphs:\n\n{numbered}"},
+    ]
+
+
+async def _score_batch(query: str, paragraphs: Sequence[str]) -> List[float | None]:
+    """
+    One structured-output request for a batch; bisects on a malformed answer.
+    A single paragraph the model still cannot score comes back as None.
+    """
+    try:
+        resp = await scheduler.chat(
+            model=PROGRESS_MODEL,
+            messages=_batch_messages(query, paragraphs),
+            max_tokens=16 + 8 * len(paragraphs),
+            temperature=0,
+            response_format=_SCORES_FORMAT,
+        )
+        scores = json.loads(resp.choices[0].message.content)["scores"]
+        if len(scores) != len(paragraphs):
+            raise ScoreCountError(f"expected {len(paragraphs)} scores, got {len(scores)}")
+        return [_snap(float(s)) for s in scores]
+    except (ScoreCountError, ValueError, KeyError, TypeError, openai.BadRequestError) as e:
+        if len(paragraphs) == 1:
+            print(f"Warning: could not score paragraph, leaving it out: {paragraphs[0][:80]!r}: {e}")
+            return [None]
+        mid = len(paragraphs) // 2
+        left, right = await asyncio.gather(
+            _score_batch(query, paragraphs[:mid]), _score_batch(query, paragraphs[mid:])
+        )
+        return left + right
+
+
+def _pack(paragraphs: Sequence[str]) -> List[List[int]]:
+    return pack_batches(
+        [count_tokens(p) for p in paragraphs],
+        max_items=PROGRESS_BATCH_SIZE,
+        max_tokens=PROGRESS_BATCH_TOKENS,
+    )
+
+
+# ---- Score cache ----
+
+def _prepare(paragraph: str) -> str:
+    """The text actually scored: whitespace-normalized and truncated."""
+    return truncate_to_tokens(" ".join((paragraph or "").split()) or ".", PROGRESS_MAX_PARAGRAPH_TOKENS)
+
+
+def _score_key(query: str, prepared: str) -> str:
+    # The prompt texts are part of the key, so editing a template invalidates its rows
+    return cache_key(
+        "progress", PROGRESS_PROMPT_VERSION, PROGRESS_MODEL, SYSTEM_PROMPT, BATCH_SYSTEM_PROMPT,
+        _progress_prompt(" ".join(query.split())), content_hash(prepared, PROGRESS_MODEL),
+    )
+
+
+def _resolve(owned: Dict[str, concurrent.futures.Future], scores: Dict[str, float | None]) -> None:
+    for key, s in scores.items():
+        fut = owned.get(key)
+        if fut is not None and not fut.done():
+            fut.set_result(s)
+
+
+def _release(owned: Dict[str, concurrent.futures.Future], error: BaseException | None = None) -> None:
+    """Drops this call's in-flight registrations."""
+    with _INFLIGHT_LOCK:
+        for key, fut in owned.items():
+            if not fut.done():
+                fut.set_exception(error if isinstance(error, Exception) else ScoringAbandoned())
+            if _INFLIGHT.get(key) is fut:
+                del _INFLIGHT[key]
+
+
+async def _renew_claims(keys: List[str]) -> None:
+    """Keeps this process's claims alive while their batch waits on the rate limits or the model."""
+    while True:
+        await asyncio.sleep(PROGRESS_CLAIM_TTL / 3)
+        _SCORE_CLAIMS.set_many({k: os.getpid() for k in keys})
+
+
+async def _await_claims(keys: List[str]) -> Dict[str, float]:
+    """Polls the store for keys another process is scoring, until their claims are gone."""
+    pending = set(keys)
+    found: Dict[str, float] = {}
+    while pending:
+        await asyncio.sleep(PROGRESS_CLAIM_POLL)
+        hits = _SCORE_STORE.get_many(pending)
+        found.update(hits)
+        pending.difference_update(hits)
+        # a lapsed or released claim without a stored score: the other process gave up
+        pending.intersection_update(_SCORE_CLAIMS.get_many(pending))
+    return found
+
+
+async def _scores_by_key(query: str, texts: Dict[str, str]) -> AsyncIterator[Dict[str, float | None]]:
+    """
+    Resolves {key: score} for every key in `texts`, yielding groups as they
+    become available: cached scores first, then each model batch, each
+    in-flight request shared with another task or thread, and each batch of
+    keys another worker process was already scoring. Unscorable paragraphs
+    resolve to None and are not cached.
+    """
+    cached = _SCORE_STORE.get_many(texts)
+    if cached:
+        yield cached
+    misses = [k for k in texts if k not in cached]
+
+    owned: Dict[str, concurrent.futures.Future] = {}
+    shared: Dict[str, concurrent.futures.Future] = {}
+    with _INFLIGHT_LOCK:
+        for key in misses:
+            if key in _INFLIGHT:
+                shared[key] = _INFLIGHT[key]
+            else:
+                owned[key] = _INFLIGHT[key] = concurrent.futures.Future()
+
+    async def score(keys: List[str]) -> Dict[str, float | None]:
+        # claim right before dispatch; keys another worker already holds are awaited instead
+        mine = _SCORE_CLAIMS.add_many({k: os.getpid() for k in keys})
+        ours = [k for k in keys if k in mine]
+        theirs = [k for k in keys if k not in mine]
+        scores: Dict[str, float | None] = {}
+        if ours:
+            renew = asyncio.ensure_future(_renew_claims(ours))
+            try:
+                scores = dict(zip(ours, await _score_batch(query, [texts[k] for k in ours])))
+            finally:
+                renew.cancel()
+                _SCORE_CLAIMS.delete_many(ours)
+            _SCORE_STORE.set_many({k: s for k, s in scores.items() if s is not None})
+            _resolve(owned, scores)
+        if theirs:
+            print(f"Progress scores: waiting on {len(theirs)} being scored by another worker")
+            found = await _await_claims(theirs)
+            _resolve(owned, found)
+            scores.update(found)
+            left = [k for k in theirs if k not in found]
+            if left:
+                # the other worker gave up on these
+                scores.update(await score(left))
+        return scores
+
+    async def wait_shared(key: str) -> Dict[str, float | None]:
+        try:
+            return {key: await asyncio.wrap_future(shared[key])}
+        except Exception:
+            # the request we piggybacked on failed; pay for this one ourselves
+            return await score([key])
+
+    batches = _pack([texts[k] for k in owned])
+    owned_keys = list(owned)
+    jobs = [score([owned_keys[i] for i in batch]) for batch in batches]
+    jobs += [wait_shared(k) for k in shared]
+    if texts:
+        print(f"Progress scores: {len(cached)} cached, {len(shared)} shared with in-flight requests, "
+              f"{len(owned)} to score with {PROGRESS_MODEL} in {len(batches)} batches")
+
+    tasks = [asyncio.ensure_future(job) for job in jobs]
+    error: BaseException | None = None
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        # the consumer may stop early (or be cancelled); stop paying for batches nobody reads
+        for task in tasks:
+            task.cancel()
+        _release(owned, error)
+
+
+async def _score_texts(
+    query: str, paragraphs: Sequence[str]
+) -> AsyncIterator[Tuple[List[int], List[float | None]]]:
+    """(paragraph indices, scores) groups as they resolve; duplicate paragraphs are scored once."""
+    positions: Dict[str, List[int]] = {}
+    texts: Dict[str, str] = {}
+    for i, p in enumerate(paragraphs):
+        prepared = _prepare(p)
+        key = _score_key(query, prepared)
+        texts.setdefault(key, prepared)
+        positions.setdefault(key, []).append(i)
+
+    async for scores in _scores_by_key(query, texts):
+        idxs: List[int] = []
+        values: List[float | None] = []
+        for key, s in scores.items():
+            idxs.extend(positions[key])
+            values.extend(s for _ in positions[key])
+        yield idxs, values
+
+
+async def score_paragraphs_async(query: str, paragraphs: Sequence[str]) -> List[float | None]:
+    """
+    Progress score per paragraph: cached where possible, the rest many per
+    request, all in flight. None for a paragraph the model could not score.
+    """
+    out: List[float | None] = [None] * len(paragraphs)
+    async for idxs, scores in _score_texts(query, paragraphs):
+        for i, s in zip(idxs, scores):
+            out[i] = s
+    return out
+
+
+@dataclass(frozen=True)
+class ArticleProgress:
+    paper_id: str
+    average: float  # mean over the paragraphs scored so far
+    scored: int
+    total: int  # paragraphs that can be scored (unscorable ones are dropped)
+
+    @property
+    def done(self) -> bool:
+        return self.scored == self.total
+
+
+async def stream_article_progress(
+    query: str, articles: Dict[str, Sequence[str]]
+) -> AsyncIterator[ArticleProgress]:
+    """
+    Scores every article's paragraphs with batches packed across articles and
+    yields an updated ArticleProgress for each article a batch touched, as
+    soon as that batch completes (cached scores arrive first). Paragraphs the
+    model could not score count towards neither the average nor the total.
+    """
+    owners: List[str] = []
+    flat: List[str] = []
+    for paper_id, paragraphs in articles.items():
+        owners.extend(paper_id for _ in paragraphs)
+        flat.extend(paragraphs)
+    totals = {pid: len(ps) for pid, ps in articles.items() if ps}
+    sums = {pid: 0.0 for pid in totals}
+    counts = {pid: 0 for pid in totals}
+
+    async for idxs, scores in _score_texts(query, flat):
+        touched = []
+        for i, s in zip(idxs, scores):
+            pid = owners[i]
+            if s is None:
+                totals[pid] -= 1
+            else:
+                sums[pid] += s
+                counts[pid] += 1
+            if pid not in touched:
+                touched.append(pid)
+        for pid in touched:
+            if counts[pid]:
+                yield ArticleProgress(pid, sums[pid] / counts[pid], counts[pid], totals[pid])
+
+
+def score_articles(
+    query: str,
+    articles: Dict[str, Sequence[str]],
+    on_update: Callable[[ArticleProgress], None] | None = None,
+) -> Dict[str, float]:
+    """Average progress per article (articles with no scorable paragraphs are left out)."""
+    final: Dict[str, float] = {}
+
+    async def run() -> None:
+        async for update in stream_article_progress(query, articles):
+            final[update.paper_id] = update.average
+            if on_update is not None:
+                on_update(update)
+
+    asyncio.run(run())
+    return final
@@ -0,0 +1,194 @@
+"""
+Asyncio request scheduler for the OpenAI API.
+
+Every call goes through a concurrency cap plus two token buckets (requests
+per minute and tokens per minute), and 429s are retried with exponential
+backoff that honours the server's Retry-After hint. Bulk jobs can therefore
+fire thousands of calls with asyncio.gather and run at the rate limit
+instead of one round-trip at a time. Use the module-level `scheduler`; a
+second instance would get its own budget.
+
+Limits come from the environment:
+  OPENAI_MAX_CONCURRENCY  (default 8)
+  OPENAI_RPM              requests per minute (default 500)
+  OPENAI_TPM              tokens per minute (default 200000)
+"""
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, List, TypeVar
+import asyncio
+import os
+import random
+import threading
+import time
+
+import openai
+from openai import AsyncOpenAI
+from dotenv import load_dotenv
+
+from batch_embed import count_tokens
+
+load_dotenv()
+
+T = TypeVar("T")
+
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY") or 8)
+DEFAULT_RPM = float(os.getenv("OPENAI_RPM") or 500)
+DEFAULT_TPM = float(os.getenv("OPENAI_TPM") or 200_000)
+
+
+class TokenBucket:
+    """Continuous-refill bucket holding at most one minute of budget."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock: asyncio.Lock | None = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, n: float = 1.0) -> None:
+        # A single request larger than the bucket still has to go out eventually
+        n = min(float(n), self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                await asyncio.sleep((n - self.tokens) / self.rate)
+
+
+def _retry_after(e: openai.APIStatusError) -> float | None:
+    try:
+        value = e.response.headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (AttributeError, ValueError):
+        return None
+
+
+class RequestScheduler:
+    """
+    Rate-limit-aware front end for AsyncOpenAI.
+
+    The concurrency slots, bucket locks and the async HTTP client live on one
+    long-lived event loop in a daemon thread. Callers await submit()/embed()/
+    chat() from any loop or thread (e.g. a fresh asyncio.run per Flask
+    request); the work is handed to the scheduler's loop, so every caller in
+    the process shares one client and one set of limits. After a fork the
+    child starts its own loop on first use.
+    """
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        *,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        requests_per_minute: float = DEFAULT_RPM,
+        tokens_per_minute: float = DEFAULT_TPM,
+        max_retries: int = 6,
+    ):
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._rpm = TokenBucket(requests_per_minute)
+        self._tpm = TokenBucket(tokens_per_minute)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pid: int | None = None
+        self._start_lock = threading.Lock()
+        self._sem: asyncio.Semaphore | None = None
+        self._client: AsyncOpenAI | None = None
+
+    def set_limits(
+        self,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        max_concurrency: int | None = None,
+    ) -> None:
+        """Changes the RPM/TPM budget (e.g. a per-worker share of the account limit) or the concurrency cap."""
+        for bucket, per_minute in ((self._rpm, requests_per_minute), (self._tpm, tokens_per_minute)):
+            if per_minute is not None:
+                bucket.capacity = float(per_minute)
+                bucket.rate = bucket.capacity / 60.0
+                bucket.tokens = min(bucket.tokens, bucket.capacity)
+        if max_concurrency is not None:
+            with self._start_lock:
+                self.max_concurrency = max_concurrency
+                # calls already holding a slot release it on the old semaphore
+                if self._sem is not None:
+                    self._sem = asyncio.Semaphore(max_concurrency)
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is not None and self._pid == os.getpid():
+                return self._loop
+            loop = asyncio.new_event_loop()
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+            self._rpm._lock = asyncio.Lock()
+            self._tpm._lock = asyncio.Lock()
+            # max_retries=0: retries are ours so they pass back through the buckets
+            self._client = AsyncOpenAI(api_key=self.api_key, max_retries=0)
+            threading.Thread(target=loop.run_forever, name="openai-scheduler", daemon=True).start()
+            self._loop = loop
+            self._pid = os.getpid()
+            return loop
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """The shared client; only use it from coroutines run through submit()."""
+        self._ensure_loop()
+        return self._client
+
+    async def submit(self, make_call: Callable[[], Awaitable[T]], tokens: int = 0) -> T:
+        """Runs `make_call()` on the scheduler loop once budget and a concurrency slot are available."""
+        loop = self._ensure_loop()
+        coro = self._run(make_call, tokens)
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    async def _run(self, make_call: Callable[[], Awaitable[T]], tokens: int) -> T:
+        for attempt in range(self.max_retries + 1):
+            await self._rpm.acquire(1)
+            if tokens:
+                await self._tpm.acquire(tokens)
+            try:
+                async with self._sem:
+                    return await make_call()
+            except (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = _retry_after(e) if isinstance(e, openai.APIStatusError) else None
+                if delay is None:
+                    delay = min(60.0, 2.0 ** attempt) * (0.5 + random.random() / 2)
+                await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def embed(self, model: str, texts: List[str], tokens: int | None = None) -> List[List[float]]:
+        if tokens is None:
+            tokens = sum(count_tokens(t) for t in texts)
+
+        async def call():
+            resp = await self.client.embeddings.create(model=model, input=texts)
+            return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+        return await self.submit(call, tokens)
+
+    async def chat(self, *, model: str, messages: List[dict], max_tokens: int, **kwargs: Any):
+        prompt_tokens = sum(count_tokens(m.get("content") or "") for m in messages)
+
+        async def call():
+            return await self.client.chat.completions.create(
+                model=model, messages=messages, max_tokens=max_tokens, **kwargs
+            )
+
+        return await self.submit(call, prompt_tokens + max_tokens)
+
+
+# One scheduler per process, so every module draws from the same limits
+scheduler = RequestScheduler(api_key=os.getenv("OPENAI_API_KEY"))
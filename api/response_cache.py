@@ -0,0 +1,234 @@
+"""
+Caches for LLM responses.
+
+SqliteCache is the durable layer. One database file can be shared by every
+Gunicorn worker on a host: it runs in WAL mode (readers never block the
+writer) with a busy timeout, and each process/thread opens its own
+connection. Entries are JSON values keyed by a caller-built hash; the table
+is kept under `max_entries` by evicting the least recently used rows, and
+rows older than `ttl` seconds (if set) are treated as misses. add() and
+add_many() insert only absent keys, so a table with a short ttl doubles as a
+cross-process lease ("I am computing this key").
+
+LRUCache is a small in-process front layer with the same bounds.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./llm_cache.sqlite3")
+
+# Evicting costs a full ordered scan, so only check every so many writes
+_EVICT_EVERY = 64
+
+
+def cache_key(*parts: str) -> str:
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(str(p).encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+class LRUCache:
+    """In-process LRU map with an optional TTL (seconds)."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float | None = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            stored_at, value = item
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SqliteCache:
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        table: str = "responses",
+        max_entries: int = 50_000,
+        ttl: float | None = None,
+    ):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite connections must not cross fork() or threads
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        parent = os.path.dirname(self.path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table}(accessed_at)")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Any | None:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        conn = self._conn()
+        out: Dict[str, Any] = {}
+        min_created = time.time() - self.ttl if self.ttl is not None else 0.0
+        # stay well under SQLITE_MAX_VARIABLE_NUMBER
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            marks = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT key, value FROM {self.table} WHERE key IN ({marks}) AND created_at >= ?",
+                [*chunk, min_created],
+            ).fetchall()
+            for k, v in rows:
+                out[k] = json.loads(v)
+            if rows:
+                try:
+                    conn.execute(
+                        f"UPDATE {self.table} SET accessed_at = ? WHERE key IN ({marks})",
+                        [time.time(), *chunk],
+                    )
+                except sqlite3.OperationalError:
+                    pass  # recency is best-effort; never fail a read over it
+        return out
+
+    def set(self, key: str, value: Any) -> None:
+        self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, Any]) -> None:
+        if not items:
+            return
+        now = time.time()
+        conn = self._conn()
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+            [(k, json.dumps(v), now, now) for k, v in items.items()],
+        )
+        self._writes += len(items)
+        if self._writes >= _EVICT_EVERY:
+            self._writes = 0
+            self.evict()
+
+    def add(self, key: str, value: Any) -> bool:
+        """Inserts only if `key` is absent (or expired); True if this call inserted it."""
+        now = time.time()
+        conn = self._conn()
+        if self.ttl is not None:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ? AND created_at < ?", (key, now - self.ttl))
+        return conn.execute(
+            f"INSERT OR IGNORE INTO {self.table} (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now, now),
+        ).rowcount == 1
+
+    def add_many(self, items: Dict[str, Any]) -> set[str]:
+        """add() for many keys in one write transaction; returns the keys this call inserted."""
+        if not items:
+            return set()
+        now = time.time()
+        conn = self._conn()
+        keys = list(items)
+        inserted: set[str] = set()
+        # IMMEDIATE takes the write lock up front, so nobody inserts between our SELECT and INSERT
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                marks = ",".join("?" * len(chunk))
+                if self.ttl is not None:
+                    conn.execute(
+                        f"DELETE FROM {self.table} WHERE key IN ({marks}) AND created_at < ?",
+                        [*chunk, now - self.ttl],
+                    )
+                taken = {k for (k,) in conn.execute(f"SELECT key FROM {self.table} WHERE key IN ({marks})", chunk)}
+                fresh = [k for k in chunk if k not in taken]
+                conn.executemany(
+                    f"INSERT INTO {self.table} (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    [(k, json.dumps(items[k]), now, now) for k in fresh],
+                )
+                inserted.update(fresh)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return inserted
+
+    def delete(self, key: str) -> None:
+        self.delete_many([key])
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        self._conn().executemany(f"DELETE FROM {self.table} WHERE key = ?", [(k,) for k in keys])
+
+    def evict(self) -> int:
+        """Drops expired rows, then least recently used rows beyond `max_entries`."""
+        conn = self._conn()
+        removed = 0
+        if self.ttl is not None:
+            removed += conn.execute(
+                f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+        (count,) = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)",
+                (excess,),
+            )
+            removed += excess
+        return removed
+
+    def __len__(self) -> int:
+        (count,) = self._conn().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        return count
+
+    def keys(self) -> List[str]:
+        return [k for (k,) in self._conn().execute(f"SELECT key FROM {self.table}")]
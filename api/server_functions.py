@@ -2,13 +2,16 @@ import numpy as np
 import chromadb
 from chromadb.api.client import Client
 from typing import Optional, List
+from collections import Counter
+from dataclasses import dataclass, field
 import os
 import chromadb.utils.embedding_functions as embedding_functions
 from dotenv import load_dotenv
 import sys
-from relevance_score import computeProgress
+from relevance_score import score_articles
 from clean_documents import clean_documents
-from parsed_data import article_content
+from embeddings_create import PARAGRAPH_COLLECTION
+import bm25
 from pprint import pprint
 import re
 
@@ -25,90 +28,303 @@ openai_ef = embedding_functions.OpenAIEmbeddingFunction(
             )
 client = chromadb.PersistentClient(path='./chroma/')
 
-def get_relevant_articles(query: str, N: int):
-    query_embedding = openai_ef([query])
+# Hybrid retrieval weights per signal (distances are smaller-is-better)
+TITLE_WEIGHT = .5
+KEYWORDS_WEIGHT = 1
+PARAGRAPHS_WEIGHT = 1
+LEXICAL_WEIGHT = .5
+# Standard reciprocal-rank-fusion damping constant
+RRF_K = 60
+
+# Progress pre-filter: only each article's best paragraphs (by embedding
+# similarity blended with BM25 over the candidates) reach the LLM
+PROGRESS_TOP_K = int(os.getenv("PROGRESS_TOP_K") or 3)
+# Optional floor on cosine similarity; paragraphs below it are never scored
+PROGRESS_MIN_SIMILARITY = (
+    float(os.environ["PROGRESS_MIN_SIMILARITY"]) if os.getenv("PROGRESS_MIN_SIMILARITY") else None
+)
+PREFILTER_LEXICAL_WEIGHT = .3
+
+
+# Saved BM25 index (bm25.py); False once found missing
+_BM25: bm25.BM25Index | None | bool = None
+
+
+def _lexical_ranked(query: str, n: int) -> list[tuple[str, float]]:
+    """BM25 ranking as (paper_id, -score), so smaller is better like a distance."""
+    global _BM25
+    if _BM25 is None:
+        _BM25 = bm25.BM25Index.load() or False
+    if not _BM25:
+        return []
+    return [(_BM25.ids[i], -score) for i, score in _BM25.search(query, n)]
+
+
+def embed_query(query: str):
+    """Embeds the query once; pass the result to every retrieval/scoring call."""
+    return openai_ef([query])
+
+
+def _ranked_ids(ids: list[str], dists: list[float]) -> list[tuple[str, float]]:
+    """(paper_id, distance) best first, keeping each paper's first (best) hit."""
+    seen: dict[str, float] = {}
+    for id, dist in zip(ids, dists):
+        if id not in seen:
+            seen[id] = dist
+    return list(seen.items())
+
+
+def reciprocal_rank_fusion(ranked_lists: list[list[tuple[str, float]]], weights: list[float]) -> dict[str, float]:
+    """Higher is better. An id missing from a list simply gets nothing from it."""
+    fused: dict[str, float] = {}
+    for ranked, weight in zip(ranked_lists, weights):
+        for rank, (id, _) in enumerate(ranked):
+            fused[id] = fused.get(id, 0.0) + weight / (RRF_K + rank + 1)
+    return fused
+
+
+def weighted_score_fusion(ranked_lists: list[list[tuple[str, float]]], weights: list[float]) -> dict[str, float]:
+    """
+    Higher is better. Distances are min-max scaled to [0, 1] similarities per
+    list; an id missing from a list scores 0 there instead of being dropped.
+    """
+    fused: dict[str, float] = {}
+    for ranked, weight in zip(ranked_lists, weights):
+        if not ranked:
+            continue
+        dists = [d for _, d in ranked]
+        lo, hi = min(dists), max(dists)
+        span = (hi - lo) or 1.0
+        for id, dist in ranked:
+            fused[id] = fused.get(id, 0.0) + weight * (1.0 - (dist - lo) / span)
+    return fused
+
+
+def get_relevant_articles(query: str, N: int, query_embedding=None, fusion: str = "rrf"):
+    """
+    Top N articles for `query` as (id, title, keywords, paragraphs) tuples.
+
+    The query is embedded once (or `query_embedding` is reused) and run against
+    the title, keyword and paragraph collections; if a BM25 index has been
+    built, its lexical ranking joins them. The rankings are fused with
+    reciprocal-rank ("rrf") or weighted-score ("weighted") fusion over their
+    union. Titles and keywords come back with the queries; the winners'
+    paragraphs come from one filtered get().
+    """
+    if query_embedding is None:
+        query_embedding = embed_query(query)
+
     article_title_matches = client.get_collection(name="article_titles").query(
         query_embeddings=query_embedding,
-        n_results=(N * 10)
+        n_results=(N * 10),
+        include=["documents", "distances"]
     )
     article_keyword_matches = client.get_collection(name="article_keywords").query(
         query_embeddings=query_embedding,
-        n_results=(N * 10)
+        n_results=(N * 10),
+        include=["documents", "distances"]
+    )
+    paragraph_matches = client.get_collection(name=PARAGRAPH_COLLECTION).query(
+        query_embeddings=query_embedding,
+        n_results=(N * 20),
+        include=["metadatas", "distances"]
+    )
+
+    title_ranked = _ranked_ids(article_title_matches["ids"][0], article_title_matches["distances"][0])
+    keyword_ranked = _ranked_ids(article_keyword_matches["ids"][0], article_keyword_matches["distances"][0])
+    paragraph_ranked = _ranked_ids(
+        [m["paper_id"] for m in paragraph_matches["metadatas"][0]],
+        paragraph_matches["distances"][0],
+    )
+
+    fuse = weighted_score_fusion if fusion == "weighted" else reciprocal_rank_fusion
+    fused = fuse(
+        [title_ranked, keyword_ranked, paragraph_ranked, _lexical_ranked(query, N * 10)],
+        [TITLE_WEIGHT, KEYWORDS_WEIGHT, PARAGRAPHS_WEIGHT, LEXICAL_WEIGHT],
+    )
+    scores = sorted(fused.items(), key=lambda x: x[1], reverse=True)[:N]
+    relevant_ids = [s[0] for s in scores]
+
+    titles_map = dict(zip(article_title_matches["ids"][0], article_title_matches["documents"][0]))
+    keywords_map = dict(zip(article_keyword_matches["ids"][0], article_keyword_matches["documents"][0]))
+
+    # Winners that only ranked via another signal: one batched get per collection
+    for name, docs_map in (("article_titles", titles_map), ("article_keywords", keywords_map)):
+        missing = [id for id in relevant_ids if id not in docs_map]
+        if missing:
+            found = client.get_collection(name=name).get(ids=missing, include=["documents"])
+            docs_map.update(zip(found["ids"], found["documents"]))
+
+    relevant_titles = [titles_map.get(id, "") for id in relevant_ids]
+    relevant_keywords = [keywords_map.get(id, "") for id in relevant_ids]
+    relevant_paragraphs = _paragraphs_for(relevant_ids)
+
+    assert len(relevant_ids) == len(relevant_titles) == len(relevant_keywords) == len(relevant_paragraphs)
+    return list(zip(relevant_ids, relevant_titles, relevant_keywords, relevant_paragraphs))
+
+def _paragraphs_for(paper_ids: list[str]) -> list[list[str]]:
+    """All paragraphs of each paper, in document order, from one filtered get()."""
+    if not paper_ids:
+        return []
+    try:
+        found = client.get_collection(name=PARAGRAPH_COLLECTION).get(
+            where={"paper_id": {"$in": paper_ids}},
+            include=["documents", "metadatas"]
+        )
+    except Exception as e:
+        print(f"Warning: Could not get collection '{PARAGRAPH_COLLECTION}': {e}")
+        return [[] for _ in paper_ids]
+
+    by_paper: dict[str, list[tuple[int, str]]] = {id: [] for id in paper_ids}
+    for doc, meta in zip(found["documents"], found["metadatas"]):
+        by_paper[meta["paper_id"]].append((meta["paragraph_index"], doc))
+    return [[doc for _, doc in sorted(by_paper[id])] for id in paper_ids]
+
+
+def most_relevant_paragraphs(query_embedding, relevant_ids: list[str], N: int) -> dict[str, list[tuple[str, float]]]:
+    """
+    Up to N best (paragraph, distance) pairs per article for the query. One
+    query over the shared paragraph collection (filtered to relevant_ids)
+    serves most articles. Only if that query came back full (so it may have
+    cut off some articles' paragraphs) are the articles it left short of N
+    hits, and that have more paragraphs than it returned, topped up with their
+    own paper_id-filtered query.
+    """
+    if not relevant_ids or N <= 0:
+        return {}
+    collection = client.get_collection(name=PARAGRAPH_COLLECTION)
+    limit = N * len(relevant_ids)
+    matches = collection.query(
+        query_embeddings=query_embedding,
+        n_results=limit,
+        where={"paper_id": {"$in": relevant_ids}},
+        include=["documents", "metadatas", "distances"]
     )
 
-    # if set(article_title_matches["ids"][0]) != set(article_keyword_matches["ids"][0]):
-    #     pprint(f'first few title ids are: {article_title_matches["ids"][0][:10]}')
-    #     pprint(f'first few keyword ids are: {article_keyword_matches["ids"][0][:10]}')
-    #     pprint(f'difference: {set(article_title_matches["ids"][0]) - set(article_keyword_matches["ids"][0])}')
-    #     assert set(article_title_matches["ids"][0]) == set(article_keyword_matches["ids"][0])
+    best: dict[str, list[tuple[str, float]]] = {id: [] for id in relevant_ids}
+    for doc, meta, dist in zip(matches["documents"][0], matches["metadatas"][0], matches["distances"][0]):
+        hits = best[meta["paper_id"]]
+        if len(hits) < N:
+            hits.append((doc, dist))
+    if len(matches["ids"][0]) < limit:
+        return best  # not truncated: every article already has all its paragraphs
+
+    short = [id for id in relevant_ids if len(best[id]) < N]
+    if not short:
+        return best
+    # metadata-only read: which short articles actually have more paragraphs
+    counts = Counter(m["paper_id"] for m in collection.get(
+        where={"paper_id": {"$in": short}}, include=["metadatas"]
+    )["metadatas"])
+    for id in short:
+        if counts[id] > len(best[id]):
+            own = collection.query(
+                query_embeddings=query_embedding,
+                n_results=min(N, counts[id]),
+                where={"paper_id": id},
+                include=["documents", "distances"]
+            )
+            best[id] = list(zip(own["documents"][0], own["distances"][0]))
+    return best
 
-    title_ids = article_title_matches["ids"][0]
-    title_dists = article_title_matches["distances"][0]
-    keyword_ids = article_keyword_matches["ids"][0]
-    keyword_dists = article_keyword_matches["distances"][0]
 
-    titles_map = dict(zip(title_ids, title_dists))
-    keywords_map = dict(zip(keyword_ids, keyword_dists))
+@dataclass
+class ProgressResult:
+    score: float
+    article_scores: dict[str, float] = field(default_factory=dict)
+    candidates: int = 0  # paragraphs retrieved for the relevant articles
+    scored: int = 0  # paragraphs passed to the scoring engine (cached ones cost no call)
 
-    common_ids = set(title_ids).intersection(set(keyword_ids))
+    @property
+    def paragraphs_filtered(self) -> int:
+        """Candidates the local pre-filter dropped before scoring."""
+        return self.candidates - self.scored
 
-    scores: list[tuple[str, float]] = []
-    title_weight = .5
-    keywords_weight = 1
 
-    for id in common_ids:
-        score = float(title_weight * titles_map[id] + keywords_weight * keywords_map[id])
-        
-        scores.append((id, score))
+def _similarity(distance: float) -> float:
+    # Chroma's default space is squared L2; for unit vectors that is 2 - 2*cos
+    return 1.0 - distance / 2.0
 
-    scores.sort(key=lambda x: x[1])
-    scores = scores[:N]
 
-    relevant_ids = [s[0] for s in scores]
-    relevant_titles = client.get_collection(name="article_titles").get(ids=relevant_ids)['documents']
-    relevant_keywords = client.get_collection(name="article_keywords").get(ids=relevant_ids)['documents']
-
-    relevant_paragraphs: list[list[str]] = []
-    for i, id in enumerate(relevant_ids):
-        collection_name = f"article_paragraphs_{id}"
-        try:
-            collection = client.get_collection(name=collection_name)
-            paragraphs_ids: list[str] = collection.get()["ids"]
-            this_article_relevant_paragraphs: list[str] = collection.get(ids=paragraphs_ids)["documents"]
-            relevant_paragraphs.append(this_article_relevant_paragraphs)
-        except Exception as e:
-            print(f"Warning: Could not get collection '{collection_name}': {e}")
-            relevant_paragraphs.append([])
+def prefilter_paragraphs(
+    query: str,
+    best: dict[str, list[tuple[str, float]]],
+    top_k: int = PROGRESS_TOP_K,
+    min_similarity: float | None = PROGRESS_MIN_SIMILARITY,
+) -> dict[str, list[str]]:
+    """
+    Cheap local tier before LLM scoring: ranks each article's candidate
+    paragraphs by cosine similarity blended with BM25 (computed over the
+    candidate pool, scaled to [0, 1]) and keeps at most `top_k` of those at or
+    above `min_similarity` (if set). LLM cost is then bounded by top_k * articles.
+    """
+    flat = [(id, doc, dist) for id, hits in best.items() for doc, dist in hits]
+    if not flat:
+        return {}
+    lexical = bm25.BM25Index.build(
+        [str(i) for i in range(len(flat))], [Counter(bm25.tokenize(doc)) for _, doc, _ in flat]
+    ).scores(query)
+    if lexical.max() > 0:
+        lexical = lexical / lexical.max()
+
+    ranked: dict[str, list[tuple[float, str]]] = {}
+    for (id, doc, dist), lex in zip(flat, lexical.tolist()):
+        sim = _similarity(dist)
+        if min_similarity is not None and sim < min_similarity:
             continue
-        
-    assert len(relevant_ids) == len(relevant_titles) == len(relevant_keywords) == len(relevant_paragraphs)
-    return list(zip(relevant_ids, relevant_titles, relevant_keywords, relevant_paragraphs))
+        blended = (1 - PREFILTER_LEXICAL_WEIGHT) * sim + PREFILTER_LEXICAL_WEIGHT * lex
+        ranked.setdefault(id, []).append((blended, doc))
+    return {
+        id: [doc for _, doc in sorted(hits, key=lambda h: h[0], reverse=True)[:top_k]]
+        for id, hits in ranked.items()
+    }
 
-def compute_score(query: str, relevant_ids: list[str], paragraphs: list[list[str]], N: int):
 
-    overall_score = 0.0
-    assert len(relevant_ids) == len(paragraphs)
-    for i in range(len(relevant_ids)):
-        paragraph_list = paragraphs[i]
-        id = relevant_ids[i]
+def compute_progress(
+    query: str,
+    relevant_ids: list[str],
+    N: int,
+    query_embedding=None,
+    on_update=None,
+    top_k: int = PROGRESS_TOP_K,
+    min_similarity: float | None = PROGRESS_MIN_SIMILARITY,
+) -> ProgressResult:
+    """
+    Mean progress over the relevant articles. Each article's N nearest
+    paragraphs are pre-filtered locally (prefilter_paragraphs) and only the
+    survivors go to the batched scoring engine; `on_update` receives each
+    ArticleProgress partial average as batches complete.
+    """
+    if query_embedding is None:
+        query_embedding = embed_query(query)
+    best = most_relevant_paragraphs(query_embedding, relevant_ids, N)
+    selected = prefilter_paragraphs(query, best, top_k=top_k, min_similarity=min_similarity)
 
-        most_relevant_paragraphs = client.get_or_create_collection(name=f"article_paragraphs_{id}").query(
-            query_embeddings=openai_ef([query]),
-            n_results=N
-        )
-        pprint(f'most_relevant_paragraphs is {most_relevant_paragraphs}')
-        return
-        
-            # overall_score += np.average([computeProgress(paragraph, query) for paragraph in paragraph_list])
-    overall_score /= len(paragraphs)
-    return overall_score
+    result = ProgressResult(
+        score=0.0,
+        candidates=sum(len(hits) for hits in best.values()),
+        scored=sum(len(ps) for ps in selected.values()),
+    )
+    result.article_scores = score_articles(query, selected, on_update=on_update)
+    if result.article_scores:
+        result.score = float(np.average(list(result.article_scores.values())))
+    print(f"Progress for '{query}': scored {result.scored}/{result.candidates} paragraphs "
+          f"({result.paragraphs_filtered} dropped by the pre-filter)")
+    return result
+
+
+def compute_score(query: str, relevant_ids: list[str], N: int, query_embedding=None, on_update=None):
+    return compute_progress(query, relevant_ids, N, query_embedding, on_update).score
 
 
-relevant_articles = get_relevant_articles('Growing edible plants in space', N=50)
-# pprint(relevant_articles[:2])
-# pprint(f'number of relevant articles is {len(relevant_articles)}\n')
+if __name__ == '__main__':
+    query = 'Growing edible plants in space'
+    query_embedding = embed_query(query)
+    relevant_articles = get_relevant_articles(query, N=50, query_embedding=query_embedding)
+    # pprint(relevant_articles[:2])
+    # pprint(f'number of relevant articles is {len(relevant_articles)}\n')
 
-pprint('Computing score...')
-final_score = compute_score('Growing edible plants in space', [x[0] for x in relevant_articles], [x[3] for x in relevant_articles], N=20)
+    pprint('Computing score...')
+    final_score = compute_score(query, [x[0] for x in relevant_articles], N=20, query_embedding=query_embedding)
 
-print(f'Final score is {final_score}')
\ No newline at end of file
+    print(f'Final score is {final_score}')
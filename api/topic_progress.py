@@ -0,0 +1,291 @@
+"""
+Materialized progress for the dashboard's topics.
+
+Computing a topic live (retrieval + LLM progress scoring) takes minutes, so
+every topic in topics.json is computed offline and written to one JSON view:
+progress, article count and consensus per topic, each stamped with when it
+was computed and the corpus version it was computed against. The dashboard
+loads every bar with a single read of that view (GET /api/progress).
+
+The corpus version is a hash of the ingest manifest, so it changes exactly
+when embeddings_create.py adds, changes or removes Chroma records. A refresh
+only recomputes topics whose version (or query) is stale; a background
+thread can poll for corpus changes and refresh automatically.
+
+Usage (from api/):
+    python topic_progress.py            # refresh stale topics once
+    python topic_progress.py --force    # recompute everything
+    python topic_progress.py --watch    # keep refreshing as the corpus changes
+
+The API only reads the view; run --watch as its own long-lived process
+(next to Gunicorn, not inside it) to keep it fresh.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from ingest_manifest import INGEST_MANIFEST_PATH
+
+TOPICS_PATH = os.getenv("TOPICS_PATH", "./topics.json")
+TOPIC_PROGRESS_PATH = os.getenv("TOPIC_PROGRESS_PATH", "./topic_progress.json")
+# Seconds between corpus-version checks of the background refresher
+TOPIC_REFRESH_INTERVAL = float(os.getenv("TOPIC_REFRESH_INTERVAL") or 600)
+# Retrieval depth per topic: articles considered, nearest paragraphs per article
+TOPIC_ARTICLES = int(os.getenv("TOPIC_ARTICLES") or 50)
+TOPIC_PARAGRAPHS = 20
+# An article counts towards a topic only with a paragraph at least this similar
+TOPIC_MIN_SIMILARITY = float(os.getenv("TOPIC_MIN_SIMILARITY") or 0.25)
+# Articles whose score is within this distance of the topic median agree with it
+CONSENSUS_TOLERANCE = .2
+
+UNVERSIONED = "unversioned"
+
+_write_lock = threading.Lock()
+
+
+# ---- Config and view I/O ----
+
+def load_topics(path: str = TOPICS_PATH) -> List[dict]:
+    """Categories from the topic config: [{label, param, topics: [str | {topic, query}]}]."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["categories"]
+
+
+def topic_query(label: str, topic) -> tuple[str, str]:
+    """(topic name, retrieval query); the query defaults to the topic within its category."""
+    if isinstance(topic, dict):
+        return topic["topic"], topic.get("query") or f"{topic['topic']} ({label})"
+    return topic, f"{topic} ({label})"
+
+
+def corpus_version(manifest_path: str = INGEST_MANIFEST_PATH) -> str:
+    """Hash of the ingest manifest, i.e. of everything currently embedded in Chroma."""
+    try:
+        with open(manifest_path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()[:16]
+    except OSError:
+        return UNVERSIONED
+
+
+def load_view(path: str = TOPIC_PROGRESS_PATH) -> dict:
+    """The materialized view; an empty one if nothing has been computed yet."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"corpus_version": None, "updated_at": None, "categories": []}
+
+
+def _save_view(view: dict, path: str = TOPIC_PROGRESS_PATH) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(view, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# ---- Computation ----
+
+def consensus_pct(article_scores: Dict[str, float], tolerance: float = CONSENSUS_TOLERANCE) -> int:
+    """Share of articles (in %) whose progress score is within `tolerance` of the median."""
+    if not article_scores:
+        return 0
+    scores = np.array(list(article_scores.values()))
+    agreeing = np.abs(scores - np.median(scores)) <= tolerance + 1e-9
+    return int(round(100 * agreeing.mean()))
+
+
+def compute_topic(query: str) -> dict:
+    """Progress, article count and consensus for one topic query."""
+    import server_functions as sf
+
+    query_embedding = sf.embed_query(query)
+    relevant = sf.get_relevant_articles(query, N=TOPIC_ARTICLES, query_embedding=query_embedding)
+    result = sf.compute_progress(
+        query, [a[0] for a in relevant], TOPIC_PARAGRAPHS,
+        query_embedding=query_embedding, min_similarity=TOPIC_MIN_SIMILARITY,
+    )
+    return {
+        "progress": int(round(100 * result.score)),
+        "count": len(result.article_scores),
+        "consensusPct": consensus_pct(result.article_scores),
+        "paragraphs_scored": result.scored,
+    }
+
+
+def _category_progress(topics: List[dict]) -> Optional[int]:
+    """Article-count-weighted mean of the category's computed topics."""
+    done = [t for t in topics if t.get("progress") is not None]
+    weights = [t["count"] for t in done]
+    if not done or not sum(weights):
+        return None
+    return int(round(np.average([t["progress"] for t in done], weights=weights)))
+
+
+def _fresh(entry: Optional[dict], query: str, version: str) -> bool:
+    return bool(entry) and entry.get("corpus_version") == version and entry.get("query") == query
+
+
+def _plan(view: dict, version: str, force: bool, topics_path: str) -> tuple[dict, List[tuple[str, dict]]]:
+    """
+    The view laid out as topics.json says, reusing `view`'s entries: fresh ones
+    as they are, stale ones with their old numbers until the new ones land.
+    Also returns (category param, entry) for every topic to recompute.
+    """
+    previous = {
+        (c["param"], t["topic"]): t
+        for c in view.get("categories", [])
+        for t in c.get("topics", [])
+    }
+    planned = {"corpus_version": version, "updated_at": _now(), "categories": []}
+    todo = []
+    for cat in load_topics(topics_path):
+        entries = []
+        for topic in cat["topics"]:
+            name, query = topic_query(cat["label"], topic)
+            old = previous.get((cat["param"], name))
+            if not force and _fresh(old, query, version):
+                entries.append(old)
+                continue
+            entry = {"topic": name, "query": query, "progress": None, "count": 0, "consensusPct": 0,
+                     "corpus_version": None, "computed_at": None}
+            # keep serving the stale numbers until the new ones land
+            if old:
+                entry.update({k: old[k] for k in ("progress", "count", "consensusPct") if k in old})
+            entries.append(entry)
+            todo.append((cat["param"], entry))
+        planned["categories"].append({
+            "label": cat["label"], "param": cat["param"],
+            "progress": _category_progress(entries), "topics": entries,
+        })
+    return planned, todo
+
+
+def _write_entry(param: str, entry: dict, path: str) -> None:
+    """Merges one computed topic into the latest view on disk and saves it."""
+    with _write_lock:
+        view = load_view(path)
+        for cat in view.get("categories", []):
+            if cat["param"] != param:
+                continue
+            for i, t in enumerate(cat["topics"]):
+                # a concurrent refresh may have re-planned this topic for a new query
+                if t["topic"] == entry["topic"] and t.get("query") == entry["query"]:
+                    cat["topics"][i] = entry
+                    cat["progress"] = _category_progress(cat["topics"])
+        view["updated_at"] = _now()
+        _save_view(view, path)
+
+
+def refresh(
+    force: bool = False, topics_path: str = TOPICS_PATH, path: str = TOPIC_PROGRESS_PATH
+) -> tuple[int, int]:
+    """
+    Recomputes every topic that is missing, was computed against another
+    corpus version or query, or all of them with `force`. Topics are computed
+    without holding the write lock; each result is merged into the latest
+    view and saved as it lands, so an interrupted refresh keeps what it
+    finished and concurrent refreshes never lose each other's topics.
+    Returns (topics recomputed, topics that failed); failed topics stay
+    stale and are retried on the next refresh.
+    """
+    version = corpus_version()
+    with _write_lock:
+        previous = load_view(path)
+        view, todo = _plan(previous, version, force, topics_path)
+        _save_view(view, path)
+    materialized = sum(len(c.get("topics", [])) for c in previous.get("categories", []))
+
+    print(f"Topic progress: {len(todo)} stale of {materialized or 'no'} materialized topics "
+          f"(corpus version {version})")
+    done = failed = 0
+    for n, (param, entry) in enumerate(todo, 1):
+        if not force:
+            latest = {(c["param"], t["topic"]): t for c in load_view(path).get("categories", []) for t in c["topics"]}
+            if _fresh(latest.get((param, entry["topic"])), entry["query"], version):
+                continue  # another refresh got there first
+        started = time.monotonic()
+        try:
+            result = compute_topic(entry["query"])
+        except Exception as e:
+            print(f"Warning: could not compute progress for '{entry['topic']}': {e}")
+            failed += 1
+            continue
+        entry = dict(entry, **result, corpus_version=version, computed_at=_now())
+        _write_entry(param, entry, path)
+        done += 1
+        print(f"[{n}/{len(todo)}] {entry['topic']}: progress {entry['progress']}%, "
+              f"{entry['count']} articles, consensus {entry['consensusPct']}% "
+              f"({time.monotonic() - started:.0f}s)")
+    return done, failed
+
+
+# ---- Background refresh ----
+
+class TopicRefresher(threading.Thread):
+    """
+    Daemon thread that refreshes the view whenever the corpus version changes,
+    and keeps retrying while any topic failed to compute.
+    """
+
+    def __init__(self, interval: float = TOPIC_REFRESH_INTERVAL):
+        super().__init__(name="topic-refresher", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        last_version = None
+        while not self._stop_event.is_set():
+            version = corpus_version()
+            if version != last_version:
+                try:
+                    _, failed = refresh()
+                    if not failed:
+                        last_version = version
+                except Exception as e:
+                    print(f"Warning: topic progress refresh failed: {e}")
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+def start_background_refresh(interval: float = TOPIC_REFRESH_INTERVAL) -> TopicRefresher:
+    refresher = TopicRefresher(interval)
+    refresher.start()
+    return refresher
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Materialize progress, article count and consensus per topic.")
+    parser.add_argument("--force", action="store_true", help="recompute every topic, not just stale ones")
+    parser.add_argument("--watch", action="store_true",
+                        help=f"keep running and refresh whenever the corpus changes "
+                             f"(checked every {TOPIC_REFRESH_INTERVAL:.0f}s)")
+    args = parser.parse_args()
+
+    refreshed, failed = refresh(force=args.force)
+    print(f"Recomputed {refreshed} topics ({failed} failed) -> {TOPIC_PROGRESS_PATH}")
+    if args.watch:
+        refresher = TopicRefresher()
+        try:
+            refresher.run()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
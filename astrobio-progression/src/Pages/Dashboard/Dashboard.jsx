@@ -7,12 +7,20 @@ import Heatmap from "../../components/charts/Heatmap/Heatmap.jsx";
 import WordGraph from "../../components/charts/WordGraph/WordGraph.jsx";
 import Consensus from "../../components/charts/Consensus/Consensus.jsx";
 import ArticleSearch from "../../components/articles/ArticleSearch.jsx";
-import { categories } from "../../components/layout/BarContainer/categories.js";
+import { categories as defaultCategories, mergeProgress } from "../../components/layout/BarContainer/categories.js";
+import { fetchProgress } from "../../services/api";
 import "./Dashboard.css";
 
 function Dashboard() {
   const { category: param } = useParams();
   const [query, setQuery] = useState("");
+  const [categories, setCategories] = useState(defaultCategories);
+
+  useEffect(() => {
+    fetchProgress()
+      .then(view => setCategories(mergeProgress(defaultCategories, view)))
+      .catch(console.error);
+  }, []);
 
   const handleSearch = (q) => setQuery(q.trim());
   const handleBack = () => {
@@ -22,7 +30,7 @@ function Dashboard() {
   // clear search when changing category
   useEffect(() => setQuery(""), [param]);
 
-  const cat = useMemo(() => categories.find(c => c.param === param), [param]);
+  const cat = useMemo(() => categories.find(c => c.param === param), [categories, param]);
 
   if (!cat) {
     return (
@@ -1,10 +1,19 @@
+import { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
 import ProgressBar from "../../ProgressBar/ProgressBar.jsx";
-import { categories } from "./categories.js";
+import { categories as defaultCategories, mergeProgress } from "./categories.js";
+import { fetchProgress } from "../../../services/api";
 import "./BarContainer.css";
 
 function BarContainer() {
   const navigate = useNavigate();
+  const [categories, setCategories] = useState(defaultCategories);
+
+  useEffect(() => {
+    fetchProgress()
+      .then(view => setCategories(mergeProgress(defaultCategories, view)))
+      .catch(console.error);
+  }, []);
 
   // Helper function to handle navigation to the topic page
   const handleNavigate = (topic) => {
@@ -54,3 +54,24 @@ export const categories = [
 
 // export default categories;
 
+
+// Overlays the materialized view from /api/progress onto the defaults above;
+// topics the backend has not computed yet keep their placeholder numbers.
+export function mergeProgress(defaults, view) {
+  const byParam = new Map((view?.categories ?? []).map(c => [c.param, c]));
+  return defaults.map(cat => {
+    const computed = byParam.get(cat.param);
+    if (!computed) return cat;
+    const topics = new Map(computed.topics.map(t => [t.topic, t]));
+    return {
+      ...cat,
+      progress: computed.progress ?? cat.progress,
+      topics: cat.topics.map(t => {
+        const c = topics.get(t.topic);
+        return c && c.progress != null
+          ? { ...t, count: c.count, consensusPct: c.consensusPct, progress: c.progress }
+          : t;
+      })
+    };
+  });
+}
@@ -20,4 +20,11 @@ export async function fetchAgreement(topic) {
 export async function fetchCorrelation(topic) {
   const res = await fetch(`${BASE_URL}/correlation?topic=${topic}`);
   return res.json();
-}
\ No newline at end of file
+}
+
+// Precomputed progress / article count / consensus for every dashboard topic
+export async function fetchProgress() {
+  const res = await fetch(`${BASE_URL}/progress`);
+  if (!res.ok) throw new Error("Failed to fetch progress");
+  return res.json();
+}
@@ -0,0 +1,76 @@
+"""
+Benchmark the scraper's HTML parser backends on saved pages.
+
+Runs biopub_scrape.parse_paper with the BeautifulSoup (bs4) and lxml
+backends over every *.html file in a fixtures directory, reports per-page
+timings, and checks that both produce identical records.
+
+Usage:
+    python bench_parse.py html_fixtures/ [--repeat 3]
+    python bench_parse.py http_cache/bodies/      # every page the scraper has cached
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+
+from biopub_scrape import parse_paper
+
+BACKENDS = ("bs4", "lxml")
+
+
+def _comparable(record: dict) -> dict:
+    # scraped_at is a timestamp, not parser output
+    return {k: v for k, v in record.items() if k != 'scraped_at'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare bs4 and lxml parse_paper backends on saved HTML.")
+    parser.add_argument("fixtures", help="directory of saved article pages (*.html)")
+    parser.add_argument("--repeat", type=int, default=3, help="parses per page per backend (best is kept)")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.fixtures, "*.html")))
+    if not paths:
+        print(f"No *.html files in {args.fixtures}")
+        return
+
+    timings = {backend: [] for backend in BACKENDS}
+    mismatches = []
+    total_bytes = 0
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            html = f.read()
+        total_bytes += len(html)
+        url = f"file://{os.path.abspath(path)}"
+
+        records = {}
+        for backend in BACKENDS:
+            best = float("inf")
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                records[backend] = parse_paper(url, html, backend=backend)
+                best = min(best, time.perf_counter() - started)
+            timings[backend].append(best * 1000)
+
+        if _comparable(records["bs4"]) != _comparable(records["lxml"]):
+            mismatches.append(path)
+
+    print(f"{len(paths)} pages, {total_bytes / 1e6:.1f} MB of HTML")
+    for backend in BACKENDS:
+        ms = timings[backend]
+        print(f"  {backend:>4}: total {sum(ms):8.1f} ms  "
+              f"median {statistics.median(ms):7.2f} ms/page  max {max(ms):7.2f} ms/page")
+    print(f"  speedup: {sum(timings['bs4']) / sum(timings['lxml']):.1f}x")
+
+    if mismatches:
+        print(f"\n{len(mismatches)} page(s) parse differently:")
+        for path in mismatches:
+            print(f"  {path}")
+    else:
+        print("\nIdentical records from both backends on every page.")
+
+
+if __name__ == "__main__":
+    main()
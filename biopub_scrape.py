@@ -1,21 +1,49 @@
+import argparse
+import asyncio
 import csv
 import json
 import hashlib
+import os
 import time
 from datetime import datetime, timezone
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
 import multiprocessing as mp
 import logging
 from collections import Counter
 
+import aiohttp
 import requests
 from bs4 import BeautifulSoup
+from http_cache import ResponseCache
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
 MAX_WORKERS = 6
 REQUEST_TIMEOUT = 30
-RATE_LIMIT_DELAY = 0.5
+RATE_LIMIT_DELAY = 0.5  # seconds between requests to the same host
+MAX_CONCURRENCY = 8  # requests in flight across the whole crawl
+MAX_RETRIES = 3
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# HTML parsing backend: "lxml" (fast_parse.py, default when lxml is installed)
+# or "bs4" (BeautifulSoup html.parser). Both produce identical records.
+try:
+    import lxml.html  # noqa: F401
+    _DEFAULT_PARSER = "lxml"
+except ImportError:
+    _DEFAULT_PARSER = "bs4"
+PARSER_BACKEND = os.getenv("SCRAPE_PARSER", _DEFAULT_PARSER)
+
+META_FIELDS = (
+    'citation_doi', 'citation_pmid', 'citation_title', 'citation_journal_title',
+    'citation_publisher', 'citation_publication_date', 'citation_volume',
+    'citation_issue', 'citation_firstpage',
+)
+SOURCE_CSV = "biopub_data.csv"
+OUTPUT_FILE = "llm_data_biopub.jsonl"
 HEADERS = {
     "User-Agent": (
         "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
@@ -67,199 +95,217 @@ def count_words(text: str) -> int:
     return len(text.split())
 
 
-def scrape_paper(url: str, session: requests.Session) -> Dict:
-    """Scrape a paper from the given URL."""
-    try:
-        response = session.get(url, timeout=REQUEST_TIMEOUT)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
+def extract_fields(html: str) -> Dict:
+    """Raw page fields via BeautifulSoup's html.parser (reference backend)."""
+    soup = BeautifulSoup(html, 'html.parser')
 
-        doi = get_meta(soup, 'citation_doi')
-        pmid = get_meta(soup, 'citation_pmid')
-        missing_fields = []
-        
-        authors = []
-        author_tags = soup.find_all('meta', {'name': 'citation_author'})
-        affiliation_tags = soup.find_all('meta', {'name': 'citation_author_institution'})
-        
-        for i, author_tag in enumerate(author_tags):
-            author_name = author_tag.get('content', '').strip()
-            if author_name:
-                authors.append({
-                    'name': author_name,
-                    'affiliation': affiliation_tags[i]['content'].strip() 
-                                   if i < len(affiliation_tags) else None
+    authors = []
+    author_tags = soup.find_all('meta', {'name': 'citation_author'})
+    affiliation_tags = soup.find_all('meta', {'name': 'citation_author_institution'})
+    
+    for i, author_tag in enumerate(author_tags):
+        author_name = author_tag.get('content', '').strip()
+        if author_name:
+            authors.append({
+                'name': author_name,
+                'affiliation': affiliation_tags[i]['content'].strip() 
+                               if i < len(affiliation_tags) else None
+            })
+
+    # Extract abstract paragraphs
+    abstract_paragraphs = []
+    abstract_section = soup.find('section', class_='abstract')
+    if abstract_section:
+        for p in abstract_section.find_all('p'):
+            para_text = p.get_text(strip=True)
+            if para_text:
+                abstract_paragraphs.append({
+                    'text': para_text,
+                    'word_count': count_words(para_text)
                 })
 
-        # Extract abstract paragraphs
-        abstract_paragraphs = []
-        abstract_section = soup.find('section', class_='abstract')
-        if abstract_section:
-            for p in abstract_section.find_all('p'):
+    sections = []
+    total_words = 0
+    main_article = soup.find('article')
+    
+    if main_article:
+        for section in main_article.find_all('section', recursive=False):
+            heading = section.find(['h2', 'h3'], class_='pmc_sec_title')
+            heading_text = get_text(heading) if heading else 'Untitled Section'
+            
+            # Extract paragraphs individually
+            paragraphs = []
+            for p in section.find_all('p'):
                 para_text = p.get_text(strip=True)
                 if para_text:
-                    abstract_paragraphs.append({
+                    word_count = count_words(para_text)
+                    total_words += word_count
+                    paragraphs.append({
                         'text': para_text,
-                        'word_count': count_words(para_text)
-                    })
-
-        sections = []
-        total_words = 0
-        main_article = soup.find('article')
-        
-        if main_article:
-            for section in main_article.find_all('section', recursive=False):
-                heading = section.find(['h2', 'h3'], class_='pmc_sec_title')
-                heading_text = get_text(heading) if heading else 'Untitled Section'
-                
-                # Extract paragraphs individually
-                paragraphs = []
-                for p in section.find_all('p'):
-                    para_text = p.get_text(strip=True)
-                    if para_text:
-                        word_count = count_words(para_text)
-                        total_words += word_count
-                        paragraphs.append({
-                            'text': para_text,
-                            'word_count': word_count
-                        })
-                
-                if paragraphs:
-                    sections.append({
-                        'heading': heading_text,
-                        'paragraphs': paragraphs,
-                        'paragraph_count': len(paragraphs),
-                        'total_word_count': sum(p['word_count'] for p in paragraphs)
+                        'word_count': word_count
                     })
-
-        references = []
-        ref_list = soup.find('section', class_='ref-list')
-        if ref_list:
-            for idx, ref in enumerate(ref_list.find_all('li'), 1):
-                cite = ref.find('cite')
-                if cite:
-                    references.append({
-                        'id': str(idx),
-                        'text': get_text(cite)
-                    })
-
-        figures = []
-        tables = []
-        
-        for fig in soup.find_all('figure', class_='fig'):
-            caption = fig.find('figcaption')
-            img = fig.find('img')
-            fig_id = fig.get('id', '')
-            caption_text = get_text(caption)
             
-            if 'table' in fig_id.lower():
-                tables.append({
-                    'id': fig_id or f'table_{len(tables) + 1}',
-                    'caption': caption_text
+            if paragraphs:
+                sections.append({
+                    'heading': heading_text,
+                    'paragraphs': paragraphs,
+                    'paragraph_count': len(paragraphs),
+                    'total_word_count': sum(p['word_count'] for p in paragraphs)
                 })
-            else:
-                figures.append({
-                    'id': fig_id or f'figure_{len(figures) + 1}',
-                    'caption': caption_text,
-                    'url': img.get('src') if img else None
+
+    references = []
+    ref_list = soup.find('section', class_='ref-list')
+    if ref_list:
+        for idx, ref in enumerate(ref_list.find_all('li'), 1):
+            cite = ref.find('cite')
+            if cite:
+                references.append({
+                    'id': str(idx),
+                    'text': get_text(cite)
                 })
 
-        funding_section = soup.find('section', id='funding-statement1')
-        funding = get_text(funding_section)
-        if funding:
-            funding = funding.replace('Funding Statement', '', 1).strip()
-        
-        ack_section = soup.find('section', id='ack1')
-        acknowledgments = get_text(ack_section)
-        if acknowledgments:
-            acknowledgments = acknowledgments.replace('Acknowledgments', '', 1).strip()
-
-        if not doi:
-            missing_fields.append('doi')
-        if not pmid:
-            missing_fields.append('pmid')
-        if not abstract_paragraphs:
-            missing_fields.append('abstract')
+    figures = []
+    tables = []
+    
+    for fig in soup.find_all('figure', class_='fig'):
+        caption = fig.find('figcaption')
+        img = fig.find('img')
+        fig_id = fig.get('id', '')
+        caption_text = get_text(caption)
         
-        return {
-            'success': True,
-            'paper_id': doi or f"hash_{hashlib.md5(url.encode()).hexdigest()[:16]}",
-            'source_url': url,
-            'scraped_at': datetime.now(timezone.utc).isoformat(),
-            'missing_fields': missing_fields,
-            'metadata': {
-                'title': get_meta(soup, 'citation_title'),
-                'authors': authors,
-                'journal': get_meta(soup, 'citation_journal_title'),
-                'publisher': get_meta(soup, 'citation_publisher'),
-                'doi': doi,
-                'pmid': pmid,
-                'publication_date': get_meta(soup, 'citation_publication_date'),
-                'volume': get_meta(soup, 'citation_volume'),
-                'issue': get_meta(soup, 'citation_issue'),
-                'pages': get_meta(soup, 'citation_firstpage')
-            },
-            'abstract_paragraphs': abstract_paragraphs,
-            'sections': sections,
-            'references': references,
-            'figures': figures,
-            'tables': tables,
-            'funding': funding,
-            'acknowledgments': acknowledgments,
-            'metrics': {
-                'total_word_count': total_words,
-                'section_count': len(sections),
-                'total_paragraph_count': sum(s['paragraph_count'] for s in sections),
-                'abstract_paragraph_count': len(abstract_paragraphs),
-                'reference_count': len(references),
-                'figure_count': len(figures),
-                'table_count': len(tables)
-            }
+        if 'table' in fig_id.lower():
+            tables.append({
+                'id': fig_id or f'table_{len(tables) + 1}',
+                'caption': caption_text
+            })
+        else:
+            figures.append({
+                'id': fig_id or f'figure_{len(figures) + 1}',
+                'caption': caption_text,
+                'url': img.get('src') if img else None
+            })
+
+    return {
+        'meta': {name: get_meta(soup, name) for name in META_FIELDS},
+        'authors': authors,
+        'abstract_paragraphs': abstract_paragraphs,
+        'sections': sections,
+        'total_words': total_words,
+        'references': references,
+        'figures': figures,
+        'tables': tables,
+        'funding': get_text(soup.find('section', id='funding-statement1')),
+        'acknowledgments': get_text(soup.find('section', id='ack1')),
+    }
+
+
+def parse_paper(url: str, html: str, backend: str = PARSER_BACKEND) -> Dict:
+    """Extract a success record from a PMC article page (no network)."""
+    if backend == 'lxml':
+        from fast_parse import extract_fields_lxml
+        fields = extract_fields_lxml(html, META_FIELDS)
+    else:
+        fields = extract_fields(html)
+
+    meta = fields['meta']
+    doi = meta['citation_doi']
+    pmid = meta['citation_pmid']
+    abstract_paragraphs = fields['abstract_paragraphs']
+    sections = fields['sections']
+    references = fields['references']
+    figures = fields['figures']
+    tables = fields['tables']
+    missing_fields = []
+
+    funding = fields['funding']
+    if funding:
+        funding = funding.replace('Funding Statement', '', 1).strip()
+
+    acknowledgments = fields['acknowledgments']
+    if acknowledgments:
+        acknowledgments = acknowledgments.replace('Acknowledgments', '', 1).strip()
+
+    if not doi:
+        missing_fields.append('doi')
+    if not pmid:
+        missing_fields.append('pmid')
+    if not abstract_paragraphs:
+        missing_fields.append('abstract')
+    
+    return {
+        'success': True,
+        'paper_id': doi or f"hash_{hashlib.md5(url.encode()).hexdigest()[:16]}",
+        'source_url': url,
+        'scraped_at': datetime.now(timezone.utc).isoformat(),
+        'missing_fields': missing_fields,
+        'metadata': {
+            'title': meta['citation_title'],
+            'authors': fields['authors'],
+            'journal': meta['citation_journal_title'],
+            'publisher': meta['citation_publisher'],
+            'doi': doi,
+            'pmid': pmid,
+            'publication_date': meta['citation_publication_date'],
+            'volume': meta['citation_volume'],
+            'issue': meta['citation_issue'],
+            'pages': meta['citation_firstpage']
+        },
+        'abstract_paragraphs': abstract_paragraphs,
+        'sections': sections,
+        'references': references,
+        'figures': figures,
+        'tables': tables,
+        'funding': funding,
+        'acknowledgments': acknowledgments,
+        'metrics': {
+            'total_word_count': fields['total_words'],
+            'section_count': len(sections),
+            'total_paragraph_count': sum(s['paragraph_count'] for s in sections),
+            'abstract_paragraph_count': len(abstract_paragraphs),
+            'reference_count': len(references),
+            'figure_count': len(figures),
+            'table_count': len(tables)
         }
+    }
+
+
+def error_record(url: str, error: str, error_type: str, status_code: Optional[int] = None) -> Dict:
+    """Failure record in scrape_paper's schema."""
+    record = {
+        'success': False,
+        'paper_id': f"error_{hashlib.sha1(url.encode()).hexdigest()[:16]}",
+        'source_url': url,
+        'scraped_at': datetime.now(timezone.utc).isoformat(),
+        'error': error,
+        'error_type': error_type
+    }
+    if error_type == 'HTTPError':
+        record['status_code'] = status_code
+    return record
+
+
+def scrape_paper(url: str, session: requests.Session) -> Dict:
+    """Scrape a paper from the given URL."""
+    try:
+        response = session.get(url, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        
+        return parse_paper(url, response.text)
     
     except requests.HTTPError as e:
         error_detail = f"HTTP {e.response.status_code}" if e.response else str(e)
         logger.error(f"HTTP Error for {url}: {error_detail}")
-        return {
-            'success': False,
-            'paper_id': f"error_{hashlib.sha1(url.encode()).hexdigest()[:16]}",
-            'source_url': url,
-            'scraped_at': datetime.now(timezone.utc).isoformat(),
-            'error': error_detail,
-            'error_type': 'HTTPError',
-            'status_code': e.response.status_code if e.response else None
-        }
+        return error_record(url, error_detail, 'HTTPError',
+                            e.response.status_code if e.response else None)
     except requests.Timeout as e:
         logger.error(f"Timeout for {url}: {str(e)}")
-        return {
-            'success': False,
-            'paper_id': f"error_{hashlib.sha1(url.encode()).hexdigest()[:16]}",
-            'source_url': url,
-            'scraped_at': datetime.now(timezone.utc).isoformat(),
-            'error': 'Request timeout',
-            'error_type': 'Timeout'
-        }
+        return error_record(url, 'Request timeout', 'Timeout')
     except requests.RequestException as e:
         logger.error(f"Request Error for {url}: {str(e)}")
-        return {
-            'success': False,
-            'paper_id': f"error_{hashlib.sha1(url.encode()).hexdigest()[:16]}",
-            'source_url': url,
-            'scraped_at': datetime.now(timezone.utc).isoformat(),
-            'error': str(e),
-            'error_type': 'RequestException'
-        }
+        return error_record(url, str(e), 'RequestException')
     except Exception as e:
         logger.error(f"Unexpected Error for {url}: {str(e)}", exc_info=True)
-        return {
-            'success': False,
-            'paper_id': f"error_{hashlib.sha1(url.encode()).hexdigest()[:16]}",
-            'source_url': url,
-            'scraped_at': datetime.now(timezone.utc).isoformat(),
-            'error': str(e),
-            'error_type': type(e).__name__
-        }
+        return error_record(url, str(e), type(e).__name__)
 
 
 def transform_for_llm(record: Dict) -> Dict:
@@ -375,42 +421,214 @@ def transform_for_llm(record: Dict) -> Dict:
     }
 
 
-def process_url(url: str) -> str:
-    """Process a single URL (worker function for multiprocessing)."""
-    session = create_session()
+# ---- Async crawl engine ----
+# One pooled aiohttp session, a per-host token bucket shared by every task,
+# bounded concurrency, and HTML parsing offloaded to a process pool.
+
+class HostRateLimiter:
+    """Token bucket per host: `rate` requests/second with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._state: Dict[str, Tuple[float, float]] = {}  # host -> (tokens, updated_at)
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _refill(self, host: str) -> float:
+        now = time.monotonic()
+        tokens, updated = self._state.get(host, (float(self.burst), now))
+        return min(float(self.burst), tokens + (now - updated) * self.rate)
+
+    async def acquire(self, url: str) -> None:
+        host = urlsplit(url).netloc
+        # Waiters for a host queue on its lock, so they are released in FIFO order
+        async with self._locks.setdefault(host, asyncio.Lock()):
+            tokens = self._refill(host)
+            if tokens < 1.0:
+                await asyncio.sleep((1.0 - tokens) / self.rate)
+                tokens = self._refill(host)
+            self._state[host] = (tokens - 1.0, time.monotonic())
+
+    def back_off(self, url: str, delay: float) -> None:
+        """Hold every request to this host for `delay` seconds (e.g. after a 429)."""
+        host = urlsplit(url).netloc
+        tokens = min(self._refill(host), 1.0 - delay * self.rate)
+        self._state[host] = (tokens, time.monotonic())
+
+
+def _retry_after(response: aiohttp.ClientResponse) -> Optional[float]:
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+async def fetch_html(
+    session: aiohttp.ClientSession,
+    limiter: HostRateLimiter,
+    url: str,
+    cache: Optional[ResponseCache] = None,
+) -> str:
+    """
+    GET `url` under the host rate limit, retrying 429/5xx and connection errors.
+    With a cache, a previously fetched page is revalidated (ETag /
+    Last-Modified) and its stored body reused on 304 Not Modified.
+    """
+    entry = cache.lookup(url) if cache is not None else None
+    for attempt in range(MAX_RETRIES + 1):
+        await limiter.acquire(url)
+        try:
+            async with session.get(url, headers=ResponseCache.conditional_headers(entry)) as response:
+                if response.status == 304 and entry is not None:
+                    cache.touch(entry)
+                    return cache.read_body(entry)
+                if response.status in RETRY_STATUSES and attempt < MAX_RETRIES:
+                    limiter.back_off(url, _retry_after(response) or 2 ** attempt)
+                    continue
+                response.raise_for_status()
+                html = await response.text()
+                if cache is not None:
+                    cache.store(url, html, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                return html
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt == MAX_RETRIES:
+                raise
+            limiter.back_off(url, 2 ** attempt)
+    raise AssertionError("unreachable")
+
+
+def parse_to_json(url: str, html: str) -> str:
+    """Process-pool worker: parse a fetched page into its output line."""
     try:
-        time.sleep(RATE_LIMIT_DELAY)
-        record = scrape_paper(url, session)
-        llm_record = transform_for_llm(record)
-        return json.dumps(llm_record, ensure_ascii=False)
-    finally:
-        session.close()
+        record = parse_paper(url, html)
+    except Exception as e:
+        logger.error(f"Unexpected Error for {url}: {str(e)}", exc_info=True)
+        record = error_record(url, str(e), type(e).__name__)
+    return json.dumps(transform_for_llm(record), ensure_ascii=False)
+
+
+async def _scrape_one(session, limiter, pool, semaphore, url: str, cache, offline: bool) -> str:
+    if offline:
+        html = cache.get(url)
+        if html is None:
+            return json.dumps(transform_for_llm(error_record(url, 'Not in HTTP cache', 'NotCached')), ensure_ascii=False)
+        return await _parse_one(pool, url, html)
+
+    async with semaphore:
+        try:
+            html = await fetch_html(session, limiter, url, cache)
+        except aiohttp.ClientResponseError as e:
+            logger.error(f"HTTP Error for {url}: HTTP {e.status}")
+            record = error_record(url, f"HTTP {e.status}", 'HTTPError', e.status)
+            return json.dumps(transform_for_llm(record), ensure_ascii=False)
+        except asyncio.TimeoutError as e:
+            logger.error(f"Timeout for {url}: {str(e)}")
+            return json.dumps(transform_for_llm(error_record(url, 'Request timeout', 'Timeout')), ensure_ascii=False)
+        except aiohttp.ClientError as e:
+            logger.error(f"Request Error for {url}: {str(e)}")
+            return json.dumps(transform_for_llm(error_record(url, str(e), 'RequestException')), ensure_ascii=False)
+        except Exception as e:
+            logger.error(f"Unexpected error for {url}: {str(e)}")
+            return json.dumps(transform_for_llm(error_record(url, str(e), type(e).__name__)), ensure_ascii=False)
+    return await _parse_one(pool, url, html)
+
+
+async def _parse_one(pool, url: str, html: str) -> str:
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, parse_to_json, url, html)
+    except Exception as e:
+        logger.error(f"Parse error for {url}: {str(e)}")
+        return json.dumps(transform_for_llm(error_record(url, str(e), type(e).__name__)), ensure_ascii=False)
+
+
+async def crawl(
+    urls: List[str],
+    parse_workers: int,
+    cache: Optional[ResponseCache] = None,
+    offline: bool = False,
+) -> AsyncIterator[str]:
+    """
+    Scrapes `urls`, yielding each output line (JSON) as soon as it is ready.
+    `offline` parses only from `cache` and never touches the network.
+    """
+    limiter = HostRateLimiter(rate=1.0 / RATE_LIMIT_DELAY)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENCY, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    with ProcessPoolExecutor(max_workers=parse_workers) as pool:
+        async with aiohttp.ClientSession(headers=HEADERS, connector=connector, timeout=timeout) as session:
+            tasks = [
+                asyncio.ensure_future(_scrape_one(session, limiter, pool, semaphore, url, cache, offline))
+                for url in urls
+            ]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    yield await next_done
+            finally:
+                for task in tasks:
+                    task.cancel()
 
 
-def analyze_failures(output_file: str = "llm_data_biopub.jsonl"):
-    """Analyze the failures in the output file and print a summary."""
+def load_latest_records(output_file: str = OUTPUT_FILE) -> Dict[str, Dict]:
+    """
+    Latest record per source_url in the output file. Resumed runs append, so a
+    URL may appear several times (e.g. an error followed by a successful retry);
+    truncated or corrupt lines from an interrupted run are skipped.
+    """
+    latest: Dict[str, Dict] = {}
+    with open(output_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            url = record.get('source_url')
+            if url:
+                latest[url] = record
+    return latest
+
+
+def compact_output(output_file: str = OUTPUT_FILE) -> int:
+    """Rewrites the output file with one (latest) record per URL. Returns the record count."""
+    latest = load_latest_records(output_file)
+    tmp = f"{output_file}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as out:
+        for record in latest.values():
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp, output_file)
+    return len(latest)
+
+
+def analyze_failures(output_file: str = OUTPUT_FILE) -> List[Dict]:
+    """
+    Analyze the failures in the output file and print a summary.
+    Returns the failed records as {url, error, type}; a URL that later
+    succeeded is not counted.
+    """
     error_counts = Counter()
     failed_urls = []
     status_codes = Counter()
     
     try:
-        with open(output_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    record = json.loads(line)
-                    if record.get('status') == 'error':
-                        error_type = record.get('error_type', 'Unknown')
-                        error_counts[error_type] += 1
-                        failed_urls.append({
-                            'url': record.get('source_url'),
-                            'error': record.get('error'),
-                            'type': error_type
-                        })
-                        
-                        if record.get('status_code'):
-                            status_codes[record.get('status_code')] += 1
-                except json.JSONDecodeError:
-                    continue
+        for record in load_latest_records(output_file).values():
+            if record.get('status') == 'error':
+                error_type = record.get('error_type', 'Unknown')
+                error_counts[error_type] += 1
+                failed_urls.append({
+                    'url': record.get('source_url'),
+                    'error': record.get('error'),
+                    'type': error_type
+                })
+                
+                if record.get('status_code'):
+                    status_codes[record.get('status_code')] += 1
         
         if error_counts:
             print("\n" + "="*60)
@@ -438,16 +656,40 @@ def analyze_failures(output_file: str = "llm_data_biopub.jsonl"):
             print("\n" + "="*60)
     except FileNotFoundError:
         print(f"Output file {output_file} not found")
+    return failed_urls
+
+
+def _prepare_append(output_file: str) -> None:
+    """Makes sure appended records start on a fresh line after an interrupted run."""
+    if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
+        with open(output_file, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
 
 
 def main():
     """Main execution function."""
+    parser = argparse.ArgumentParser(description="Scrape PMC papers listed in biopub_data.csv.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--fresh", action="store_true",
+                      help="ignore existing output and re-scrape every URL")
+    mode.add_argument("--retry-failures", action="store_true",
+                      help="only re-scrape URLs whose latest record is an error")
+    parser.add_argument("--offline", action="store_true",
+                        help="parse pages from the HTTP cache only, no network (combine with --fresh to re-parse all)")
+    parser.add_argument("--no-cache", action="store_true", help="don't read or write the HTTP cache")
+    args = parser.parse_args()
+    if args.offline and args.no_cache:
+        parser.error("--offline needs the HTTP cache")
+    cache = None if args.no_cache else ResponseCache()
+
     source_urls = []
     csv_row_count = 0
     empty_urls = 0
     
     try:
-        with open("biopub_data.csv", "r", encoding="utf-8", newline="") as csv_in:
+        with open(SOURCE_CSV, "r", encoding="utf-8", newline="") as csv_in:
             reader = csv.DictReader(csv_in)
             for row in reader:
                 csv_row_count += 1
@@ -458,7 +700,7 @@ def main():
                     empty_urls += 1
                     logger.warning(f"Empty URL found in CSV row {csv_row_count}")
     except FileNotFoundError:
-        print("Error: biopub_data.csv not found")
+        print(f"Error: {SOURCE_CSV} not found")
         return
     
     print(f"CSV Analysis:")
@@ -469,36 +711,58 @@ def main():
     if not source_urls:
         print("No URLs found in CSV file")
         return
-    
+
+    # Resume: skip URLs that already have a successful record and append the rest
+    resuming = not args.fresh and os.path.exists(OUTPUT_FILE)
+    if resuming:
+        latest = load_latest_records(OUTPUT_FILE)
+        if args.retry_failures:
+            failed = {f['url'] for f in analyze_failures(OUTPUT_FILE)}
+            todo = [u for u in source_urls if u in failed]
+        else:
+            todo = [u for u in source_urls if latest.get(u, {}).get('status') != 'success']
+        print(f"  Already scraped: {len(source_urls) - len(todo)} (resuming)")
+        source_urls = todo
+        _prepare_append(OUTPUT_FILE)
+    elif args.retry_failures:
+        print(f"Error: {OUTPUT_FILE} not found; nothing to retry")
+        return
+
+    if not source_urls:
+        print("Nothing to do: every URL already has a successful record")
+        return
+
     print(f"\nProcessing {len(source_urls)} papers...")
     
     num_workers = min(MAX_WORKERS, max(2, mp.cpu_count() - 1))
-    print(f"Using {num_workers} worker processes\n")
+    print(f"Using {MAX_CONCURRENCY} concurrent requests, {num_workers} parser processes\n")
 
     successful = 0
     failed = 0
     processed_count = 0
-    
-    with mp.Pool(processes=num_workers) as pool, \
-         open("llm_data_biopub.jsonl", "w", encoding="utf-8") as out:
-        
-        for result_json in pool.imap_unordered(process_url, source_urls, chunksize=2):
-            out.write(result_json + "\n")
-            out.flush()
-            processed_count += 1
-            
-            try:
-                result = json.loads(result_json)
-                if result.get('status') == 'success':
-                    successful += 1
-                else:
+
+    async def run() -> None:
+        nonlocal successful, failed, processed_count
+        with open(OUTPUT_FILE, "a" if resuming else "w", encoding="utf-8") as out:
+            async for result_json in crawl(source_urls, num_workers, cache=cache, offline=args.offline):
+                out.write(result_json + "\n")
+                out.flush()
+                processed_count += 1
+
+                try:
+                    result = json.loads(result_json)
+                    if result.get('status') == 'success':
+                        successful += 1
+                    else:
+                        failed += 1
+                except:
                     failed += 1
-            except:
-                failed += 1
-                logger.error(f"Failed to parse JSON result for record {processed_count}")
-            
-            if processed_count % 10 == 0:
-                print(f"Processed {processed_count}/{len(source_urls)} papers (Success: {successful}, Failed: {failed})")
+                    logger.error(f"Failed to parse JSON result for record {processed_count}")
+
+                if processed_count % 10 == 0:
+                    print(f"Processed {processed_count}/{len(source_urls)} papers (Success: {successful}, Failed: {failed})")
+
+    asyncio.run(run())
     
     print(f"\nComplete!")
     print(f"  URLs in CSV: {len(source_urls)}")
@@ -510,7 +774,10 @@ def main():
         print(f"\n⚠️  WARNING: Processed {processed_count} but expected {len(source_urls)}")
         print(f"  Missing: {len(source_urls) - processed_count} records")
     
-    print(f"\nOutput saved to llm_data_biopub.jsonl")
+    if resuming:
+        print(f"  Records in output: {compact_output(OUTPUT_FILE)}")
+
+    print(f"\nOutput saved to {OUTPUT_FILE}")
     print(f"Errors logged to scraper_errors.log")
 
     if failed > 0:
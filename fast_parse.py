@@ -0,0 +1,198 @@
+"""
+lxml backend for biopub_scrape.parse_paper.
+
+One iteration over the parsed tree collects every anchor the extractor needs
+(meta tags, the abstract, the main article, the reference list, figures and
+the funding / acknowledgment sections); each anchor is then read with a
+targeted descent instead of BeautifulSoup's repeated full-tree find_all
+passes. Text extraction mirrors BeautifulSoup's stripped_strings (comments
+and script/style contents are skipped), so records are identical to the
+html.parser backend on well-formed pages. The one known divergence is
+malformed markup such as unclosed <p> tags, which libxml2 closes while
+html.parser nests; bench_parse.py reports any page where the two differ.
+"""
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import lxml.html
+from lxml import etree
+
+# Elements whose text BeautifulSoup does not report as page text
+_SKIP_TEXT = frozenset(('script', 'style'))
+
+
+def _has_class(el, name: str) -> bool:
+    return name in (el.get('class') or '').split()
+
+
+def _strings(el) -> Iterator[str]:
+    """Text nodes under `el` in document order, like BeautifulSoup's _all_strings."""
+    if el.text and el.tag not in _SKIP_TEXT:
+        yield el.text
+    for child in el:
+        # comments / processing instructions have a non-str tag; their tail is still text
+        if isinstance(child.tag, str) and child.tag not in _SKIP_TEXT:
+            yield from _strings(child)
+        if child.tail:
+            yield child.tail
+
+
+def _stripped(el) -> List[str]:
+    return [s for s in (t.strip() for t in _strings(el)) if s]
+
+
+def get_text(el) -> str:
+    """Same as biopub_scrape.get_text: space-joined stripped strings, "" for a missing node."""
+    return " ".join(_stripped(el)) if el is not None else ""
+
+
+def _para_text(el) -> str:
+    """BeautifulSoup's p.get_text(strip=True)."""
+    return "".join(_stripped(el))
+
+
+def _first(el, *tags: str, cls: Optional[str] = None):
+    for node in el.iter(*tags):
+        if node is not el and (cls is None or _has_class(node, cls)):
+            return node
+    return None
+
+
+def _count_words(text: str) -> int:
+    return len(text.split())
+
+
+def _parse(html: str):
+    try:
+        return lxml.html.document_fromstring(html)
+    except ValueError:
+        # str input with an XML encoding declaration
+        return lxml.html.document_fromstring(html.encode('utf-8'))
+    except etree.ParserError:
+        return None
+
+
+def extract_fields_lxml(html: str, meta_fields: Sequence[str]) -> Dict:
+    """Same fields as biopub_scrape.extract_fields, from one pass over the tree."""
+    metas: Dict[str, List] = {}
+    abstract_section = main_article = ref_list = funding_section = ack_section = None
+    fig_nodes = []
+
+    root = _parse(html)
+    if root is not None:
+        for el in root.iter('meta', 'section', 'article', 'figure'):
+            tag = el.tag
+            if tag == 'meta':
+                name = el.get('name')
+                if name is not None:
+                    metas.setdefault(name, []).append(el)
+            elif tag == 'section':
+                if abstract_section is None and _has_class(el, 'abstract'):
+                    abstract_section = el
+                if ref_list is None and _has_class(el, 'ref-list'):
+                    ref_list = el
+                el_id = el.get('id')
+                if funding_section is None and el_id == 'funding-statement1':
+                    funding_section = el
+                if ack_section is None and el_id == 'ack1':
+                    ack_section = el
+            elif tag == 'article':
+                if main_article is None:
+                    main_article = el
+            elif _has_class(el, 'fig'):
+                fig_nodes.append(el)
+
+    def meta_content(name: str) -> Optional[str]:
+        tags = metas.get(name)
+        if not tags:
+            return None
+        content = tags[0].get('content')
+        return content.strip() if content is not None else None
+
+    authors = []
+    affiliation_tags = metas.get('citation_author_institution', [])
+    for i, author_tag in enumerate(metas.get('citation_author', [])):
+        author_name = (author_tag.get('content') or '').strip()
+        if author_name:
+            authors.append({
+                'name': author_name,
+                'affiliation': affiliation_tags[i].get('content').strip()
+                               if i < len(affiliation_tags) else None
+            })
+
+    abstract_paragraphs = []
+    if abstract_section is not None:
+        for p in abstract_section.iter('p'):
+            para_text = _para_text(p)
+            if para_text:
+                abstract_paragraphs.append({
+                    'text': para_text,
+                    'word_count': _count_words(para_text)
+                })
+
+    sections = []
+    total_words = 0
+    if main_article is not None:
+        for section in main_article.iterchildren('section'):
+            heading = _first(section, 'h2', 'h3', cls='pmc_sec_title')
+            heading_text = get_text(heading) if heading is not None else 'Untitled Section'
+
+            paragraphs = []
+            for p in section.iter('p'):
+                para_text = _para_text(p)
+                if para_text:
+                    word_count = _count_words(para_text)
+                    total_words += word_count
+                    paragraphs.append({
+                        'text': para_text,
+                        'word_count': word_count
+                    })
+
+            if paragraphs:
+                sections.append({
+                    'heading': heading_text,
+                    'paragraphs': paragraphs,
+                    'paragraph_count': len(paragraphs),
+                    'total_word_count': sum(p['word_count'] for p in paragraphs)
+                })
+
+    references = []
+    if ref_list is not None:
+        for idx, ref in enumerate(ref_list.iter('li'), 1):
+            cite = _first(ref, 'cite')
+            if cite is not None:
+                references.append({
+                    'id': str(idx),
+                    'text': get_text(cite)
+                })
+
+    figures = []
+    tables = []
+    for fig in fig_nodes:
+        img = _first(fig, 'img')
+        fig_id = fig.get('id', '')
+        caption_text = get_text(_first(fig, 'figcaption'))
+
+        if 'table' in fig_id.lower():
+            tables.append({
+                'id': fig_id or f'table_{len(tables) + 1}',
+                'caption': caption_text
+            })
+        else:
+            figures.append({
+                'id': fig_id or f'figure_{len(figures) + 1}',
+                'caption': caption_text,
+                'url': img.get('src') if img is not None else None
+            })
+
+    return {
+        'meta': {name: meta_content(name) for name in meta_fields},
+        'authors': authors,
+        'abstract_paragraphs': abstract_paragraphs,
+        'sections': sections,
+        'total_words': total_words,
+        'references': references,
+        'figures': figures,
+        'tables': tables,
+        'funding': get_text(funding_section),
+        'acknowledgments': get_text(ack_section),
+    }
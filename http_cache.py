@@ -0,0 +1,94 @@
+"""
+On-disk HTTP response cache for the scraper.
+
+Bodies are content-addressed (bodies/<sha256>.html, so identical pages are
+stored once and the directory doubles as bench_parse.py fixtures); a small
+JSON entry per URL (entries/<sha1(url)>.json) records the body hash plus the
+ETag / Last-Modified validators. Re-runs revalidate with If-None-Match /
+If-Modified-Since and reuse the stored body on 304; offline runs parse
+straight from the cache without touching the network.
+"""
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Dict, Optional
+import hashlib
+import json
+import os
+
+HTTP_CACHE_DIR = os.getenv("SCRAPE_CACHE_DIR", "./http_cache/")
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    body_sha256: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: Optional[str] = None
+
+
+class ResponseCache:
+    def __init__(self, directory: str = HTTP_CACHE_DIR):
+        self.directory = directory
+        self.entries_dir = os.path.join(directory, "entries")
+        self.bodies_dir = os.path.join(directory, "bodies")
+        os.makedirs(self.entries_dir, exist_ok=True)
+        os.makedirs(self.bodies_dir, exist_ok=True)
+
+    def _entry_path(self, url: str) -> str:
+        return os.path.join(self.entries_dir, f"{hashlib.sha1(url.encode()).hexdigest()}.json")
+
+    def _body_path(self, digest: str) -> str:
+        return os.path.join(self.bodies_dir, f"{digest}.html")
+
+    @staticmethod
+    def _write(path: str, data: bytes) -> None:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        """The entry for `url` if both it and its body are on disk."""
+        try:
+            with open(self._entry_path(url), "r", encoding="utf-8") as f:
+                entry = CacheEntry(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+        return entry if os.path.exists(self._body_path(entry.body_sha256)) else None
+
+    def read_body(self, entry: CacheEntry) -> str:
+        with open(self._body_path(entry.body_sha256), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def get(self, url: str) -> Optional[str]:
+        entry = self.lookup(url)
+        return self.read_body(entry) if entry is not None else None
+
+    @staticmethod
+    def conditional_headers(entry: Optional[CacheEntry]) -> Dict[str, str]:
+        """Revalidation headers for a cached entry (empty if there is nothing to revalidate)."""
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store(self, url: str, body: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> CacheEntry:
+        data = body.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        if not os.path.exists(self._body_path(digest)):
+            self._write(self._body_path(digest), data)
+        entry = CacheEntry(url, digest, etag, last_modified, datetime.now(timezone.utc).isoformat())
+        self._save_entry(entry)
+        return entry
+
+    def touch(self, entry: CacheEntry) -> None:
+        """Records a successful revalidation (304) of `entry`."""
+        entry.fetched_at = datetime.now(timezone.utc).isoformat()
+        self._save_entry(entry)
+
+    def _save_entry(self, entry: CacheEntry) -> None:
+        self._write(self._entry_path(entry.url), json.dumps(asdict(entry)).encode("utf-8"))
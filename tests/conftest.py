@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The API modules import each other flat (they run from api/); the scraper lives at the root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "api"), ROOT]
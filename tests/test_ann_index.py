@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pytest
+
+import ann_index
+import embedding_store
+from ann_index import ExactIndex, load_or_build_index, make_index
+
+MODEL = "test-model"
+
+
+def _unit_rows(n, dim=16, seed=0):
+    m = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return m / np.linalg.norm(m, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_store, "EMBED_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(ann_index, "EMBED_STORE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_exact_search_is_sorted_top_k():
+    matrix = _unit_rows(30)
+    index = ExactIndex()
+    index.build(matrix)
+    labels, scores = index.search(matrix[:2], k=4)
+    assert labels[:, 0].tolist() == [0, 1]
+    expected = np.sort(matrix[:2] @ matrix.T, axis=1)[:, ::-1][:, :4]
+    np.testing.assert_allclose(scores, expected, rtol=1e-6)
+    assert index.search(matrix[0], k=100)[0].shape == (1, 30)
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        make_index("annoy")
+
+
+def test_hnsw_index_is_reused_until_the_keys_change(store_dir, monkeypatch):
+    pytest.importorskip("hnswlib")
+    matrix = _unit_rows(50)
+    keys = [(f"p{i}", f"h{i}") for i in range(50)]
+    builds = []
+    real_build = ann_index.HnswIndex.build
+    monkeypatch.setattr(ann_index.HnswIndex, "build", lambda self, m: (builds.append(len(m)), real_build(self, m)))
+
+    index = load_or_build_index("hnsw", MODEL, matrix, keys)
+    assert os.path.exists(ann_index.index_path("hnsw", MODEL))
+    assert index.search(matrix[7], k=1)[0][0, 0] == 7
+
+    load_or_build_index("hnsw", MODEL, matrix, keys)
+    assert builds == [50]
+
+    # one paper re-embedded: same size, different key, so the saved index is stale
+    keys[3] = ("p3", "h3-new")
+    load_or_build_index("hnsw", MODEL, matrix, keys)
+    assert builds == [50, 50]
+
+    grown = _unit_rows(60, seed=1)
+    index = load_or_build_index("hnsw", MODEL, grown, keys + [(f"q{i}", "") for i in range(10)])
+    assert builds == [50, 50, 60]
+    assert index.search(grown[55], k=1)[0][0, 0] == 55
+
+
+def test_exact_backend_writes_nothing(store_dir):
+    matrix = _unit_rows(5)
+    index = load_or_build_index("exact", MODEL, matrix, [(str(i), "") for i in range(5)])
+    assert isinstance(index, ExactIndex)
+    assert not any(name.endswith(".ann") or name.endswith(".keys.json") for name in os.listdir(store_dir))
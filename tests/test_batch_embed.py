@@ -0,0 +1,100 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+import batch_embed
+from batch_embed import EmbeddingError, embed_batched, embed_batched_async, openai_embed_fn, pack_batches
+
+
+class WordEncoding:
+    """Stands in for tiktoken offline: one token per whitespace-separated word."""
+
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    monkeypatch.setattr(batch_embed, "_encoding", lambda: WordEncoding())
+
+
+def _bad_request():
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+    return openai.BadRequestError("bad input", response=httpx.Response(400, request=request), body=None)
+
+
+def _fake_embed(calls, bad=()):
+    """Embeds each text as [len(text)], rejecting any batch that contains a text in `bad`."""
+
+    def fn(batch):
+        calls.append(list(batch))
+        if any(t in bad for t in batch):
+            raise _bad_request()
+        return [[float(len(t))] for t in batch]
+
+    return fn
+
+
+def test_pack_batches_respects_item_and_token_limits():
+    assert pack_batches([1, 1, 1, 1, 1], max_items=2) == [[0, 1], [2, 3], [4]]
+    assert pack_batches([4, 4, 3, 9], max_tokens=8) == [[0, 1], [2], [3]]
+    assert pack_batches([]) == []
+
+
+def test_prepare_inputs_truncates_and_fills_empty(monkeypatch):
+    monkeypatch.setattr(batch_embed, "EMBED_MAX_INPUT_TOKENS", 3)
+    texts, counts = batch_embed.prepare_inputs(["one two three four five", "", "short"])
+    assert texts == ["one two three", ".", "short"]
+    assert counts == [3, 1, 1]
+
+
+def test_embed_batched_keeps_input_order_in_few_calls():
+    calls = []
+    texts = ["a", "bb", "ccc", "dddd"]
+    assert embed_batched(texts, _fake_embed(calls)) == [[1.0], [2.0], [3.0], [4.0]]
+    assert len(calls) == 1
+
+
+def test_bad_input_is_isolated_by_bisection():
+    calls = []
+    rejected = {}
+    texts = ["a", "bb", "BAD", "dddd", "eeeee"]
+    out = embed_batched(texts, _fake_embed(calls, bad={"BAD"}), rejected)
+    assert out == [[1.0], [2.0], None, [4.0], [5.0]]
+    assert list(rejected) == [2]
+    # one full batch, then only the halves that still contain the bad input split further
+    assert len(calls) < 2 * len(texts)
+
+
+def test_bad_input_raises_without_rejected():
+    with pytest.raises(EmbeddingError) as info:
+        embed_batched(["a", "BAD"], _fake_embed([], bad={"BAD"}))
+    assert info.value.index == 1
+
+
+def test_async_variant_matches_and_reports_tokens():
+    seen = []
+
+    async def fn(batch, tokens):
+        seen.append(tokens)
+        if "BAD" in batch:
+            raise _bad_request()
+        return [[float(len(t))] for t in batch]
+
+    rejected = {}
+    out = asyncio.run(embed_batched_async(["two words", "BAD", "x"], fn, rejected))
+    assert out == [[9.0], None, [1.0]]
+    assert list(rejected) == [1]
+    assert seen[0] == 4  # the whole first batch
+
+
+def test_openai_embed_fn_restores_response_order():
+    data = [SimpleNamespace(index=1, embedding=[1.0]), SimpleNamespace(index=0, embedding=[0.0])]
+    client = SimpleNamespace(embeddings=SimpleNamespace(create=lambda model, input: SimpleNamespace(data=data)))
+    assert openai_embed_fn(client, "m")(["a", "b"]) == [[0.0], [1.0]]
@@ -0,0 +1,81 @@
+import math
+from collections import Counter
+
+import numpy as np
+
+import bm25
+from bm25 import BM25Index, build_corpus_index, load_or_build, tokenize
+
+IDS = ["p1", "p2", "p3"]
+TITLES = ["Bone loss in microgravity", "Plant roots on the ISS", "Radiation and DNA repair"]
+KEYWORDS = ["bone, osteoporosis", "plants, gravitropism", ""]
+PARAGRAPHS = [
+    ["Astronauts lose bone mass during long missions."],
+    ["Roots grew in random directions.", "Microgravity alters auxin transport in roots."],
+    ["Cosmic radiation damages DNA.", "Repair pathways were upregulated."],
+]
+
+
+def _reference_scores(docs, query):
+    """Textbook BM25 over term -> frequency counters."""
+    n = len(docs)
+    lengths = [sum(d.values()) for d in docs]
+    avgdl = sum(lengths) / n
+    out = []
+    for d, length in zip(docs, lengths):
+        s = 0.0
+        for term in set(tokenize(query)):
+            df = sum(1 for other in docs if term in other)
+            tf = d.get(term, 0)
+            if not tf:
+                continue
+            idf = math.log1p((n - df + 0.5) / (df + 0.5))
+            s += idf * tf * (bm25.K1 + 1) / (tf + bm25.K1 * (1 - bm25.B + bm25.B * length / avgdl))
+        out.append(s)
+    return out
+
+
+def test_tokenize_drops_stopwords_and_single_characters():
+    assert tokenize("The X-ray of a cell's DNA, in 2 phases") == ["x-ray", "cell's", "dna", "phases"]
+
+
+def test_scores_match_reference_bm25():
+    docs = [Counter(tokenize(" ".join(ps))) for ps in PARAGRAPHS]
+    index = BM25Index.build(IDS, docs)
+    for query in ("roots microgravity", "bone mass", "dna repair radiation", "nothing matches"):
+        np.testing.assert_allclose(index.scores(query), _reference_scores(docs, query), rtol=1e-5)
+
+
+def test_title_and_keywords_are_boosted():
+    index = build_corpus_index(IDS, TITLES, KEYWORDS, PARAGRAPHS)
+    # "microgravity" is in p1's title but only a paragraph of p2
+    assert [IDS[i] for i, _ in index.search("microgravity")] == ["p1", "p2"]
+
+
+def test_search_returns_only_matches_best_first():
+    index = build_corpus_index(IDS, TITLES, KEYWORDS, PARAGRAPHS)
+    hits = index.search("roots dna", k=10)
+    assert {IDS[i] for i, _ in hits} == {"p2", "p3"}
+    assert [s for _, s in hits] == sorted((s for _, s in hits), reverse=True)
+    assert index.search("zebrafish") == []
+    assert len(index.search("roots dna", k=1)) == 1
+
+
+def test_save_load_round_trip(tmp_path):
+    path = str(tmp_path / "bm25.npz")
+    index = build_corpus_index(IDS, TITLES, KEYWORDS, PARAGRAPHS, fingerprint="abc")
+    index.save(path)
+    loaded = BM25Index.load(path)
+    assert loaded.ids == IDS and loaded.fingerprint == "abc"
+    np.testing.assert_array_equal(loaded.scores("bone roots"), index.scores("bone roots"))
+    assert BM25Index.load(str(tmp_path / "missing.npz")) is None
+
+
+def test_load_or_build_rebuilds_when_the_corpus_changes(tmp_path):
+    path = str(tmp_path / "bm25.npz")
+    first = load_or_build(IDS, TITLES, KEYWORDS, PARAGRAPHS, path)
+    assert BM25Index.load(path).fingerprint == first.fingerprint
+    edited = [PARAGRAPHS[0], PARAGRAPHS[1], ["Zebrafish were flown."]]
+    second = load_or_build(IDS, TITLES, KEYWORDS, edited, path)
+    assert second.fingerprint != first.fingerprint
+    assert [IDS[i] for i, _ in BM25Index.load(path).search("zebrafish")] == ["p3"]
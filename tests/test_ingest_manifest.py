@@ -0,0 +1,78 @@
+from ingest_manifest import diff_manifest, load_manifest, paragraph_record_id, save_manifest
+
+MODEL = "text-embedding-3-small"
+
+
+def _diff(manifest, papers):
+    """papers: [(paper_id, title, keywords, [(heading, paragraph), ...])]"""
+    return diff_manifest(
+        manifest,
+        [p[0] for p in papers],
+        [p[1] for p in papers],
+        [p[2] for p in papers],
+        [[text for _, text in p[3]] for p in papers],
+        [[heading for heading, _ in p[3]] for p in papers],
+        MODEL,
+    )
+
+
+CORPUS = [
+    ("p1", "Plants in orbit", "plants, microgravity", [("Abstract", "a1"), ("Results", "r1")]),
+    ("p2", "Bone loss", "bone", [("Abstract", "b1")]),
+]
+
+
+def test_empty_manifest_embeds_everything():
+    delta = _diff({}, CORPUS)
+    assert delta.new_papers == ["p1", "p2"]
+    assert delta.title_idxs == [0, 1] and delta.keyword_idxs == [0, 1]
+    assert delta.paragraph_upserts == [(0, 0), (0, 1), (1, 0)]
+    assert not delta.paragraph_deletes and not delta.removed_papers
+
+
+def test_unchanged_corpus_is_empty():
+    delta = _diff(_diff({}, CORPUS).manifest, CORPUS)
+    assert delta.is_empty
+    assert not delta.new_papers and not delta.changed_papers
+
+
+def test_only_changed_fields_are_re_embedded():
+    manifest = _diff({}, CORPUS).manifest
+    edited = [
+        ("p1", "Plants in orbit", "plants, spaceflight", [("Abstract", "a1"), ("Results", "r1 revised")]),
+        CORPUS[1],
+    ]
+    delta = _diff(manifest, edited)
+    assert delta.changed_papers == ["p1"]
+    assert delta.title_idxs == [] and delta.keyword_idxs == [0]
+    assert delta.paragraph_upserts == [(0, 1)]
+
+
+def test_heading_change_re_embeds_the_paragraph():
+    manifest = _diff({}, CORPUS).manifest
+    edited = [("p1", CORPUS[0][1], CORPUS[0][2], [("Abstract", "a1"), ("Discussion", "r1")]), CORPUS[1]]
+    assert _diff(manifest, edited).paragraph_upserts == [(0, 1)]
+
+
+def test_shorter_paper_deletes_trailing_paragraphs():
+    manifest = _diff({}, CORPUS).manifest
+    shorter = [("p1", CORPUS[0][1], CORPUS[0][2], [("Abstract", "a1")]), CORPUS[1]]
+    delta = _diff(manifest, shorter)
+    assert delta.paragraph_upserts == []
+    assert delta.paragraph_deletes == [paragraph_record_id("p1", 1)]
+
+
+def test_removed_paper_is_reported():
+    manifest = _diff({}, CORPUS).manifest
+    delta = _diff(manifest, CORPUS[:1])
+    assert delta.removed_papers == ["p2"]
+    assert "p2" not in delta.manifest
+
+
+def test_manifest_round_trip_is_per_model(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = _diff({}, CORPUS).manifest
+    save_manifest(manifest, MODEL, path)
+    assert load_manifest(MODEL, path) == manifest
+    assert load_manifest("text-embedding-3-large", path) == {}
+    assert load_manifest(MODEL, str(tmp_path / "missing.json")) == {}
@@ -0,0 +1,48 @@
+import numpy as np
+
+from neighbours import NeighbourTable, build_neighbours, load_neighbours, save_neighbours
+
+
+def _unit_rows(n, dim=16, seed=0):
+    m = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return m / np.linalg.norm(m, axis=1, keepdims=True)
+
+
+def test_build_matches_brute_force_and_skips_self():
+    matrix = _unit_rows(40)
+    # a block smaller than N exercises the slab loop
+    indices, scores = build_neighbours(matrix, k=5, block=16)
+    sims = matrix @ matrix.T
+    np.fill_diagonal(sims, -np.inf)
+    expected = np.argsort(-sims, axis=1, kind="stable")[:, :5]
+    np.testing.assert_array_equal(indices, expected)
+    np.testing.assert_allclose(scores, np.take_along_axis(sims, expected, axis=1), atol=1e-3)
+    assert not (indices == np.arange(40)[:, None]).any()
+
+
+def test_k_is_clamped_to_the_other_rows():
+    indices, scores = build_neighbours(_unit_rows(3), k=10)
+    assert indices.shape == scores.shape == (3, 2)
+    assert build_neighbours(_unit_rows(1), k=10)[0].shape == (1, 0)
+
+
+def test_round_trip_keeps_keys_comparable_with_the_store(tmp_path):
+    path = str(tmp_path / "neighbours.npz")
+    keys = [("p1", "h1"), ("p2", "h2"), ("p3", "h3")]
+    indices, scores = build_neighbours(_unit_rows(3), k=2)
+    save_neighbours(NeighbourTable(keys, indices, scores), path)
+    table = load_neighbours(path)
+    # key_functions treats the table as stale unless this compares equal
+    assert table.keys == keys
+    np.testing.assert_array_equal(table.indices, indices)
+    assert load_neighbours(str(tmp_path / "missing.npz")) is None
+
+
+def test_similarity_checks_both_directions():
+    indices = np.array([[1], [2], [0]], dtype=np.int32)
+    scores = np.array([[0.9], [0.8], [0.7]], dtype=np.float16)
+    table = NeighbourTable([("a", ""), ("b", ""), ("c", "")], indices, scores)
+    assert table.similarity(0, 1) == table.similarity(1, 0) == np.float16(0.9)
+    assert table.similarity(0, 2) == np.float16(0.7)
+    table = NeighbourTable(table.keys, np.array([[1], [0], [0]], dtype=np.int32), scores)
+    assert table.similarity(1, 2) is None
@@ -0,0 +1,100 @@
+import importlib
+import os
+
+import pytest
+
+pytest.importorskip("lxml")
+
+PAGE = """<!DOCTYPE html>
+<html><head>
+<meta name="citation_title" content=" Arabidopsis growth in microgravity ">
+<meta name="citation_doi" content="10.1000/xyz123">
+<meta name="citation_pmid" content="12345">
+<meta name="citation_journal_title" content="NPJ Microgravity">
+<meta name="citation_publisher" content="Nature">
+<meta name="citation_publication_date" content="2021/05/04">
+<meta name="citation_volume" content="7">
+<meta name="citation_issue" content="1">
+<meta name="citation_firstpage" content="12">
+<meta name="citation_author" content="Ada Lovelace">
+<meta name="citation_author_institution" content="NASA Ames">
+<meta name="citation_author" content="Alan Turing">
+<style>p { color: red; }</style>
+<script>var x = "<p>not text</p>";</script>
+</head><body>
+<section class="abstract">
+  <p>Plants were grown on the <b>ISS</b> for 30&nbsp;days.</p>
+  <p>Keywords: plants, microgravity, spaceflight</p>
+  <p>   </p>
+</section>
+<article>
+  <section>
+    <h2 class="pmc_sec_title">Introduction</h2>
+    <p>Spaceflight alters <i>root</i> growth &amp; gravitropism.<!-- a comment --> See <a href="#b1">[1]</a>.</p>
+    <section><h3>Nested</h3><p>Nested paragraphs count towards the parent section.</p></section>
+  </section>
+  <section>
+    <h2 class="pmc_sec_title">Results</h2>
+    <p>Root length decreased by 20%.</p>
+    <figure class="fig" id="fig1"><img src="fig1.png"><figcaption>Figure 1. Root length.</figcaption></figure>
+    <figure class="fig" id="table1"><figcaption>Table 1. Growth data.</figcaption></figure>
+  </section>
+  <section><h2 class="pmc_sec_title">Empty</h2></section>
+  <section><p>No heading here.</p></section>
+</article>
+<section class="ref-list"><ul>
+  <li><cite>Smith J. Plants in space. 2019.</cite></li>
+  <li>No cite element</li>
+  <li><cite>Doe A. Roots. 2020.</cite></li>
+</ul></section>
+<section id="funding-statement1">Funding Statement This work was funded by NASA.</section>
+<section id="ack1">Acknowledgments We thank the crew.</section>
+</body></html>
+"""
+
+
+@pytest.fixture(scope="module")
+def scrape(tmp_path_factory):
+    # biopub_scrape opens its error log in the working directory at import
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("scrape"))
+    try:
+        return importlib.import_module("biopub_scrape")
+    finally:
+        os.chdir(cwd)
+
+
+def _comparable(record: dict) -> dict:
+    return {k: v for k, v in record.items() if k != "scraped_at"}
+
+
+def test_backends_produce_identical_records(scrape):
+    bs4_record = scrape.parse_paper("https://example.org/a", PAGE, backend="bs4")
+    lxml_record = scrape.parse_paper("https://example.org/a", PAGE, backend="lxml")
+    assert _comparable(bs4_record) == _comparable(lxml_record)
+
+
+def test_record_contents(scrape):
+    record = scrape.parse_paper("https://example.org/a", PAGE, backend="lxml")
+    assert record["paper_id"] == "10.1000/xyz123"
+    assert record["metadata"]["title"] == "Arabidopsis growth in microgravity"
+    assert record["metadata"]["authors"] == [
+        {"name": "Ada Lovelace", "affiliation": "NASA Ames"},
+        {"name": "Alan Turing", "affiliation": None},
+    ]
+    assert [p["text"] for p in record["abstract_paragraphs"]][1] == "Keywords: plants, microgravity, spaceflight"
+    assert [s["heading"] for s in record["sections"]] == ["Introduction", "Results", "Untitled Section"]
+    assert record["sections"][0]["paragraph_count"] == 2
+    assert [r["text"] for r in record["references"]] == ["Smith J. Plants in space. 2019.", "Doe A. Roots. 2020."]
+    assert [f["id"] for f in record["figures"]] == ["fig1"] and [t["id"] for t in record["tables"]] == ["table1"]
+    assert record["funding"] == "This work was funded by NASA."
+    assert record["acknowledgments"] == "We thank the crew."
+    assert record["missing_fields"] == []
+
+
+def test_backends_agree_on_a_bare_page(scrape):
+    page = "<html><body><p>Nothing PMC-shaped here.</p></body></html>"
+    bs4_record = scrape.parse_paper("https://example.org/b", page, backend="bs4")
+    lxml_record = scrape.parse_paper("https://example.org/b", page, backend="lxml")
+    assert _comparable(bs4_record) == _comparable(lxml_record)
+    assert bs4_record["missing_fields"] == ["doi", "pmid", "abstract"]
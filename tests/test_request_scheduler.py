@@ -0,0 +1,105 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+import request_scheduler
+from request_scheduler import RequestScheduler, TokenBucket
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+
+
+def _rate_limited(retry_after=None):
+    headers = {"retry-after": retry_after} if retry_after is not None else {}
+    return openai.RateLimitError("rate limited", response=httpx.Response(429, headers=headers, request=REQUEST), body=None)
+
+
+def _bad_request():
+    return openai.BadRequestError("bad request", response=httpx.Response(400, request=REQUEST), body=None)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Records backoff delays instead of waiting them out."""
+    delays = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay, *args, **kwargs):
+        delays.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    return delays
+
+
+def _flaky(errors, result="ok"):
+    """A make_call that raises each of `errors` in turn, then returns `result`."""
+    calls = []
+
+    async def make_call():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return make_call, calls
+
+
+def test_retries_rate_limits_using_retry_after(sleeps):
+    scheduler = RequestScheduler(api_key="test")
+    make_call, calls = _flaky([_rate_limited("3"), _rate_limited("0")])
+    assert asyncio.run(scheduler.submit(make_call)) == "ok"
+    assert len(calls) == 3
+    assert sleeps == [3.0, 0.0]
+
+
+def test_backs_off_exponentially_without_retry_after(sleeps, monkeypatch):
+    monkeypatch.setattr(request_scheduler.random, "random", lambda: 1.0)
+    scheduler = RequestScheduler(api_key="test")
+    errors = [_rate_limited(), openai.APIConnectionError(request=REQUEST), _rate_limited()]
+    make_call, calls = _flaky(errors)
+    assert asyncio.run(scheduler.submit(make_call)) == "ok"
+    assert sleeps == [1.0, 2.0, 4.0]
+
+
+def test_gives_up_after_max_retries(sleeps):
+    scheduler = RequestScheduler(api_key="test", max_retries=2)
+    make_call, calls = _flaky([_rate_limited("0")] * 5)
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(scheduler.submit(make_call))
+    assert len(calls) == 3
+
+
+def test_client_errors_are_not_retried(sleeps):
+    scheduler = RequestScheduler(api_key="test")
+    make_call, calls = _flaky([_bad_request()])
+    with pytest.raises(openai.BadRequestError):
+        asyncio.run(scheduler.submit(make_call))
+    assert len(calls) == 1 and sleeps == []
+
+
+def test_set_limits_caps_the_buckets():
+    scheduler = RequestScheduler(api_key="test", requests_per_minute=600, tokens_per_minute=1000)
+    scheduler.set_limits(requests_per_minute=60, tokens_per_minute=500)
+    assert scheduler._rpm.capacity == 60 and scheduler._rpm.rate == 1.0
+    assert scheduler._tpm.tokens == 500
+
+
+def test_token_bucket_waits_for_refill(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(request_scheduler.time, "monotonic", lambda: clock[0])
+
+    async def fake_sleep(delay):
+        clock[0] += delay
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    bucket = TokenBucket(per_minute=60)
+
+    async def drain():
+        bucket._lock = asyncio.Lock()
+        await bucket.acquire(60)
+        await bucket.acquire(2)
+
+    asyncio.run(drain())
+    assert clock[0] == pytest.approx(2.0)
@@ -0,0 +1,95 @@
+import time
+
+from response_cache import LRUCache, SqliteCache, cache_key
+
+
+def test_cache_key_separates_parts():
+    assert cache_key("ab", "c") != cache_key("a", "bc")
+    assert cache_key("a", "b") == cache_key("a", "b")
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # a is now the most recent
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_lru_ttl_expires(monkeypatch):
+    cache = LRUCache(ttl=10)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.set("a", 1)
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert cache.get("a") is None
+
+
+def test_sqlite_round_trip(tmp_path):
+    cache = SqliteCache(str(tmp_path / "c.sqlite3"), table="t")
+    cache.set_many({"a": [1, 2], "b": {"x": "y"}})
+    assert cache.get_many(["a", "b", "missing"]) == {"a": [1, 2], "b": {"x": "y"}}
+    cache.delete_many(["a"])
+    assert cache.get("a") is None and len(cache) == 1
+
+
+def test_sqlite_get_many_chunks_large_key_lists(tmp_path):
+    cache = SqliteCache(str(tmp_path / "c.sqlite3"), table="t")
+    items = {f"k{i}": i for i in range(1200)}
+    cache.set_many(items)
+    assert cache.get_many(list(items)) == items
+
+
+def test_sqlite_ttl_treats_old_rows_as_misses(tmp_path, monkeypatch):
+    cache = SqliteCache(str(tmp_path / "c.sqlite3"), table="t", ttl=10)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.set("a", 1)
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert cache.get("a") is None
+    assert cache.evict() == 1
+
+
+def test_sqlite_evicts_beyond_max_entries(tmp_path):
+    cache = SqliteCache(str(tmp_path / "c.sqlite3"), table="t", max_entries=3)
+    cache.set_many({f"k{i}": i for i in range(5)})
+    cache.evict()
+    assert len(cache) == 3
+
+
+def test_add_is_insert_if_absent(tmp_path):
+    cache = SqliteCache(str(tmp_path / "c.sqlite3"), table="claims", ttl=60)
+    assert cache.add("a", 1)
+    assert not cache.add("a", 2)
+    assert cache.get("a") == 1
+
+
+def test_add_many_returns_only_keys_it_inserted(tmp_path):
+    path = str(tmp_path / "c.sqlite3")
+    first = SqliteCache(path, table="claims", ttl=60)
+    second = SqliteCache(path, table="claims", ttl=60)
+    assert first.add_many({"a": 1, "b": 1}) == {"a", "b"}
+    assert second.add_many({"b": 2, "c": 2}) == {"c"}
+    assert first.get_many(["a", "b", "c"]) == {"a": 1, "b": 1, "c": 2}
+    assert second.add_many({}) == set()
+
+
+def test_add_many_reclaims_expired_keys(tmp_path, monkeypatch):
+    cache = SqliteCache(str(tmp_path / "c.sqlite3"), table="claims", ttl=10)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.add_many({"a": 1, "b": 1})
+    monkeypatch.setattr(time, "time", lambda: now + 5)
+    assert cache.add_many({"a": 2}) == set()  # still held
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert cache.add_many({"a": 3, "b": 3}) == {"a", "b"}
+    assert cache.get("a") == 3
+
+
+def test_add_many_handles_more_keys_than_one_statement(tmp_path):
+    cache = SqliteCache(str(tmp_path / "c.sqlite3"), table="claims", ttl=60)
+    cache.add("k7", 0)
+    inserted = cache.add_many({f"k{i}": 1 for i in range(1200)})
+    assert len(inserted) == 1199 and "k7" not in inserted